@@ -18,12 +18,15 @@ import xml.etree.ElementTree as ET
 
 from collections import Counter, defaultdict
 from multiprocessing import Process
-from nltk.corpus import stopwords
 
 from aliases import AliasesManager
 from collocates import CollocatesManager
 from corpus import CorpusManager, BothTextsMinusShakesCorpusManager
 from distinctiveness import Probability
+from divergences import kl_at_cutoffs, RankedCounts
+from noncharacter import NonCharacterManager
+from resources import resources
+from store import Vocabulary
 
 
 # Configure logging
@@ -31,7 +34,7 @@ logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
 	level=logging.INFO)
 
 
-STOPWORDS = set(stopwords.words('english'))
+STOPWORDS = resources.get('stopwords')
 
 
 # TODO: Temporary.
@@ -61,6 +64,7 @@ def main():
 	aliases_manager = AliasesManager()
 	collocates_manager = CollocatesManager()
 	corpus_manager = CorpusManager()
+	noncharacter_manager = NonCharacterManager()
 	
 	# Get publication dates for all stories.
 	dates = corpus_manager.get_dates()
@@ -140,32 +144,11 @@ def main():
 	# Returns a word (lemma) counter for the given story's non-character
 	# collocate words.
 	def get_non_cntr(sid):
-		# path = "/home/ndg/project/shared_datasets/narrative/characterization/data/texts/non-lemma/%s.txt" % sid
-		# path = "/home/ndg/project/shared_datasets/narrative/characterization/data/texts/non-lemma-top/%s.txt" % sid
-		path = "/home/ndg/project/shared_datasets/narrative/characterization/data/texts/both_texts_minus_shakes/non-lemma/%s.txt" % sid
+		# Counted on first use (See count_non_character.py).
+		if not noncharacter_manager.saved(sid):
+			noncharacter_manager.gen(sid)
 
-		with open(path) as f:
-			return Counter(f.read().split())
-
-		# path = corpus_manager.get_corenlp_fpath(sid)
-		# e = ET.parse(path).getroot()
-
-		# char_collocates = collocates_manager.get(sid, tpe='character',
-		# 	# TODO: Temporary
-		# 	# ranks=range(1, 21))
-		# 	ranks=range(1, 2))
-
-		# # Counts all lemmas.
-		# cntr = Counter(tok[1].text for tok in e.iter('token'))
-		# # Counts all character collocate lemmas.
-		# char_coll_cntr = Counter(coll['token']['lemma']
-		# 	for coll in char_collocates)
-		# # Counts all alias tokens.
-		# alias_cntr = Counter(tok for coll in char_collocates
-		# 	for tok in coll['alias']['span'].split())
-
-		# # Non-character word (lemma) counter.
-		# return cntr - char_coll_cntr - alias_cntr
+		return noncharacter_manager.get(sid)
 
 	# Generates the bag-of-words distribution for the given word counter,
 	# returning a dictionary from word to probability.
@@ -181,6 +164,8 @@ def main():
 		return {w: c / num_tokens for w, c in wc_pairs}
 
 	def run_calc_divergences(worker_name, cats):
+		vocab = Vocabulary()
+
 		for cat in cats:
 			sids = genre_sids[cat] if cat in genre_sids else period_sids[cat]
 
@@ -234,27 +219,15 @@ def main():
 
 					row = [sid]
 
-					char_cntr = get_char_cntr(sid)
-					non_cntr = get_non_cntr(sid)
-
-					char_dist = gen_dist(char_cntr.most_common(500))
-					non_dist = gen_dist(non_cntr.most_common(500))
-
-					# write_dist(char_dist, "/home/ndg/project/shared_datasets/narrative/characterization/data/probs/char/all/" + sid + ".tsv")
-					# write_dist(non_dist, "/home/ndg/project/shared_datasets/narrative/characterization/data/probs/non/all/" + sid + ".tsv")
-
-					row.append(Probability.kl_divergence(char_dist, non_dist))			
-
-					char_dist = gen_dist([(w, c) for w, c
-						in char_cntr.most_common(500) if w not in STOPWORDS])
-			
-					non_dist = gen_dist([(w, c) for w, c
-						in non_cntr.most_common(500) if w not in STOPWORDS])
+					char_ranked = RankedCounts(get_char_cntr(sid), vocab,
+						(STOPWORDS,))
+					non_ranked = RankedCounts(get_non_cntr(sid), vocab,
+						(STOPWORDS,))
 
-					# write_dist(char_dist, "/home/ndg/project/shared_datasets/narrative/characterization/data/probs/char-nostop/all/" + sid + ".tsv")
-					# write_dist(non_dist, "/home/ndg/project/shared_datasets/narrative/characterization/data/probs/non-nostop/all/" + sid + ".tsv")
+					# With and without stop words, at the top 500 words.
+					kls = kl_at_cutoffs(char_ranked, non_ranked, [500])
 
-					row.append(Probability.kl_divergence(char_dist, non_dist))
+					row += [kls[0, 0], kls[1, 0]]
 
 					writer.writerow(row)
 
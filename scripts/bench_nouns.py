@@ -0,0 +1,138 @@
+"""
+Benchmarks the downstream cost (noun alias identification and noun collocate
+parsing) of each noun vocabulary policy on a sample of stories, saving the
+results to a .tsv file. Nothing is written to the story directories.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import random
+import sys
+import time
+sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
+
+from collections import defaultdict
+
+from aliases import AliasesManager, AliasIdentifier
+from corpus import CorpusManager
+from dependency import DependencyParser
+from nouns import NounsExtractor, AllNounsPolicy, MinCountNounsPolicy, \
+	NOUN_VOCAB_FPATH, SharedVocabularyNounsPolicy, TopKNounsPolicy
+
+
+# Configure logging
+logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
+	level=logging.INFO)
+
+
+# Returns the # of nodes in the given tokree.
+def count_nodes(tokree):
+	return sum(1 + count_nodes(sub) for tok, sub in tokree.iteritems()
+		if tok != '_alias')
+
+
+def main():
+	parser_description = ("Benchmarks the downstream cost (noun alias "
+		"identification and noun collocate parsing) of each noun vocabulary "
+		"policy on a sample of stories, saving the results to a .tsv file.")
+	parser = argparse.ArgumentParser(description=parser_description)
+
+	parser.add_argument('out_path', help="Output path to .tsv file")
+
+	parser.add_argument('-s', '--sample', help="# sampled stories (Default "
+		"is 5)", type=int, default=5)
+	parser.add_argument('-k', '--top-k', dest='top_ks', type=int, nargs='+',
+		default=[100, 500, 1000, 5000], help="Top-k settings to benchmark")
+	parser.add_argument('-m', '--min-count', dest='min_counts', type=int,
+		nargs='+', default=[2, 5, 10], help="Min. count settings to benchmark")
+	parser.add_argument('--seed', type=int, help="Random seed for sampling")
+
+	args = parser.parse_args()
+
+	aliases_manager = AliasesManager()
+	corpus_manager = CorpusManager()
+	identifier = AliasIdentifier()
+	depparser = DependencyParser()
+	extractor = NounsExtractor()
+
+	policies = [('all', AllNounsPolicy())]
+	policies += [('top-%d' % k, TopKNounsPolicy(k)) for k in args.top_ks]
+	policies += [('min-%d' % m, MinCountNounsPolicy(m))
+		for m in args.min_counts]
+	if os.path.exists(NOUN_VOCAB_FPATH):
+		policies.append(('shared', SharedVocabularyNounsPolicy()))
+	else:
+		logging.info("No shared noun vocabulary (See extract_nouns.py "
+			"--build-vocab), skipping...")
+
+	sids = [sid for sid in corpus_manager.get_ids(origin='gen')
+		if aliases_manager.saved(sid, 'character')]
+	random.seed(args.seed)
+	sids = random.sample(sids, min(args.sample, len(sids)))
+
+	# Totals over the sampled stories, by policy.
+	totals = defaultdict(lambda: defaultdict(float))
+
+	for sid in sids:
+		logging.info("Benchmarking %s..." % sid)
+
+		corenlp_fpath = corpus_manager.get_corenlp_fpath(sid)
+		booknlp_tokens_path = corpus_manager.get_booknlp_tokens(sid)
+		character_aliases = aliases_manager.get_aliases(sid, 'character')
+
+		noun_cntr = extractor.count(corenlp_fpath, character_aliases)
+
+		for name, policy in policies:
+			stats = totals[name]
+
+			start = time.time()
+			nouns = extractor.to_entities(policy.select(noun_cntr))
+			stats['select_secs'] += time.time() - start
+
+			start = time.time()
+			tokree = identifier.tokreefy(nouns)
+			pronoun_table = identifier.get_pronouns(booknlp_tokens_path, nouns)
+			aliases = identifier.ident(tokree, corenlp_fpath, pronoun_table)
+			stats['ident_secs'] += time.time() - start
+
+			start = time.time()
+			num_collocates = sum(1 for _ in depparser.parse_doc(corenlp_fpath,
+				aliases, character_aliases))
+			stats['collocates_secs'] += time.time() - start
+
+			stats['nouns'] += len(nouns)
+			stats['noun_tokens'] += sum(n['count'] for n in nouns)
+			stats['tokree_nodes'] += count_nodes(tokree)
+			stats['aliases'] += len(aliases)
+			stats['aliases_bytes'] += len(json.dumps(aliases, sort_keys=True,
+				indent=4))
+			stats['collocates'] += num_collocates
+
+	all_tokens = totals['all']['noun_tokens']
+
+	with open(args.out_path, 'wb') as f:
+		writer = csv.writer(f, delimiter='\t', quotechar='"')
+
+		# Write header.
+		writer.writerow(['POLICY', '# NOUNS', 'NOUN TOKEN COVERAGE',
+			'# TOKREE NODES', '# ALIASES', 'ALIASES .JSON BYTES',
+			'# COLLOCATES', 'SELECT SECS.', 'IDENT. SECS.', 'COLLOCATES SECS.'])
+
+		for name, _ in policies:
+			stats = totals[name]
+
+			writer.writerow([name, int(stats['nouns']),
+				stats['noun_tokens'] / all_tokens if all_tokens > 0 else 0.0,
+				int(stats['tokree_nodes']), int(stats['aliases']),
+				int(stats['aliases_bytes']), int(stats['collocates']),
+				stats['select_secs'], stats['ident_secs'],
+				stats['collocates_secs']])
+
+	logging.info("Finished! (Results in %s)" % args.out_path)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,71 @@
+"""
+Builds the table of SentiWordNet scores of the collocate lemmas of every story
+in the corpus, with rows aligned to the corpus-level term vocabulary.
+"""
+
+import argparse
+import logging
+import os
+import sys
+sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
+
+from multiprocessing import Pool
+
+from collocates import CollocatesManager
+from corpus import CorpusManager
+from sentiment import SENTIWORDNET_PREFIX, build_sentiwordnet_table
+
+
+# Configure logging
+logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
+	level=logging.INFO)
+
+
+collocates_manager = CollocatesManager()
+
+
+# Worker function, returning the character collocate lemmas of the given story.
+def get_lemmas(sid):
+	if not collocates_manager.saved(sid, 'character'):
+		return set()
+
+	return collocates_manager.get_lemmas(sid, 'character')
+
+
+def main():
+	parser_description = ("Builds the table of SentiWordNet scores of the "
+		"collocate lemmas of every story in the corpus, with rows aligned to "
+		"the corpus-level term vocabulary.")
+	parser = argparse.ArgumentParser(description=parser_description)
+
+	parser.add_argument('n', help="# worker threads to spawn", type=int)
+
+	parser.add_argument('-o', '--out-prefix', dest='out_prefix',
+		default=SENTIWORDNET_PREFIX, help="Output path prefix")
+
+	args = parser.parse_args()
+
+	corpus_manager = CorpusManager()
+	sids = corpus_manager.get_ids(origin='gen')
+
+	lemmas = set()
+	pool = Pool(args.n)
+	for i, story_lemmas in enumerate(pool.imap_unordered(get_lemmas, sids)):
+		lemmas |= story_lemmas
+
+		if (i + 1) % 100 == 0:
+			logging.info("Scanned %d/%d stories..." % (i + 1, len(sids)))
+
+	pool.close()
+	pool.join()
+
+	logging.info("Looking up %d collocate lemmas..." % len(lemmas))
+
+	num_scored = build_sentiwordnet_table(lemmas, args.out_prefix)
+
+	logging.info("Found senti-synsets for %d lemmas (Outputting to %s.npy)." %
+		(num_scored, args.out_prefix))
+
+
+if __name__ == '__main__':
+	main()
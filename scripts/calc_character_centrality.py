@@ -15,7 +15,7 @@ sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
 from collections import Counter
 from scipy import stats
 
-from aliases import AliasesManager
+from aliases import AliasesManager, get_rank_mentions
 from corpus import CorpusManager
 
 # Configure logging
@@ -23,16 +23,16 @@ logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
 	level=logging.INFO)
 
 
-# Returns a counter of the number of mentions for the top 20 characters.
-def get_alias_cnts(aliases):
+# Returns a counter of the number of mentions for the top 20 characters,
+# according to the given mention summaries.
+def get_alias_cnts(summaries):
 	cntr = Counter()
 
-	for alias in aliases:
-		rank = alias['entity']['rank']
+	for rank, cnt in get_rank_mentions(summaries).iteritems():
 		if rank > 20:
 			continue
 
-		cntr[rank] += 1
+		cntr[rank] = cnt
 
 	return cntr
 
@@ -55,6 +55,10 @@ def main():
 	# Story Id's.
 	sids = corpus_manager.get_ids(origin='gen')
 
+	# Character mention summaries of all stories.
+	logging.info("Reading character mentions table...")
+	mentions = aliases_manager.get_mentions_table('character')
+
 	with open(args.out_path, 'wb') as f:
 		writer = csv.writer(f, delimiter='\t', quotechar='"')
 
@@ -63,7 +67,7 @@ def main():
 			'FIRST/SECOND RATIO', 'MAX. DIFF. RANK', 'MENTIONS SKEW'])
 		
 		for sid in sids:
-			if not aliases_manager.saved(sid, tpe='character'):
+			if sid not in mentions:
 				logging.info("Skipping %s..." % sid)
 				continue
 			
@@ -72,8 +76,7 @@ def main():
 			row = [sid, dates[sid] if sid in dates else 'DNE',
 				genre if genre else 'DNE']
 
-			aliases = aliases_manager.get_aliases(sid, tpe='character')
-			cntr = get_alias_cnts(aliases)
+			cntr = get_alias_cnts(mentions[sid])
 
 			num_characters = len(cntr)
 
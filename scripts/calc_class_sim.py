@@ -2,7 +2,8 @@
 Calculates the class similiarity of stories with respect to genre and period
 across a range of character rank groups, saving the results in a series of .tsv
 files. Class similiarity of a story with respect to a category is calculated as
-cosine similarity against the "mean" category vector.
+cosine similarity against the "mean" category vector (optionally leaving the
+story out of the mean).
 
 @author: Hardik
 """
@@ -16,11 +17,10 @@ import sys
 sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
 
 from collections import defaultdict
-from multiprocessing import Process
-from scipy.spatial.distance import cosine
-from sklearn.preprocessing import normalize
+from multiprocessing import Pool
 
 from aliases import AliasesManager
+from classsim import build_matrix, calc_class_sims, count_terms
 from collocates import CollocatesManager
 from corpus import CorpusManager
 from ranks import RANK_GROUPS
@@ -31,6 +31,18 @@ logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
 	level=logging.INFO)
 
 
+collocates_manager = CollocatesManager()
+
+
+# Worker function, returning the collocate term counts of the given story for
+# each rank group.
+def count_story_terms(sid):
+	arrays = collocates_manager.get_arrays(sid, 'character')
+
+	return [count_terms(arrays['lemma'][np.in1d(arrays['rank'], list(ranks))])
+		for _, ranks in RANK_GROUPS]
+
+
 def main():
 	parser_description = ("Calculates the class similiarity of stories with "
 		"respect to genre and period across a range of character rank groups, "
@@ -42,11 +54,14 @@ def main():
 	parser.add_argument('out_dirpath', help="Path to output directory")
 
 	parser.add_argument('n', help="# worker threads to spawn", type=int)
+
+	parser.add_argument('--loo', dest='loo', action='store_true',
+		help="Compare each story against the mean of the other stories in its "
+		"category (leave-one-out)")
 	
 	args = parser.parse_args()
 
 	aliases_manager = AliasesManager()
-	collocates_manager = CollocatesManager()
 	corpus_manager = CorpusManager()
 	
 	# Get publication dates for all stories.
@@ -84,37 +99,37 @@ def main():
 			else:
 				sids[sub].append(sid)
 
-	# Group parameter settings for each worker process.
-	param_groups, i = defaultdict(list), 0
-	for rg in RANK_GROUPS:
-		for cat in sids.keys():
-			param_groups[i % args.n].append((rg, cat))
-			i += 1
+	# Every story is read once, for all rank groups and categories.
+	all_sids = [sid for cat in sorted(sids) for sid in sids[cat]]
+	rows = {sid: i for i, sid in enumerate(all_sids)}
+	cat_rows = {cat: [rows[sid] for sid in cat_sids] for cat, cat_sids
+		in sids.iteritems()}
+
+	logging.info("Counting collocates of %d stories..." % len(all_sids))
+
+	pool = Pool(args.n)
+	cntrs = pool.map(count_story_terms, all_sids)
+	pool.close()
+	pool.join()
 
 	# Create the output directory if it doesn't already exist.
 	if not os.path.exists(args.out_dirpath):
 		os.makedirs(args.out_dirpath)
 
-	def run_class_sim_calc(worker_name, params):
-		for rg, cat in params:
-			rg_name, ranks = rg
+	for k, (rg_name, _) in enumerate(RANK_GROUPS):
+		logging.info("Calculating for %s..." % rg_name)
 
-			out_path = os.path.join(args.out_dirpath, rg_name.lower())
+		X, _ = build_matrix([story_cntrs[k] for story_cntrs in cntrs])
+		sims = calc_class_sims(X, cat_rows, loo=args.loo)
 
-			# Create the sub-directory if it doesn't already exist.
-			if not os.path.exists(out_path):
-				os.makedirs(out_path)
+		out_dirpath = os.path.join(args.out_dirpath, rg_name.lower())
 
-			out_path = os.path.join(out_path, '%s.tsv' % cat)
+		# Create the sub-directory if it doesn't already exist.
+		if not os.path.exists(out_dirpath):
+			os.makedirs(out_dirpath)
 
-			logging.info(worker_name +
-				": Calculating for %s and %s... (Outputting to %s)" %
-				(rg_name, cat, out_path))
-		
-			dtmat, count_vect = collocates_manager.get_dtmatrix(sids[cat],
-				tpe='character', ranks=ranks, normal=True)
-			
-			mean_vec = dtmat.mean(axis=0)
+		for cat, cat_sids in sids.iteritems():
+			out_path = os.path.join(out_dirpath, '%s.tsv' % cat)
 
 			with open(out_path, 'wb') as f:
 				writer = csv.writer(f, delimiter='\t', quotechar='"')
@@ -122,23 +137,12 @@ def main():
 				# Write header.
 				writer.writerow(['STORY ID', 'PUB. DATE', 'CLASS SIMILIARTY'])
 
-				for sid in sids[cat]:
-					collocates = collocates_manager.get(sid, tpe='character',
-						ranks=ranks)
+				for sid, sim in zip(cat_sids, sims[cat]):
+					writer.writerow([sid, dates[sid] if sid in dates else 'DNE',
+						sim])
 
-					vec = count_vect.transform([' '.join([coll['token']['lemma']
-						for coll in collocates])]).astype(float)
-					vec = normalize(vec).todense()
+	logging.info("Finished!")
 
-					writer.writerow([sid, dates[sid] if sid in dates else 'DNE',
-						1 - cosine(vec, mean_vec)])
-			
-			logging.info(worker_name + ": Finished!")	
-	
-	for i, params in param_groups.iteritems():
-		p = Process(target=run_class_sim_calc,
-			args=("T%d" % (i + 1), params,))
-		p.start()
 
 if __name__ == '__main__':
 	main()
@@ -6,18 +6,12 @@ collocates that are "said" words), outputting the results to .tsv files.
 """
 
 import argparse
-import csv
 import logging
 import os
 import sys
 sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
 
-from nltk.stem import WordNetLemmatizer
-
-from collocates import CollocatesManager
-from corpus import CorpusManager
-from ranks import RANK_GROUPS
-from role import ROLES
+from features import run_features
 
 
 # Configure logging
@@ -25,88 +19,26 @@ logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
 	level=logging.INFO)
 
 
-# Filepath to "said" words.
-SAID_DICT_PATH = "../resources/said_dict.txt"
-
-
-# Returns a set of "said" words, lemmatized.
-def load_said_words():
-	words = []
-	with open(SAID_DICT_PATH) as f:
-		for line in f:
-			words += [p.strip().replace(' ', '-') for p in line.split('\t')]
-
-	lemmatizer = WordNetLemmatizer()
-
-	# Lemmatize and convert to set and add 'say'.
-	return set([lemmatizer.lemmatize(w) for w in words] + ['say'])
-
-
 def main():
-	parser_description = ("Calculates the sociability of characters in "
+	parser_description = ("Calculates the dialogicality of characters in "
 		"stories (as the percentage of collocates that are \"said\" words), "
 		"outputting the results to .tsv files.")
 	parser = argparse.ArgumentParser(description=parser_description)
 
 	parser.add_argument('out_dirpath', help="Path to output directory for "
 		"generated .tsv files")
-	
-	args = parser.parse_args()
-
-	# Add None for considering all roles.
-	roles = [None] + ROLES
 
-	collocates_manager = CollocatesManager()
-	corpus_manager = CorpusManager()
-	
-	# Get publication dates for all stories.
-	dates = corpus_manager.get_dates()
-	# Story Id's.
-	sids = corpus_manager.get_ids(origin='gen')
-
-	# Create the output directory if it doesn't already exist.
-	if not os.path.exists(args.out_dirpath):
-		os.makedirs(args.out_dirpath)
-
-	said_words = load_said_words()
-
-	for rg in RANK_GROUPS:
-		for role in roles:
-			rg_name, ranks = rg
-
-			role_name = role.lower() if role else 'all'
-			path = os.path.join(args.out_dirpath, '%s-%s.tsv' % (role_name,
-				rg_name.lower()))
+	parser.add_argument('-n', '--num-workers', dest='n', type=int, default=1,
+		help="# worker threads to spawn (Default is 1)")
+	parser.add_argument('--restart', dest='restart', action='store_true',
+		help="Start over instead of resuming an interrupted run")
 
-			logging.info("Calculating for %s... (Outputting to %s)" %
-				(rg_name, path))
-
-			with open(path, 'wb') as f:
-				writer = csv.writer(f, delimiter='\t', quotechar='"')
-
-				# Write header.
-				writer.writerow(['STORY ID', 'PUB. DATE', 'GENRE',
-					'DIALOGICALITY'])
-
-				for sid in sids:
-					if not collocates_manager.saved(sid, tpe='character'):
-						logging.info("Skipping %s..." % sid)
-						continue
-
-					genre = (None if sid.startswith('000') else
-						corpus_manager.get_genre(sid))
-					
-					collocates = collocates_manager.get(sid, tpe='character',
-						role=role, ranks=ranks)
-					num_diag_collocates = len([coll for coll in collocates
-						if coll['token']['lemma'] in said_words])
+	args = parser.parse_args()
 
-					row = [sid, dates[sid] if sid in dates else 'DNE',
-						genre if genre else 'DNE',
-						float(num_diag_collocates) / len(collocates)
-						if len(collocates) > 0 else 0.0]
-						
-					writer.writerow(row)
+	# Lexicon hits are looked up through the compiled lexicon bitmasks (See
+	# lexicons.py and features.py).
+	run_features(args.out_dirpath, ['dialogicality'], n=args.n,
+		resume=not args.restart, subdirs=False)
 	
 if __name__ == '__main__':
 	main()
@@ -0,0 +1,52 @@
+"""
+Calculates the collocate-based features (concreteness, sociability,
+dialogicality, abstraction, dictionary proportions, role and dependency type
+distributions) of each story across a range of roles and character rank groups
+in a single pass over the corpus, saving the results in a series of .tsv files
+per feature (in the layout of the feature's own script).
+"""
+
+import argparse
+import logging
+import os
+import sys
+sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
+
+from features import FEATURES, run_features
+
+
+# Configure logging
+logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
+	level=logging.INFO)
+
+
+def main():
+	parser_description = ("Calculates the collocate-based features of each "
+		"story across a range of roles and character rank groups in a single "
+		"pass over the corpus, saving the results in a series of .tsv files "
+		"per feature.")
+	parser = argparse.ArgumentParser(description=parser_description)
+
+	parser.add_argument('out_dirpath', help="Path to output directory (One "
+		"sub-directory per feature)")
+
+	parser.add_argument('n', help="# worker threads to spawn", type=int)
+
+	parser.add_argument('-f', '--features', dest='names', nargs='+',
+		default=list(FEATURES), choices=list(FEATURES),
+		help="Features to calculate (Default is all)")
+	parser.add_argument('--restart', dest='restart', action='store_true',
+		help="Start over instead of resuming an interrupted run")
+
+	args = parser.parse_args()
+
+	# Each story's collocates are read once, for all features, rank groups, and
+	# roles.
+	run_features(args.out_dirpath, args.names, n=args.n,
+		resume=not args.restart)
+
+	logging.info("Finished!")
+
+
+if __name__ == '__main__':
+	main()
@@ -8,22 +8,21 @@ file.
 
 import argparse
 import csv
-import itertools as it
 import logging
 import numpy as np
 import os
 import sys
 sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
 
-from nltk.corpus import stopwords
-from scipy.spatial.distance import cosine
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.preprocessing import normalize
+from multiprocessing import Pool
 
 from aliases import AliasesManager
 from collocates import CollocatesManager
 from corpus import CorpusManager
-from ranks import RANK_GROUPS
+from homogeneity import build_character_matrix, calc_homogeneities, \
+	count_character_terms
+from prefetch import READ_ERRORS
+from resources import resources
 
 
 # Configure logging
@@ -31,7 +30,23 @@ logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
 	level=logging.INFO)
 
 
-STOPWORDS = stopwords.words('english')
+STOPWORDS = resources.get('stopwords')
+
+
+collocates_manager = CollocatesManager()
+
+
+# Worker function, returning the collocate term counts of each of the given
+# characters of the given story (None if its collocates can't be read).
+def count_story_terms(params):
+	sid, ranks = params
+
+	try:
+		arrays = collocates_manager.get_arrays(sid, 'character')
+	except READ_ERRORS:
+		return None
+
+	return count_character_terms(arrays, ranks)
 
 
 def main():
@@ -41,15 +56,48 @@ def main():
 	parser = argparse.ArgumentParser(description=parser_description)
 
 	parser.add_argument('out_path', help="Path to output .tsv file")
+
+	parser.add_argument('-n', '--num-workers', dest='n', type=int, default=1,
+		help="# worker threads to spawn (Default is 1)")
+	parser.add_argument('-r', '--ranks', dest='ranks', type=int, nargs=2,
+		default=[1, 5], metavar=('FIRST', 'LAST'),
+		help="Range of character ranks to compare (Default is 1 to 5)")
 	
 	args = parser.parse_args()
 
 	aliases_manager = AliasesManager()
-	collocates_manager = CollocatesManager()
 	corpus_manager = CorpusManager()
+
+	ranks = range(args.ranks[0], args.ranks[1] + 1)
 	
 	# Story Id's
-	sids = corpus_manager.get_ids(origin='gen')
+	sids = []
+	for sid in corpus_manager.get_ids(origin='gen'):
+		if not aliases_manager.saved(sid, tpe='character') or \
+			not collocates_manager.saved(sid, tpe='character'):
+			logging.info("Skipping %s..." % sid)
+			continue
+
+		sids.append(sid)
+
+	pool = Pool(args.n)
+	story_cntrs = pool.map(count_story_terms, [(sid, ranks) for sid in sids])
+	pool.close()
+	pool.join()
+
+	# Stories whose collocates can't be read are skipped.
+	skipped = [sid for sid, cntrs in zip(sids, story_cntrs) if cntrs is None]
+	sids = [sid for sid, cntrs in zip(sids, story_cntrs) if cntrs is not None]
+	story_cntrs = [cntrs for cntrs in story_cntrs if cntrs is not None]
+
+	# All stories' characters share one vocabulary, with stopwords masked out.
+	X, story_inds, vocab = build_character_matrix(story_cntrs)
+	stop_cols = np.zeros(len(vocab), dtype=bool)
+	stop_ids = vocab.encode(STOPWORDS)
+	stop_cols[stop_ids[stop_ids >= 0]] = True
+
+	homogeneities, empty = calc_homogeneities(X, story_inds, len(sids),
+		stop_cols)
 	
 	with open(args.out_path, 'wb') as f:
 		writer = csv.writer(f, delimiter='\t', quotechar='"')
@@ -57,40 +105,16 @@ def main():
 		# Write header.
 		writer.writerow(['STORY ID', 'HOMOGENEITY'])
 
-		for sid in sids:
-			if not aliases_manager.saved(sid, tpe='character') or \
-				not collocates_manager.saved(sid, tpe='character'):
-				logging.info("Skipping %s..." % sid)
-				continue
+		for sid in skipped:
+			logging.info("Skipping %s" % sid)
 
-			logging.info("For %s" % sid)
-
-			try:
-				collocates = collocates_manager.get(sid, tpe='character',
-					ranks=range(1, 6))
-
-				keyfunc = lambda c: c['alias']['entity']['rank']
-				collocates = sorted(collocates, key=keyfunc)
-				
-				grouped_collocates = {r: list(cs) for r, cs
-					in it.groupby(collocates, key=keyfunc)}
-
-				count_vect = CountVectorizer(stop_words=STOPWORDS)
-				count_vect.fit([' '.join([c['token']['lemma'] for c in cs])
-					for _, cs in grouped_collocates.iteritems()])
-
-				vecs = []
-				for rank, colls in grouped_collocates.iteritems():
-					vec = count_vect.transform([' '.join([coll['token']['lemma']
-						for coll in colls])]).astype(float)
-					vecs.append(normalize(vec).todense())
-
-				pairwise_sims = [1 - cosine(vec1, vec2) for vec1, vec2
-					in it.combinations(vecs, 2)]
-					
-				writer.writerow([sid, np.mean(pairwise_sims)])
-			except (IndexError, ValueError):
+		for sid, homogeneity, is_empty in zip(sids, homogeneities, empty):
+			# Stories without any (non-stopword) collocates have no vectors.
+			if is_empty:
 				logging.info("Skipping %s" % sid)
+				continue
+
+			writer.writerow([sid, homogeneity])
 
 
 if __name__ == '__main__':
@@ -12,9 +12,7 @@ import os
 import sys
 sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
 
-from collections import Counter
-
-from aliases import AliasesManager
+from aliases import AliasesManager, get_rank_mentions
 from corpus import CorpusManager
 from ranks import RANK_GROUPS
 
@@ -24,10 +22,11 @@ logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
 	level=logging.INFO)
 
 
-# Returns a the number of mentions for characters with the given ranks.
-def get_num_mentions(aliases, ranks):
-	ranks = set(ranks)
-	return len([al for al in aliases if al['entity']['rank'] in ranks])
+# Returns a the number of mentions for characters with the given ranks,
+# according to the given mention summaries.
+def get_num_mentions(summaries, ranks):
+	cntr = get_rank_mentions(summaries)
+	return sum(cntr[rank] for rank in set(ranks))
 
 
 def main():
@@ -50,6 +49,10 @@ def main():
 	# Story Id's.
 	sids = wcs.keys()
 
+	# Character mention summaries of all stories.
+	logging.info("Reading character mentions table...")
+	mentions = aliases_manager.get_mentions_table('character')
+
 	# Create the output directory if it doesn't already exist.
 	if not os.path.exists(args.out_dirpath):
 		os.makedirs(args.out_dirpath)
@@ -70,14 +73,13 @@ def main():
 				'# CHAR. PER 100000 WORDS'])
 
 			for sid in sids:
-				if not aliases_manager.saved(sid, tpe='character'):
+				if sid not in mentions:
 					logging.info("Skipping %s..." % sid)
 					continue
 
-				aliases = aliases_manager.get_aliases(sid, tpe='character')
-
 				row = [sid,
-					get_num_mentions(aliases, ranks) * 100000 / float(wcs[sid]),
+					get_num_mentions(mentions[sid], ranks) * 100000 /
+						float(wcs[sid]),
 					float(len(ranks)) * 100000 / wcs[sid]]
 				
 				writer.writerow(row)
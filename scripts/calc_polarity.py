@@ -13,12 +13,12 @@ import os
 import sys
 sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
 
-from collections import defaultdict
-from nltk.corpus import sentiwordnet as swn
-
 from collocates import CollocatesManager
 from corpus import CorpusManager
+from prefetch import prefetch_collocates
 from ranks import RANK_GROUPS
+from resources import resources
+from sentiment import calc_polarity, get_wn_pos
 
 
 # Configure logging
@@ -26,41 +26,6 @@ logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
 	level=logging.INFO)
 
 
-# Calculates the polarity between the lists of collocates as the difference
-# between sentiment scores of the most positive collocate in the first list to
-# the most negative collocate in the second.
-def calc_polarity(collocates1, collocates2):
-	# Returns the total sentiment scores for each character (as rank).
-	def get_sentiment_dict(collocates):
-		sentiments = defaultdict(float)
-		for coll in collocates:
-			try:
-				sentisyns = swn.senti_synsets(coll['token']['lemma'])
-
-				if len(sentisyns) == 0:
-					continue
-
-				sentiments[coll['alias']['entity']['rank']] = \
-					(sentisyns[0].pos_score() - sentisyns[0].neg_score())
-			except UnicodeDecodeError:
-				pass
-
-		return sentiments
-
-	sentiments1 = get_sentiment_dict(collocates1)
-	sentiments2 = get_sentiment_dict(collocates2)
-
-	polarity = 0.0
-	for rank1, sentiment1 in sentiments1.iteritems():
-		for rank2, sentiment2 in sentiments2.iteritems():
-			diff = abs(sentiment1 - sentiment2)
-
-			if polarity < diff:
-				polarity = diff
-
-	return polarity
-
-
 def main():
 	parser_description = ("Calculates the polarity of stories (as the "
 		"difference in sentiment scores of most positive and most negative "
@@ -70,10 +35,15 @@ def main():
 	parser.add_argument('out_dirpath', help="Path to output directory for "
 		"generated .tsv files")
 
+	parser.add_argument('--pos', dest='pos', action='store_true',
+		help="Look up sentiment scores by the part-of-speech of each "
+		"collocate's dependency type")
+
 	args = parser.parse_args()
 
 	collocates_manager = CollocatesManager()
 	corpus_manager = CorpusManager()
+	sentiwordnet_table = resources.get('sentiwordnet')
 	
 	# Get publication dates for all stories.
 	dates = corpus_manager.get_dates()
@@ -84,6 +54,8 @@ def main():
 	if not os.path.exists(args.out_dirpath):
 		os.makedirs(args.out_dirpath)
 
+	# Output files and writers by rank group, along with the ranks to compare.
+	files, writers = [], []
 	for rg in RANK_GROUPS:
 		rg_name, ranks = rg
 
@@ -93,37 +65,45 @@ def main():
 
 		path = os.path.join(args.out_dirpath, '%s.tsv' % rg_name.lower())
 
-		logging.info("Calculating for %s... (Outputting to %s)" %
-			(rg_name, path))
+		logging.info("Outputting to %s..." % path)
 
+		# Always compare against the remaining ranks in the top 5 grouping
+		# (None remain for the Top-5 group itself, which is compared against
+		# all characters).
 		other_ranks = [r for r in range(1, 6) if r not in ranks]
 
-		with open(path, 'wb') as f:
-			writer = csv.writer(f, delimiter='\t', quotechar='"')
+		f = open(path, 'wb')
+		writer = csv.writer(f, delimiter='\t', quotechar='"')
+
+		# Write header.
+		writer.writerow(['STORY ID', 'PUB. DATE', 'GENRE', 'POLARITY'])
+
+		files.append(f)
+		writers.append((writer, ranks, other_ranks))
+
+	for sid, arrays in prefetch_collocates(collocates_manager, sids,
+		'character', arrays=True):
+		if arrays is None:
+			logging.info("Skipping %s..." % sid)
+			continue
 
-			# Write header.
-			writer.writerow(['STORY ID', 'PUB. DATE', 'GENRE', 'POLARITY'])
+		# Each story's collocates are read and scored once, for all rank
+		# groups.
+		sentiments = sentiwordnet_table.get_sentiments(arrays['lemma'],
+			[get_wn_pos(t) for t in arrays['type']] if args.pos else None)
 
-			for sid in sids:
-				if not collocates_manager.saved(sid, tpe='character'):
-					logging.info("Skipping %s..." % sid)
-					continue
+		genre = (None if sid.startswith('000') else
+			corpus_manager.get_genre(sid))
 
-				collocates1 = collocates_manager.get(sid, tpe='character',
-					ranks=ranks)
+		for writer, ranks, other_ranks in writers:
+			row = [sid, dates[sid] if sid in dates else 'DNE',
+				genre if genre else 'DNE',
+				calc_polarity(arrays['rank'], sentiments, ranks, other_ranks)]
 
-				# Always compare against the remaining ranks in the top 5
-				# grouping.
-				collocates2 = collocates_manager.get(sid, tpe='character',
-					ranks=other_ranks)
+			writer.writerow(row)
 
-				genre = (None if sid.startswith('000') else
-					corpus_manager.get_genre(sid))
-				row = [sid, dates[sid] if sid in dates else 'DNE',
-					genre if genre else 'DNE',
-					calc_polarity(collocates1, collocates2)]
-					
-				writer.writerow(row)
+	for f in files:
+		f.close()
 	
 if __name__ == '__main__':
 	main()
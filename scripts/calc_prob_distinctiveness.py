@@ -7,21 +7,22 @@ series of .tsv files.
 """
 
 import argparse
-import csv
 import logging
 import os
 import random
 import sys
 sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
 
-from collections import defaultdict
-from multiprocessing import Process
+from collections import OrderedDict
 
 from aliases import AliasesManager
+from calcmap import cached_worker, StoryMapReducer
+from checkpoint import digest
 from collocates import CollocatesManager
 from corpus import CorpusManager
 from distinctiveness import KLDistinctivenessCalculator, \
 	TVDistinctivenessCalculator
+from prefetch import READ_ERRORS
 from ranks import RANK_GROUPS
 from role import ROLES
 
@@ -31,6 +32,47 @@ logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
 	level=logging.INFO)
 
 
+collocates_manager = CollocatesManager()
+
+# Calculators by rank group and role (Set by main before the workers are
+# forked).
+distinct_calculators = OrderedDict()
+
+
+# Loader of the (character and noun) collocates of a story (None if they can't
+# be read), prefetched while the previous stories are calculated (See
+# prefetch.py).
+def load_collocates(sid):
+	try:
+		return collocates_manager.get(sid, tpe='character'), \
+			collocates_manager.get(sid, tpe='noun')
+	except READ_ERRORS:
+		return None
+
+
+# Worker function, returning the distinctiveness of the given story for each
+# rank group and role from its (character and noun) collocates (None if they
+# can't be read).
+@cached_worker('calc_prob_distinctiveness/1', ['character', 'noun'],
+	lambda sid: [[rg_name, role, list(calculator.ranks),
+		type(calculator).__name__]
+		for (rg_name, role), calculator in distinct_calculators.iteritems()])
+def calc_distinctiveness(sid, collocates):
+	if collocates is None:
+		return None
+
+	char_collocates, noun_collocates = collocates
+
+	vals = {}
+	for (rg_name, role), calculator in distinct_calculators.iteritems():
+		vals[(rg_name, role)] = [calculator.calc(
+			char_collocates=collocates_manager.filter(char_collocates,
+				role=role, ranks=calculator.ranks),
+			noun_collocates=noun_collocates)]
+
+	return vals
+
+
 def main():
 	parser_description = ("Calculates the probability distrubtion "
 		"difference-based distinctiveness for each story across a range of "
@@ -47,6 +89,11 @@ def main():
 	
 	parser.add_argument('-s', '--sample', help="# sampled stories",
 		type=int)
+	parser.add_argument('--seed', type=int, help="Random seed for sampling "
+		"stories (An interrupted run with --sample only resumes with the same "
+		"sample)")
+	parser.add_argument('--restart', dest='restart', action='store_true',
+		help="Start over instead of resuming an interrupted run")
 
 	args = parser.parse_args()
 
@@ -60,78 +107,58 @@ def main():
 	roles = [None] + ROLES
 
 	aliases_manager = AliasesManager()
-	collocates_manager = CollocatesManager()
 	corpus_manager = CorpusManager()
 	
 	# Story Id's.
 	if args.sample:
-		sids = random.sample(corpus_manager.get_ids(origin='gen'), args.sample)
+		sids = random.Random(args.seed).sample(
+			corpus_manager.get_ids(origin='gen'), args.sample)
 	else:
 		sids = corpus_manager.get_ids(origin='gen')
 
+	sids = [sid for sid in sids if aliases_manager.saved(sid, tpe='character')
+		and aliases_manager.saved(sid, tpe='noun') and
+		collocates_manager.saved(sid, tpe='character')]
+
+	# A resumed run with another sample starts over, rather than mixing rows
+	# of both.
+	signature = [args.measure]
+	if args.sample:
+		signature.append(digest(sorted(sids)))
+
 	# Get publication dates for all stories.
 	dates = corpus_manager.get_dates()
 
-	# Group parameter settings for each worker process.
-	param_groups, i = defaultdict(list), 0
-	for rg in RANK_GROUPS:
+	for rg_name, ranks in RANK_GROUPS:
 		for role in roles:
-			param_groups[i % args.n].append((rg, role))
-			i += 1
-
-	# Create the output directory if it doesn't already exist.
-	if not os.path.exists(args.out_dirpath):
-		os.makedirs(args.out_dirpath)
-
-	def run_distinctiveness_calc(worker_name, params):
-		for rg, role in params:
-			rg_name, ranks = rg[0], rg[1]
-
-			role_name = role.lower() if role else 'all'
-
-			if args.sample:
-				out_path = os.path.join(args.out_dirpath, '%s-%s-%d.tsv' % 
-					(role_name, rg_name.lower(), args.sample))
-			else:
-				out_path = os.path.join(args.out_dirpath, '%s-%s.tsv' % 
-					(role_name, rg_name.lower()))
-
-			logging.info(worker_name + ": Processing... (Outputting to %s)" %
-				out_path)
-		
 			if args.measure == 'kl':
-				distinct_calculator = KLDistinctivenessCalculator(role=role,
-					ranks=ranks)
+				distinct_calculators[(rg_name, role)] = \
+					KLDistinctivenessCalculator(role=role, ranks=ranks)
 			elif args.measure == 'tv':
-				distinct_calculator = TVDistinctivenessCalculator(role=role,
-					ranks=ranks)
-
-			with open(out_path, 'wb') as f:
-				writer = csv.writer(f, delimiter='\t', quotechar='"')
-
-				# Write header.
-				writer.writerow(['STORY ID', 'PUB. DATE', 'DISTINCTIVENESS'])
-
-				for sid in sids:
-					if not aliases_manager.saved(sid, tpe='character') or \
-						not aliases_manager.saved(sid, tpe='noun') or \
-						not collocates_manager.saved(sid, tpe='character'):
-						logging.info(worker_name + ": Skipping %s..." % sid)
-						continue
-					
-					# TODO: Temporary measure.
-					try:
-						writer.writerow([sid, dates[sid],
-							distinct_calculator.calc(sid)])
-					except StopIteration:
-						continue
-			
-			logging.info(worker_name + ": Finished!")	
-	
-	for i, params in param_groups.iteritems():
-		p = Process(target=run_distinctiveness_calc, args=("T%d" % (i + 1),
-			params,))
-		p.start()
+				distinct_calculators[(rg_name, role)] = \
+					TVDistinctivenessCalculator(role=role, ranks=ranks)
+
+	# Returns the name of the .tsv file of the given rank group and role.
+	def get_filename(key):
+		rg_name, role = key
+		role_name = role.lower() if role else 'all'
+
+		if args.sample:
+			return '%s-%s-%d.tsv' % (role_name, rg_name.lower(), args.sample)
+		else:
+			return '%s-%s.tsv' % (role_name, rg_name.lower())
+
+	# Each story is calculated by one worker, for all rank groups and roles.
+	map_reducer = StoryMapReducer(args.out_dirpath, distinct_calculators.keys(),
+		['STORY ID', 'PUB. DATE', 'DISTINCTIVENESS'], filename=get_filename,
+		n=args.n)
+	map_reducer.run(calc_distinctiveness, sids,
+		prefix=lambda sid: [sid, dates[sid]],
+		signature=signature, resume=not args.restart,
+		load=load_collocates)
+
+	logging.info("Finished!")
+
 
 if __name__ == '__main__':
 	main()
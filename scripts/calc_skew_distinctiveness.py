@@ -6,19 +6,18 @@ roles and character rank groups, saving the results in a series of .tsv files.
 """
 
 import argparse
-import csv
 import logging
 import os
 import sys
 sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
 
-from collections import defaultdict
-from multiprocessing import Process
-
 from aliases import AliasesManager
+from calcmap import cached_worker, StoryMapReducer
 from collocates import CollocatesManager
 from corpus import CorpusManager
-from distinctiveness import SkewDistinctivenessCalculator
+from distinctiveness import get_moments_params, \
+	MomentsDistinctivenessCalculator
+from prefetch import READ_ERRORS
 from ranks import RANK_GROUPS
 from role import ROLES
 
@@ -28,6 +27,38 @@ logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
 	level=logging.INFO)
 
 
+# Rank groups and roles (None for considering all roles) to output.
+PARAMS = [(rg, None) for rg in RANK_GROUPS
+	if rg[0].lower() == 'all' or rg[0].lower() == 'top']
+
+collocates_manager = CollocatesManager()
+
+# Calculator for the rank groups and roles to output.
+moments_calculator = MomentsDistinctivenessCalculator(
+	[rg for rg, _ in PARAMS], sorted(set(role for _, role in PARAMS)))
+
+
+# Loader of the collocates of a story (None if they can't be read), prefetched
+# while the previous stories are calculated (See prefetch.py).
+def load_collocates(sid):
+	try:
+		return collocates_manager.get(sid, tpe='character')
+	except READ_ERRORS:
+		return None
+
+
+# Worker function, returning the skew of the given story for each rank group and
+# role from its collocates (None if they can't be read).
+@cached_worker('calc_skew_distinctiveness/1', ['character'],
+	lambda sid: get_moments_params(moments_calculator, sid))
+def calc_skews(sid, collocates):
+	if collocates is None:
+		return None
+
+	return {k: [skew] for k, (skew, _)
+		in moments_calculator.calc(collocates=collocates).iteritems()}
+
+
 def main():
 	parser_description = ("Calculates the skew-based distinctiveness for each "
 		"story across a range of roles and character rank groups, saving the "
@@ -37,81 +68,43 @@ def main():
 	parser.add_argument('out_dirpath', help="Path to output directory")
 
 	parser.add_argument('n', help="# worker threads to spawn", type=int)
-	
-	args = parser.parse_args()
+	parser.add_argument('--restart', dest='restart', action='store_true',
+		help="Start over instead of resuming an interrupted run")
 
-	# Add None for considering all roles.
-	roles = [None] + ROLES
+	args = parser.parse_args()
 
 	aliases_manager = AliasesManager()
-	collocates_manager = CollocatesManager()
 	corpus_manager = CorpusManager()
 	
 	# Get publication dates for all stories.
 	dates = corpus_manager.get_dates()
 	# Story Id's.
-	sids = corpus_manager.get_ids(origin='gen')
-
-	# Group parameter settings for each worker process.
-	param_groups, i = defaultdict(list), 0
-	for rg in RANK_GROUPS:
-		for role in roles:
-			param_groups[i % args.n].append((rg, role))
-			i += 1
-
-	# Create the output directory if it doesn't already exist.
-	if not os.path.exists(args.out_dirpath):
-		os.makedirs(args.out_dirpath)
-
-	def run_distinctiveness_calc(worker_name, params):
-		for rg, role in params:
-			rg_name, ranks = rg[0], rg[1]
-
-			role_name = role.lower() if role else 'all'
+	sids = []
+	for sid in corpus_manager.get_ids(origin='gen'):
+		if not aliases_manager.saved(sid, tpe='character') or \
+			not collocates_manager.saved(sid, tpe='character'):
+			logging.info("Skipping %s..." % sid)
+			continue
 
-			if role_name != 'all':
-				continue
+		sids.append(sid)
 
-			if rg_name.lower() != 'all' and rg_name.lower() != 'top':
-				continue
+	# Returns the first values of the row of the given story.
+	def get_prefix(sid):
+		genre = (None if sid.startswith('000') else
+			corpus_manager.get_genre(sid))
 
-			out_path = os.path.join(args.out_dirpath, '%s-%s.tsv' % (role_name,
-				rg_name.lower()))
+		return [sid, dates[sid] if sid in dates else 'DNE',
+			genre if genre else 'DNE']
 
-			logging.info(worker_name + ": Processing... (Outputting to %s)" %
-				out_path)
-		
-			distinct_calculator = SkewDistinctivenessCalculator(role=role,
-				ranks=ranks)
+	# Each story's collocates are read once, for all rank groups and roles.
+	map_reducer = StoryMapReducer(args.out_dirpath,
+		[(rg_name, role) for (rg_name, _), role in PARAMS],
+		['STORY ID', 'PUB. DATE', 'GENRE', 'DISTINCTIVENESS'], n=args.n)
+	map_reducer.run(calc_skews, sids, prefix=get_prefix,
+		resume=not args.restart, load=load_collocates)
 
-			with open(out_path, 'wb') as f:
-				writer = csv.writer(f, delimiter='\t', quotechar='"')
+	logging.info("Finished!")
 
-				# Write header.
-				writer.writerow(['STORY ID', 'PUB. DATE', 'GENRE',
-					'DISTINCTIVENESS'])
-
-				for sid in sids:
-					if not aliases_manager.saved(sid, tpe='character') or \
-						not collocates_manager.saved(sid, tpe='character'):
-						logging.info(worker_name + ": Skipping %s..." % sid)
-						continue
-
-					genre = (None if sid.startswith('000') else
-						corpus_manager.get_genre(sid))
-
-					row = [sid, dates[sid] if sid in dates else 'DNE',
-						genre if genre else 'DNE',
-						distinct_calculator.calc(sid)]
-
-					writer.writerow(row)
-			
-			logging.info(worker_name + ": Finished!")	
-	
-	for i, params in param_groups.iteritems():
-		p = Process(target=run_distinctiveness_calc, args=("T%d" % (i + 1),
-			params,))
-		p.start()
 
 if __name__ == '__main__':
 	main()
@@ -7,45 +7,72 @@ series of .tsv files.
 """
 
 import argparse
-import csv
 import logging
 import os
 import sys
 sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
 
-from collections import defaultdict
-from multiprocessing import Process
-from nltk.stem import WordNetLemmatizer
-
 from aliases import AliasesManager
+from calcmap import cached_worker, StoryMapReducer
 from collocates import CollocatesManager
 from corpus import CorpusManager
 from distinctiveness import SkewDistinctivenessCalculator
+from prefetch import READ_ERRORS
 from ranks import RANK_GROUPS
-from role import ROLES
+from resources import resources, SAID_WORDS_FPATH
 
 
 # Configure logging
 logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
 	level=logging.INFO)
 
-# Filepath to "said" words.
-SAID_DICT_PATH = "../resources/said_dict.txt"
+# Rank groups and roles (None for considering all roles) to output.
+PARAMS = [(rg, None) for rg in RANK_GROUPS
+	if rg[0].lower() == 'all' or rg[0].lower() == 'top']
+
+
+collocates_manager = CollocatesManager()
+
+# "Said" words (Set by main before the workers are forked).
+said_words = frozenset()
+
+
+# Loader of the collocates of a story (None if they can't be read), prefetched
+# while the previous stories are calculated (See prefetch.py).
+def load_collocates(sid):
+	try:
+		return collocates_manager.get(sid, tpe='character')
+	except READ_ERRORS:
+		return None
 
 
-# Returns a set of "said" words, lemmatized.
-def load_said_words():
-	words = []
-	with open(SAID_DICT_PATH) as f:
-		for line in f:
-			words += [p.strip().replace(' ', '-') for p in line.split('\t')]
+# Worker function, returning the skew (minus communication words) of the given
+# story for each rank group and role (None if its collocates can't be read).
+@cached_worker('calc_skew_distinctiveness_minus_comm/1', ['character'],
+	lambda sid: [[rg_name, list(ranks), role]
+		for (rg_name, ranks), role in PARAMS],
+	lambda: [SAID_WORDS_FPATH])
+def calc_skews(sid, collocates):
+	if collocates is None:
+		return None
 
-	lemmatizer = WordNetLemmatizer()
+	comm_collocates = [coll for coll in collocates
+		if coll['token']['lemma'] not in said_words]
+
+	skews = {}
+	for (rg_name, ranks), role in PARAMS:
+		distinct_calculator = SkewDistinctivenessCalculator(role=role,
+			ranks=ranks)
+		skews[(rg_name, role)] = [distinct_calculator.calc(
+			collocates=collocates_manager.filter(comm_collocates, role=role,
+				ranks=ranks))]
+
+	return skews
 
-	# Lemmatize and convert to set and add 'say'.
-	return set([lemmatizer.lemmatize(w) for w in words] + ['say'])
 
 def main():
+	global said_words
+
 	parser_description = ("Calculates the skew-based distinctiveness for each "
 		"story across a range of roles and character rank groups, saving the "
 		"results in a series of .tsv files.")
@@ -54,92 +81,47 @@ def main():
 	parser.add_argument('out_dirpath', help="Path to output directory")
 
 	parser.add_argument('n', help="# worker threads to spawn", type=int)
-	
-	args = parser.parse_args()
+	parser.add_argument('--restart', dest='restart', action='store_true',
+		help="Start over instead of resuming an interrupted run")
 
-	# Add None for considering all roles.
-	roles = [None] + ROLES
+	args = parser.parse_args()
 
 	aliases_manager = AliasesManager()
-	collocates_manager = CollocatesManager()
 	corpus_manager = CorpusManager()
 	
 	# Get publication dates for all stories.
 	dates = corpus_manager.get_dates()
 	# Story Id's.
-	sids = corpus_manager.get_ids(origin='gen')
+	sids = []
+	for sid in corpus_manager.get_ids(origin='gen'):
+		if not aliases_manager.saved(sid, tpe='character') or \
+			not collocates_manager.saved(sid, tpe='character'):
+			logging.info("Skipping %s..." % sid)
+			continue
 
-	# Group parameter settings for each worker process.
-	param_groups, i = defaultdict(list), 0
-	for rg in RANK_GROUPS:
-		for role in roles:
-			param_groups[i % args.n].append((rg, role))
-			i += 1
+		sids.append(sid)
 
-	# Create the output directory if it doesn't already exist.
-	if not os.path.exists(args.out_dirpath):
-		os.makedirs(args.out_dirpath)
+	# Loaded before forking, so that the workers share them.
+	resources.preload(['said_words'])
+	said_words = resources.get('said_words')
 
-	said_words = load_said_words()
+	# Returns the first values of the row of the given story.
+	def get_prefix(sid):
+		genre = (None if sid.startswith('000') else
+			corpus_manager.get_genre(sid))
 
-	def run_distinctiveness_calc(worker_name, params):
-		for rg, role in params:
-			rg_name, ranks = rg[0], rg[1]
+		return [sid, dates[sid] if sid in dates else 'DNE',
+			genre if genre else 'DNE']
 
-			role_name = role.lower() if role else 'all'
-			out_path = os.path.join(args.out_dirpath, '%s-%s.tsv' % (role_name,
-				rg_name.lower()))
+	# Each story is calculated by one worker, for all rank groups and roles.
+	map_reducer = StoryMapReducer(args.out_dirpath,
+		[(rg_name, role) for (rg_name, _), role in PARAMS],
+		['STORY ID', 'PUB. DATE', 'GENRE', 'DISTINCTIVENESS'], n=args.n)
+	map_reducer.run(calc_skews, sids, prefix=get_prefix,
+		resume=not args.restart, load=load_collocates)
 
-			if role_name != 'all':
-				continue
+	logging.info("Finished!")
 
-			if rg_name.lower() != 'all' and rg_name.lower() != 'top':
-				continue
-
-			logging.info(worker_name + ": Processing... (Outputting to %s)" %
-				out_path)
-		
-			distinct_calculator = SkewDistinctivenessCalculator(role=role,
-				ranks=ranks)
-
-			with open(out_path, 'wb') as f:
-				writer = csv.writer(f, delimiter='\t', quotechar='"')
-
-				# Write header.
-				writer.writerow(['STORY ID', 'PUB. DATE', 'GENRE',
-					'DISTINCTIVENESS'])
-
-				for sid in sids:
-					if not aliases_manager.saved(sid, tpe='character') or \
-						not collocates_manager.saved(sid, tpe='character'):
-						logging.info(worker_name + ": Skipping %s..." % sid)
-						continue
-
-					genre = (None if sid.startswith('000') else
-						corpus_manager.get_genre(sid))
-
-					try:
-						collocates = collocates_manager.get(sid,
-							tpe='character', role=role, ranks=ranks)
-
-						comm_collocates = [coll for coll in collocates
-							if coll['token']['lemma'] not in said_words]
-
-						row = [sid, dates[sid] if sid in dates else 'DNE',
-							genre if genre else 'DNE',
-							distinct_calculator.calc(collocates=comm_collocates)]
-
-						writer.writerow(row)
-
-					except IndexError:
-						logging.info(worker_name + ": Skipping %s..." % sid)
-			
-			logging.info(worker_name + ": Finished!")	
-	
-	for i, params in param_groups.iteritems():
-		p = Process(target=run_distinctiveness_calc, args=("T%d" % (i + 1),
-			params,))
-		p.start()
 
 if __name__ == '__main__':
 	main()
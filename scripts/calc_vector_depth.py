@@ -6,20 +6,21 @@ character rank groups, saving the results in a series of .tsv files.
 """
 
 import argparse
-import csv
 import logging
 import os
 import sys
 sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
 
-from collections import defaultdict
-from multiprocessing import Process
+from collections import OrderedDict
 
 from aliases import AliasesManager
+from calcmap import cached_worker, StoryMapReducer
 from collocates import CollocatesManager
 from corpus import CorpusManager
 from depth import VectorDepthCalculator
+from prefetch import READ_ERRORS
 from ranks import RANK_GROUPS
+from resources import resources
 from role import ROLES
 
 
@@ -28,6 +29,37 @@ logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
 	level=logging.INFO)
 
 
+collocates_manager = CollocatesManager()
+
+# Calculators by rank group and role (Set by main before the workers are
+# forked).
+depth_calculators = OrderedDict()
+
+
+# Loader of the collocates of a story (None if they can't be read), prefetched
+# while the previous stories are calculated (See prefetch.py).
+def load_collocates(sid):
+	try:
+		return collocates_manager.get(sid, tpe='character')
+	except READ_ERRORS:
+		return None
+
+
+# Worker function, returning the depth of the given story for each rank group
+# and role from its collocates (None if they can't be read).
+@cached_worker('calc_vector_depth/1', ['character'],
+	lambda sid: [[rg_name, role, list(calculator.ranks)]
+		for (rg_name, role), calculator in depth_calculators.iteritems()],
+	lambda: depth_calculators.values()[0].MODEL.get_fpaths())
+def calc_depths(sid, collocates):
+	if collocates is None:
+		return None
+
+	return {k: list(calculator.calc(collocates=collocates_manager.filter(
+		collocates, role=calculator.role, ranks=calculator.ranks)))
+		for k, calculator in depth_calculators.iteritems()}
+
+
 def main():
 	parser_description = ("Calculates the vector-based depth for each story "
 		"across a range of roles and character rank groups, saving the "
@@ -37,69 +69,58 @@ def main():
 	parser.add_argument('out_dirpath', help="Path to output directory")
 
 	parser.add_argument('n', help="# worker threads to spawn", type=int)
-	
+
+	parser.add_argument('--full', dest='full', action='store_true',
+		help="Use the full Word2Vec model instead of the collocate vectors")
+	parser.add_argument('--restart', dest='restart', action='store_true',
+		help="Start over instead of resuming an interrupted run")
+
 	args = parser.parse_args()
 
 	# Add None for considering all roles.
 	roles = [None] + ROLES
 
 	aliases_manager = AliasesManager()
-	collocates_manager = CollocatesManager()
 	corpus_manager = CorpusManager()
 	
 	# Get publication dates for all stories.
 	dates = corpus_manager.get_dates()
 	# Story Id's.
-	sids = dates.keys()
+	sids = []
+	for sid in dates.keys():
+		if not aliases_manager.saved(sid, tpe='character') or \
+			not collocates_manager.saved(sid, tpe='character'):
+			logging.info("Skipping %s..." % sid)
+			continue
+
+		sids.append(sid)
+
+	# Map the Word2Vec model before forking, so that the workers share it.
+	model_name = 'word2vec' if args.full else 'collocate_vectors'
+	resources.preload([model_name])
+	model = resources.get(model_name)
 
-	# Group parameter settings for each worker process.
-	param_groups, i = defaultdict(list), 0
-	for rg in RANK_GROUPS:
+	for rg_name, ranks in RANK_GROUPS:
 		for role in roles:
-			param_groups[i % args.n].append((rg, role))
-			i += 1
-
-	# Create the output directory if it doesn't already exist.
-	if not os.path.exists(args.out_dirpath):
-		os.makedirs(args.out_dirpath)
-
-	def run_depth_calc(worker_name, params):
-		for rg, role in params:
-			rg_name, ranks = rg[0], rg[1]
-
-			role_name = role.lower() if role else 'all'
-			out_path = os.path.join(args.out_dirpath, '%s-%s.tsv' % (role_name,
-				rg_name.lower()))
-
-			logging.info(worker_name + ": Processing... (Outputting to %s)" %
-				out_path)
-		
-			vecdepth_calculator = VectorDepthCalculator(role=role, ranks=ranks)
-
-			with open(out_path, 'wb') as f:
-				writer = csv.writer(f, delimiter='\t', quotechar='"')
-
-				# Write header.
-				writer.writerow(['STORY ID', 'PUB. DATE', 'GENRE', 'DEPTH AVG.',
-					'DEPTH STD.'])
-
-				for sid in sids:
-					if not aliases_manager.saved(sid, tpe='character') or \
-						not collocates_manager.saved(sid, tpe='character'):
-						logging.info(worker_name + ": Skipping %s..." % sid)
-						continue
-					
-					genre = (None if sid.startswith('000') else
-						corpus_manager.get_genre(sid))
-
-					writer.writerow([sid, dates[sid], genre if genre else 'DNE']
-						+ list(vecdepth_calculator.calc(sid)))
-			
-			logging.info(worker_name + ": Finished!")	
-	
-	for i, params in param_groups.iteritems():
-		p = Process(target=run_depth_calc, args=("T%d" % (i + 1), params,))
-		p.start()
+			depth_calculators[(rg_name, role)] = VectorDepthCalculator(
+				role=role, ranks=ranks, model=model)
+
+	# Returns the first values of the row of the given story.
+	def get_prefix(sid):
+		genre = (None if sid.startswith('000') else
+			corpus_manager.get_genre(sid))
+
+		return [sid, dates[sid], genre if genre else 'DNE']
+
+	# Each story is calculated by one worker, for all rank groups and roles.
+	map_reducer = StoryMapReducer(args.out_dirpath, depth_calculators.keys(),
+		['STORY ID', 'PUB. DATE', 'GENRE', 'DEPTH AVG.', 'DEPTH STD.'],
+		n=args.n)
+	map_reducer.run(calc_depths, sids, prefix=get_prefix,
+		signature=[args.full], resume=not args.restart, load=load_collocates)
+
+	logging.info("Finished!")
+
 
 if __name__ == '__main__':
 	main()
@@ -6,22 +6,22 @@ character rank groups, saving the results in a series of .tsv files.
 """
 
 import argparse
-import csv
 import logging
-import numpy as np
 import os
-import random
 import sys
 sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
 
-from collections import defaultdict
-from multiprocessing import Process
+from collections import OrderedDict
 
 from aliases import AliasesManager
+from calcmap import cached_worker, StoryMapReducer
 from collocates import CollocatesManager
 from corpus import CorpusManager
 from depth import WordNetDepthCalculator
+from pathsim import PathSimilarityCache
+from prefetch import READ_ERRORS
 from ranks import RANK_GROUPS
+from resources import resources
 from role import ROLES
 
 
@@ -30,6 +30,48 @@ logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
 	level=logging.INFO)
 
 
+collocates_manager = CollocatesManager()
+
+# Calculators by rank group and role (Set by init_worker in each worker).
+depth_calculators = OrderedDict()
+
+
+# Worker initializer, creating the calculators of the worker. Path similarities
+# are shared by every story, rank group, and role (and, through the database, by
+# every worker and run).
+def init_worker(pool_size):
+	cache = PathSimilarityCache(n=pool_size)
+
+	# Add None for considering all roles.
+	for rg_name, ranks in RANK_GROUPS:
+		for role in [None] + ROLES:
+			depth_calculators[(rg_name, role)] = WordNetDepthCalculator(
+				role=role, ranks=ranks, cache=cache)
+
+
+# Loader of the collocates of a story (None if they can't be read), prefetched
+# while the previous stories are calculated (See prefetch.py).
+def load_collocates(sid):
+	try:
+		return collocates_manager.get(sid, tpe='character')
+	except READ_ERRORS:
+		return None
+
+
+# Worker function, returning the depth of the given story for each rank group
+# and role from its collocates (None if they can't be read).
+@cached_worker('calc_wn_depth/1', ['character'],
+	lambda sid: [[rg_name, role, list(calculator.ranks)]
+		for (rg_name, role), calculator in depth_calculators.iteritems()])
+def calc_depths(sid, collocates):
+	if collocates is None:
+		return None
+
+	return {k: [calculator.calc(collocates=collocates_manager.filter(
+		collocates, role=calculator.role, ranks=calculator.ranks))]
+		for k, calculator in depth_calculators.iteritems()}
+
+
 def main():
 	parser_description = ("Calculates the vector-based depth for each story "
 		"across a range of roles and character rank groups, saving the "
@@ -39,65 +81,54 @@ def main():
 	parser.add_argument('out_dirpath', help="Path to output directory")
 
 	parser.add_argument('n', help="# worker threads to spawn", type=int)
-	
+
+	parser.add_argument('-p', '--pool-size', dest='pool_size', type=int,
+		default=1, help="# processes for computing uncached synset pair path "
+		"similarities, with a single worker (Default is 1, for none)")
+	parser.add_argument('--restart', dest='restart', action='store_true',
+		help="Start over instead of resuming an interrupted run")
+
 	args = parser.parse_args()
 
-	# Add None for considering all roles.
-	roles = [None] + ROLES
+	# Workers of a pool can't have pools of their own.
+	if args.n > 1 and args.pool_size > 1:
+		parser.error("--pool-size can only be used with a single worker")
 
 	aliases_manager = AliasesManager()
-	collocates_manager = CollocatesManager()
 	corpus_manager = CorpusManager()
 	
 	# Story Id's.
-	sids = corpus_manager.get_ids(origin='gen')
+	sids = []
+	for sid in corpus_manager.get_ids(origin='gen'):
+		if not aliases_manager.saved(sid, tpe='character') or \
+			not collocates_manager.saved(sid, tpe='character'):
+			logging.info("Skipping %s..." % sid)
+			continue
+
+		sids.append(sid)
+
 	# Get publication dates for all stories.
 	dates = corpus_manager.get_dates()
 
-	# Group parameter settings for each worker process.
-	param_groups, i = defaultdict(list), 0
-	for rg in RANK_GROUPS:
-		for role in roles:
-			param_groups[i % args.n].append((rg, role))
-			i += 1
-
-	# Create the output directory if it doesn't already exist.
-	if not os.path.exists(args.out_dirpath):
-		os.makedirs(args.out_dirpath)
-
-	def run_depth_calc(worker_name, params):
-		for rg, role in params:
-			rg_name, ranks = rg[0], rg[1]
-
-			role_name = role.lower() if role else 'all'
-			out_path = os.path.join(args.out_dirpath, '%s-%s.tsv' % (role_name,
-				rg_name.lower()))
-
-			logging.info(worker_name + ": Processing... (Outputting to %s)" %
-				out_path)
-		
-			wndepth_calculator = WordNetDepthCalculator(role=role, ranks=ranks)
-
-			with open(out_path, 'wb') as f:
-				writer = csv.writer(f, delimiter='\t', quotechar='"')
-
-				# Write header.
-				writer.writerow(['STORY ID', 'PUB. DATE', 'DEPTH'])
-
-				for sid in sids:
-					if not aliases_manager.saved(sid, tpe='character') or \
-						not collocates_manager.saved(sid, tpe='character'):
-						logging.info(worker_name + ": Skipping %s..." % sid)
-						continue
-					
-					writer.writerow([sid, dates[sid],
-						wndepth_calculator.calc(sid)])
-			
-			logging.info(worker_name + ": Finished!")	
-	
-	for i, params in param_groups.iteritems():
-		p = Process(target=run_depth_calc, args=("T%d" % (i + 1), params,))
-		p.start()
+	# Read WordNet before forking, so that the workers share it.
+	resources.preload(['wordnet'])
+
+	# Each story is calculated by one worker, for all rank groups and roles.
+	map_reducer = StoryMapReducer(args.out_dirpath,
+		[(rg_name, role) for rg_name, _ in RANK_GROUPS
+			for role in [None] + ROLES],
+		['STORY ID', 'PUB. DATE', 'DEPTH'], n=args.n,
+		initializer=init_worker, initargs=(args.pool_size,))
+	map_reducer.run(calc_depths, sids,
+		prefix=lambda sid: [sid, dates[sid]], resume=not args.restart,
+		load=load_collocates)
+
+	# Calculated in this process (with a single worker).
+	if depth_calculators:
+		depth_calculators.values()[0].cache.close()
+
+	logging.info("Finished!")
+
 
 if __name__ == '__main__':
 	main()
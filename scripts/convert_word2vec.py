@@ -0,0 +1,47 @@
+"""
+Converts the (gzipped, binary) GoogleNews Word2Vec embeddings to an uncompressed
+.npy matrix and sorted .vocab file, which are memory-mapped on first use instead
+of being decompressed on every load.
+"""
+
+import argparse
+import logging
+import os
+import sys
+sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
+
+from corpus import DATA_DIRPATH
+from embeddings import WORD2VEC_PREFIX, convert_word2vec
+
+
+# Configure logging
+logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
+	level=logging.INFO)
+
+
+def main():
+	parser_description = ("Converts the (gzipped, binary) GoogleNews Word2Vec "
+		"embeddings to an uncompressed .npy matrix and sorted .vocab file, "
+		"which are memory-mapped on first use instead of being decompressed on "
+		"every load.")
+	parser = argparse.ArgumentParser(description=parser_description)
+
+	parser.add_argument('-i', '--in-path', dest='in_path',
+		default=os.path.join(DATA_DIRPATH,
+			'GoogleNews-vectors-negative300.bin.gz'),
+		help="Path to Word2Vec .bin(.gz) file")
+	parser.add_argument('-o', '--out-prefix', dest='out_prefix',
+		default=WORD2VEC_PREFIX, help="Output path prefix (.npy and .vocab)")
+
+	args = parser.parse_args()
+
+	logging.info("Converting %s..." % args.in_path)
+
+	num_words = convert_word2vec(args.in_path, args.out_prefix)
+
+	logging.info("Converted %d words (Outputting to %s.npy and %s.vocab)." %
+		(num_words, args.out_prefix, args.out_prefix))
+
+
+if __name__ == '__main__':
+	main()
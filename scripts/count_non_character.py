@@ -0,0 +1,73 @@
+"""
+Counts the non-character lemmas (those of tokens that are neither character
+aliases nor character collocates) of each story in the corpus with identified
+character aliases and parsed character collocates, saving them to a .bin file
+(If it doesn't already exist).
+"""
+
+import argparse
+import logging
+import os
+import sys
+sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
+
+from collections import defaultdict
+from multiprocessing import Process
+
+from aliases import AliasesManager
+from collocates import CollocatesManager
+from corpus import CorpusManager
+from noncharacter import NonCharacterManager
+
+
+# Configure logging
+logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
+	level=logging.INFO)
+
+
+def main():
+	parser_description = ("Counts the non-character lemmas (those of tokens "
+		"that are neither character aliases nor character collocates) of each "
+		"story in the corpus with identified character aliases and parsed "
+		"character collocates, saving them to a .bin file (If it doesn't "
+		"already exist).")
+	parser = argparse.ArgumentParser(description=parser_description)
+
+	parser.add_argument('n', help="# worker threads to spawn", type=int)
+
+	parser.add_argument('-f', '--force', dest='force', action='store_true',
+		help="Force re-counting")
+
+	args = parser.parse_args()
+
+	aliases_manager = AliasesManager()
+	collocates_manager = CollocatesManager()
+	corpus_manager = CorpusManager()
+	noncharacter_manager = NonCharacterManager()
+
+	sid_groups = defaultdict(list)
+	for i, sid in enumerate(corpus_manager.get_ids(origin='gen')):
+		sid_groups[i % args.n].append(sid)
+
+	def run_count_non_character(worker_name, sids):
+		for sid in sids:
+			# Only counts the lemmas if the corresponding character aliases
+			# .json and collocates .tsv exist, and the force option is
+			# specified or the saved .bin file doesn't exist.
+			if aliases_manager.saved(sid, 'character') and \
+				collocates_manager.saved(sid, 'character') and \
+				(args.force or not noncharacter_manager.saved(sid)):
+				logging.info(worker_name + ": Counting non-character lemmas "
+					"for " + sid + "...")
+
+				noncharacter_manager.gen(sid)
+			else:
+				logging.info(worker_name + ": Skipping " + sid + "...")
+
+	for i, g in sid_groups.iteritems():
+		p = Process(target=run_count_non_character, args=("T%d" % (i + 1), g,))
+		p.start()
+
+
+if __name__ == '__main__':
+	main()
@@ -14,7 +14,8 @@ from unigrams import UnigramsManager
 
 """
 Counts the unigrams for each story in the corpus with an identified character
-aliases .json file and outputs to a .tsv file (If it doesn't already exist).
+aliases .json file and outputs to a .tsv file (If it doesn't already exist),
+adding the counts to the corpus unigram matrix.
 """
 
 
@@ -56,6 +57,14 @@ def main():
 					" and saving to " + unigrams_fpath + "...")
 
 				unigrams_manager.gen(sid)
+			# Counts from before the corpus unigram matrix existed are added
+			# to it from the saved .tsv file.
+			elif os.path.exists(unigrams_fpath) and \
+				not unigrams_manager.stored(sid):
+				log(worker_name + ": Adding unigram counts for " + sid +
+					" to the corpus unigram matrix...")
+
+				unigrams_manager.index(sid)
 			else:
 				log(worker_name + ": Skipping " + sid + "...")
 
@@ -0,0 +1,87 @@
+"""
+Extracts the Word2Vec vectors of the collocate lemmas of every story in the
+corpus into a compact embedding table, with rows aligned to the corpus-level
+term vocabulary.
+"""
+
+import argparse
+import logging
+import os
+import sys
+sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
+
+from multiprocessing import Pool
+
+from collocates import CollocatesManager
+from corpus import CorpusManager
+from embeddings import COLLOCATE_VECTORS_PREFIX, DTYPES, WORD2VEC_PREFIX, \
+	Embeddings, extract_compact_embeddings
+
+
+# Configure logging
+logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
+	level=logging.INFO)
+
+
+collocates_manager = CollocatesManager()
+
+
+# Worker function, returning the collocate lemmas of the given story for each
+# collocate type.
+def get_lemmas(params):
+	sid, tpes = params
+	return set().union(*[collocates_manager.get_lemmas(sid, tpe)
+		for tpe in tpes if collocates_manager.saved(sid, tpe)])
+
+
+def main():
+	parser_description = ("Extracts the Word2Vec vectors of the collocate "
+		"lemmas of every story in the corpus into a compact embedding table, "
+		"with rows aligned to the corpus-level term vocabulary.")
+	parser = argparse.ArgumentParser(description=parser_description)
+
+	parser.add_argument('n', help="# worker threads to spawn", type=int)
+
+	parser.add_argument('-t', '--types', dest='tpes', nargs='+',
+		default=['character'], choices=['character', 'concept', 'noun'],
+		help="Collocate types (Default is character)")
+	parser.add_argument('-d', '--dtype', dest='dtype', default='float32',
+		choices=sorted(DTYPES), help="Data type of the table (Default is "
+		"float32)")
+	parser.add_argument('--normalize', dest='normal', action='store_true',
+		help="Normalize the vectors to unit length")
+	parser.add_argument('-s', '--source-prefix', dest='source_prefix',
+		default=WORD2VEC_PREFIX, help="Path prefix of the converted Word2Vec "
+		"model (See convert_word2vec.py)")
+	parser.add_argument('-o', '--out-prefix', dest='out_prefix',
+		default=COLLOCATE_VECTORS_PREFIX, help="Output path prefix")
+
+	args = parser.parse_args()
+
+	corpus_manager = CorpusManager()
+	sids = corpus_manager.get_ids(origin='gen')
+
+	words = set()
+	pool = Pool(args.n)
+	for i, lemmas in enumerate(pool.imap_unordered(get_lemmas,
+		[(sid, args.tpes) for sid in sids])):
+		words |= lemmas
+
+		if (i + 1) % 100 == 0:
+			logging.info("Scanned %d/%d stories..." % (i + 1, len(sids)))
+
+	pool.close()
+	pool.join()
+
+	logging.info("Extracting vectors for %d collocate lemmas..." % len(words))
+
+	num_present = extract_compact_embeddings(words,
+		Embeddings(args.source_prefix), args.out_prefix,
+		dtype=DTYPES[args.dtype], normal=args.normal)
+
+	logging.info("Extracted %d vectors (Outputting to %s.npy)." %
+		(num_present, args.out_prefix))
+
+
+if __name__ == '__main__':
+	main()
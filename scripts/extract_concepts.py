@@ -4,17 +4,14 @@ import os
 import sys
 sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
 
-from collections import defaultdict
-from multiprocessing import Process
-
 from concepts import ConceptsManager
 from corpus import CorpusManager
 from unigrams import UnigramsManager
 
 
 """
-Generates the concepts .json file for each story with unigram count .tsv files
-in the corpus (Overwrites it if it already exists).
+Generates the concepts .json file for each story in the corpus unigram matrix
+(If it doesn't already exist), in a single corpus-level pass.
 """
 
 def log(s):
@@ -27,41 +24,49 @@ def log(s):
 
 def main():
 	parser_description = ("Generates the concepts .json file for each story "
-		"with unigram count .tsv files in the corpus (Overwrites it if it "
-		"already exists).")
+		"in the corpus unigram matrix (If it doesn't already exist), in a "
+		"single corpus-level pass.")
 	parser = argparse.ArgumentParser(description=parser_description)
 
-	parser.add_argument('n', help="# worker threads to spawn", type=int)
+	parser.add_argument('-l', '--lexicon', dest='lexicon_fpath',
+		help="Path to concept lexicon, with one concept lemma per line (e.g. "
+		"../resources/abstract.txt). If not specified, then the default "
+		"concepts are used.")
+	parser.add_argument('-p', '--pos', help="Simplified POS tag to restrict "
+		"concepts to (e.g. 'N'). If not specified, then counts are summed "
+		"across POS tags.")
+
+	parser.add_argument('-f', '--force', dest='force', action='store_true',
+		help="Force re-extraction")
 
 	args = parser.parse_args()
 
-	concepts_manager = ConceptsManager()
+	concepts_manager = ConceptsManager(lexicon_fpath=args.lexicon_fpath,
+		pos=args.pos)
 	corpus_manager = CorpusManager()
 	unigrams_manager = UnigramsManager()
 
-	sid_groups = defaultdict(list)
-	for i, sid in enumerate(corpus_manager.get_ids(origin='gen')):
-		sid_groups[i % args.n].append(sid)
-
-	def run_extract_concepts(worker_name, sids):
-		for sid in sids:
-			concepts_fpath = concepts_manager.get_fpath(sid)
-
-			# Only extracts the concepts if the saved .tsv file doesn't exist
-			# and the corresponding unigram counts .tsv file exists.
-			if not os.path.exists(concepts_fpath) and \
-				unigrams_manager.saved(sid):
-				log(worker_name + ": Extracting concepts for " + sid +
-					" and saving to " + concepts_fpath + "...")
-
-				concepts_manager.gen(sid)
-			else:
-				log(worker_name + ": Skipping " + sid + "...")
-
-	for i, g in sid_groups.iteritems():
-		p = Process(target=run_extract_concepts, args=("T%d" % (i + 1), g,))
-		p.start()
-		 
+	sids = []
+	for sid in corpus_manager.get_ids(origin='gen'):
+		concepts_fpath = concepts_manager.get_fpath(sid)
+
+		# Only extracts the concepts if the force option is specified or the
+		# saved .json file doesn't exist, and the story's unigram counts are in
+		# the corpus unigram matrix (See count_unigrams.py).
+		if unigrams_manager.stored(sid) and (args.force or
+			not os.path.exists(concepts_fpath)):
+			sids.append(sid)
+		else:
+			log("Skipping " + sid + "...")
+
+	log("Resolving %d concepts..." % len(concepts_manager.concepts))
+	concepts_manager.get_matrix_extractor()
+
+	log("Extracting concepts for %d stories..." % len(sids))
+	concepts_manager.gen_all(sids)
+
+	log("Finished!")
+
 
 if __name__ == '__main__':
 	main()
@@ -15,7 +15,7 @@ from collections import defaultdict
 from multiprocessing import Process
 
 from corpus import CorpusManager
-from nouns import NounsManager
+from nouns import NounsManager, make_policy
 
 
 # Configure logging
@@ -64,9 +64,27 @@ def main():
 	parser.add_argument('-f', '--force', dest='force', action='store_true',
 		help="Force re-extraction")
 
+	# Noun vocabulary policies (At most one).
+	parser.add_argument('-k', '--top-k', dest='top_k', type=int,
+		help="Only keep the top k nouns (by count) of each story")
+	parser.add_argument('-m', '--min-count', dest='min_count', type=int,
+		help="Only keep the nouns occurring at least this many times in a "
+		"story")
+	parser.add_argument('-s', '--shared', dest='shared', action='store_true',
+		help="Only keep the nouns in the corpus-level shared noun vocabulary")
+	parser.add_argument('--build-vocab', dest='vocab_size', type=int,
+		help="(Re)build the shared noun vocabulary from the corpus unigram "
+		"matrix with this many nouns (by document frequency) first")
+
 	args = parser.parse_args()
 
-	nouns_manager = NounsManager()
+	if args.vocab_size is not None:
+		logging.info("Building shared noun vocabulary of %d nouns..." %
+			args.vocab_size)
+		NounsManager().build_vocab(size=args.vocab_size)
+
+	nouns_manager = NounsManager(policy=make_policy(top_k=args.top_k,
+		min_count=args.min_count, shared=args.shared))
 
 	sid_groups = defaultdict(list)
 	for i, sid in enumerate(corpus_manager.get_ids(origin='gen')):
@@ -12,9 +12,7 @@ import os
 import sys
 sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
 
-from collections import Counter
-
-from aliases import AliasesManager
+from aliases import AliasesManager, get_name_mentions
 from corpus import CorpusManager
 
 
@@ -23,17 +21,10 @@ logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
 	level=logging.INFO)
 
 
-# Gendered pronouns.
-MALE_PRONOUNS = set(['he', 'him', 'himself', 'his'])
-FEMALE_PRONOUNS = set(['her', 'hers', 'herself', 'she'])
-
-
-# Returns the name of the protagonist character.
-def get_protag(aliases):
-	cntr = Counter()
-
-	for alias in aliases:
-		cntr[alias['entity']['name']] += 1
+# Returns the name of the protagonist character, according to the given mention
+# summaries.
+def get_protag(summaries):
+	cntr = get_name_mentions(summaries)
 
 	mc = cntr.most_common(1)
 	if len(mc) == 0:
@@ -42,19 +33,15 @@ def get_protag(aliases):
 	return mc[0][0]
 
 
-# Determines the gender of the given character according to the given list of
-# aliases.
-def det_gender(character_name, aliases):
+# Determines the gender of the given character according to the given mention
+# summaries.
+def det_gender(character_name, summaries):
 	male_pron_cnt, female_pron_cnt = 0, 0
 
-	for alias in aliases:
-		if alias['entity']['name'] == character_name:
-			span = alias['span'].lower()
-
-			if span in MALE_PRONOUNS:
-				male_pron_cnt += 1
-			elif span in FEMALE_PRONOUNS:
-				female_pron_cnt += 1
+	for summary in summaries:
+		if summary['name'] == character_name:
+			male_pron_cnt += summary['male']
+			female_pron_cnt += summary['female']
 
 	if male_pron_cnt > female_pron_cnt:
 		return 'MALE'
@@ -82,6 +69,10 @@ def main():
 	# Story Id's.
 	sids = corpus_manager.get_ids(origin='gen')
 
+	# Character mention summaries of all stories.
+	logging.info("Reading character mentions table...")
+	mentions = aliases_manager.get_mentions_table('character')
+
 	with open(args.out_path, 'wb') as f:
 		writer = csv.writer(f, delimiter='\t', quotechar='"')
 
@@ -89,7 +80,7 @@ def main():
 		writer.writerow(['STORY ID', 'PUB. DATE', 'GENRE', 'PROTAG. NAME', 'PROTAG. GENDER'])
 		
 		for sid in sids:
-			if not aliases_manager.saved(sid, tpe='character'):
+			if sid not in mentions:
 				logging.info("Skipping %s..." % sid)
 				continue
 			
@@ -100,14 +91,12 @@ def main():
 			row = [sid, dates[sid] if sid in dates else 'DNE',
 				genre if genre else 'DNE']
 
-			aliases = aliases_manager.get_aliases(sid, tpe='character')
-			
-			protag_name = get_protag(aliases)
+			protag_name = get_protag(mentions[sid])
 
 			if protag_name is None:
 				row += [None, None]
 			else:
-				protag_gender = det_gender(protag_name, aliases)
+				protag_gender = det_gender(protag_name, mentions[sid])
 				row += [protag_name.encode('utf-8'), protag_gender]
 
 			writer.writerow(row)
@@ -19,6 +19,7 @@ from characters import CharactersManager
 from concepts import ConceptsManager
 from corpus import CorpusManager
 from nouns import NounsManager
+from prefetch import prefetch
 
 
 # Configure logging
@@ -59,6 +60,7 @@ def main():
 		sid_groups[i % args.n].append(sid)
 
 	def run_ident_aliases(worker_name, sids):
+		todo = []
 		for sid in sids:
 			aliases_fpath = aliases_manager.get_fpath(sid, args.tpe)
 
@@ -67,14 +69,20 @@ def main():
 			# .json exists.
 			if entities_manager.saved(sid) and (args.force or
 				not os.path.exists(aliases_fpath)):
-				logging.info("(" + worker_name + ") Identifying " + args.tpe +
-					" aliases for " + sid + " and saving to " + aliases_fpath +
-					"...")
-
-				aliases_manager.ident(sid, args.tpe)
+				todo.append(sid)
 			else:
 				logging.info("(" + worker_name + ") Skipping " + sid + "...")
 
+		# The inputs of the next stories are read while a story's aliases are
+		# identified.
+		for sid, inputs in prefetch(
+			lambda sid: aliases_manager.load(sid, args.tpe), todo):
+			logging.info("(" + worker_name + ") Identifying " + args.tpe +
+				" aliases for " + sid + " and saving to " +
+				aliases_manager.get_fpath(sid, args.tpe) + "...")
+
+			aliases_manager.ident(sid, args.tpe, inputs)
+
 	for i, g in sid_groups.iteritems():
 		p = Process(target=run_ident_aliases, args=("T%d" % (i + 1), g,))
 		p.start()
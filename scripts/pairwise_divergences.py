@@ -2,12 +2,14 @@
 Performs pairwise comparisons of story character and non-character collocate
 distributions (using KL-divergence) between stories for various categories
 (genre and period). All results are saved in .tsv tables (one per category).
+Alternatively, several divergences between the full character collocate
+distributions of every (or every sampled) pair of stories in each category are
+saved in long format.
 
 @author: Hardik
 """
 
 import argparse
-import csv
 import logging
 import numpy as np
 import os
@@ -17,16 +19,20 @@ sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
 import xml.etree.ElementTree as ET
 
 from collections import Counter, defaultdict
-from itertools import combinations
+from itertools import chain
 from multiprocessing import Process
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-from scipy.stats import bernoulli
 
 from aliases import AliasesManager
+from checkpoint import CheckpointedWriter, digest
 from collocates import CollocatesManager
 from corpus import CorpusManager
-from distinctiveness import Probability
+from distinctiveness import MEASURES, SparseProbability
+from divergences import kl_at_cutoffs, PairwiseDivergenceCalculator, \
+	RankedCounts
+from noncharacter import NonCharacterManager
+from resources import resources
+from sampling import stratified_sample_pairs
+from store import Vocabulary
 
 
 # Configure logging
@@ -34,22 +40,8 @@ logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
 	level=logging.INFO)
 
 
-STOPWORDS = set(stopwords.words('english'))
-
-# Filepath to "said" words.
-SAID_DICT_PATH = "../resources/said_dict.txt"
-
-# Returns a set of "said" words, lemmatized.
-def load_said_words():
-	words = []
-	with open(SAID_DICT_PATH) as f:
-		for line in f:
-			words += [p.strip().replace(' ', '-') for p in line.split('\t')]
-
-	lemmatizer = WordNetLemmatizer()
-
-	# Lemmatize and convert to set and add 'say'.
-	return set([lemmatizer.lemmatize(w) for w in words] + ['say'])
+# Vocabulary cutoffs (# top words).
+CUTOFFS = (100, 500, 1000, 3000, 5000, 10000, 1000000000)
 
 
 def main():
@@ -61,16 +53,30 @@ def main():
 
 	parser.add_argument('out_dirpath', help="Path to output directory")
 
-	parser.add_argument('sample', help="# pairwise comparisons to sample",
-		type=int)
+	parser.add_argument('sample', help="# pairwise comparisons to sample "
+		"(0 compares every pair with --matrix)", type=int)
 
 	parser.add_argument('n', help="# worker threads to spawn", type=int)
-	
+
+	parser.add_argument('-m', '--matrix', dest='measures', nargs='+',
+		choices=MEASURES, help="Instead, save the given divergences between "
+		"the full character collocate distributions of the pairs of stories "
+		"in long format, computing each category in blocks across n worker "
+		"processes")
+	parser.add_argument('--seed', type=int, help="Random seed for sampling "
+		"story pairs")
+	parser.add_argument('-b', '--block-size', dest='block_size', type=int,
+		default=64, help="# stories on each side of a block of pairs with "
+		"--matrix (Default is 64)")
+	parser.add_argument('--restart', dest='restart', action='store_true',
+		help="Start over instead of resuming an interrupted run")
+
 	args = parser.parse_args()
 
 	aliases_manager = AliasesManager()
 	collocates_manager = CollocatesManager()
 	corpus_manager = CorpusManager()
+	noncharacter_manager = NonCharacterManager()
 	
 	# Story Id's.
 	sids = corpus_manager.get_ids(origin='gen')
@@ -136,28 +142,11 @@ def main():
 	# Returns a word (lemma) counter for the given story's non-character
 	# collocate words.
 	def get_non_cntr(sid):
-		path = "/home/ndg/project/shared_datasets/narrative/characterization/data/texts/non-lemma/%s.txt" % sid
+		# Counted on first use (See count_non_character.py).
+		if not noncharacter_manager.saved(sid):
+			noncharacter_manager.gen(sid)
 
-		with open(path) as f:
-			return Counter(f.read().split())
-		# path = corpus_manager.get_corenlp_fpath(sid)
-		# e = ET.parse(path).getroot()
-
-		# char_collocates = collocates_manager.get(sid, tpe='character',
-		# 	ranks=range(1, 21))
-
-		# # Counts all lemmas.
-		# cntr = Counter(tok[1].text for tok in e.iter('token'))
-
-		# # Counts all character collocate lemmas.
-		# char_coll_cntr = Counter(coll['token']['lemma']
-		# 	for coll in char_collocates)
-		# # Counts all alias tokens.
-		# alias_cntr = Counter(tok for coll in char_collocates
-		# 	for tok in coll['alias']['span'].split())
-
-		# # Non-character word (lemma) counter.
-		# return cntr - char_coll_cntr - alias_cntr
+		return noncharacter_manager.get(sid)
 
 	# Generates the bag-of-words distribution for the given list of word-count
 	# pairs, returning a dictionary from word to probability.
@@ -165,7 +154,52 @@ def main():
 		num_tokens = float(sum([c for _, c in wc_pairs]))
 		return {w: c / num_tokens for w, c in wc_pairs}
 
-	said_words = load_said_words()
+	# Stopwords and "said" words, loaded before forking so that the workers
+	# share them.
+	resources.preload(['stopwords', 'said_words'])
+	excluded_words = resources.get('stopwords') | resources.get('said_words')
+
+	# Story pairs sampled by category (Sampled up front, so that a seed
+	# reproduces them whichever worker handles a category).
+	cat_pairs = stratified_sample_pairs(dict(genre_sids.items() +
+		period_sids.items()), args.sample, seed=args.seed)
+
+	# Saves the divergences between the full character collocate distributions
+	# of every (or every sampled) pair of stories in each category.
+	def run_calc_div_matrices(cats):
+		calculator = PairwiseDivergenceCalculator(args.measures,
+			block_size=args.block_size, n=args.n)
+
+		for cat in cats:
+			all_sids = genre_sids[cat] if cat in genre_sids else \
+				period_sids[cat]
+
+			out_path = os.path.join(args.out_dirpath, '%s-pairs.tsv' % cat)
+
+			logging.info("Processing for %s... (Outputting to %s)" % (cat,
+				out_path))
+
+			# Loads each story's distribution once.
+			sparse_prob = SparseProbability()
+			dists = sparse_prob.from_dicts([
+				gen_dist(get_char_cntr(sid).items()) for sid in all_sids])
+
+			if args.sample > 0:
+				rows = {sid: i for i, sid in enumerate(all_sids)}
+				pairs = [(rows[sid1], rows[sid2])
+					for sid1, sid2 in cat_pairs[cat]]
+			else:
+				pairs = None
+
+			num_pairs = calculator.write(out_path, all_sids, dists,
+				pairs=pairs, sparse_prob=sparse_prob, resume=not args.restart)
+
+			logging.info("Compared %d pairs for %s." % (num_pairs, cat))
+
+	if args.measures:
+		run_calc_div_matrices(list(chain(*cats.values())))
+		logging.info("Finished!")
+		return
 
 	# Worker function.
 	def run_calc_divs(worker_name, cats):
@@ -178,11 +212,11 @@ def main():
 			logging.info(worker_name +
 				": Processing for %s... (Outputting to %s)" % (cat, out_path))
 
-			with open(out_path, 'wb') as f:
-				writer = csv.writer(f, delimiter='\t', quotechar='"') 
+			story_pairs = cat_pairs[cat]
 
-				# Header.
-				writer.writerow([
+			# Rows are checkpointed per pair, so that an interrupted run
+			# resumes from its last completed pair.
+			with CheckpointedWriter(out_path, [
 					'STORY A',
 					'STORY B',
 					'A CHAR. vs. B CHAR. (100)',
@@ -237,7 +271,8 @@ def main():
 					'A CHAR. vs. A NON-CHAR. (ALL w/o stop & comm.)',
 					# 'B CHAR. vs. B NON-CHAR. (ALL w/o stop & comm.)',
 					# 'A NON-CHAR. vs. B NON-CHAR. (ALL w/o stop & comm.)'
-				])
+				], signature=[digest(story_pairs)],
+				resume=not args.restart) as writer:
 
 				# story_pairs = []
 				# for sid1 in all_sids:
@@ -247,69 +282,39 @@ def main():
 
 				# 	story_pairs.append((sid1, sid2))
 
-				story_pairs, i = [], 1
-				for sid1, sid2 in combinations(all_sids, 2):
-					if len(story_pairs) < args.sample:
-						story_pairs.append((sid1, sid2))
-					else:
-						p = float(args.sample) / i
-						if bernoulli.rvs(p, size=1)[0] == 1:
-							story_pairs = random.sample(story_pairs,
-								args.sample - 1)
-							story_pairs.append((sid1, sid2))
-					
-					i += 1
-
-				for sid1, sid2 in story_pairs:
+				# Pairs not completed by an interrupted run.
+				todo = [(k, sid1, sid2) for k, (sid1, sid2)
+					in enumerate(story_pairs) if not writer.done(k)]
+
+				# Loads and ranks each sampled story's counters once, rather
+				# than once per pair it's in.
+				vocab = Vocabulary()
+				excludes = (excluded_words,)
+				char_ranked = {sid: RankedCounts(get_char_cntr(sid), vocab,
+					excludes) for sid in set(chain(*[(sid1, sid2)
+					for _, sid1, sid2 in todo]))}
+				non_ranked = {sid: RankedCounts(get_non_cntr(sid), vocab,
+					excludes) for sid in set(sid1 for _, sid1, _ in todo)}
+
+				for k, sid1, sid2 in todo:
 					row = [sid1, sid2]
 
-					char_cntr1 = get_char_cntr(sid1)
-					char_cntr2 = get_char_cntr(sid2)
-
-					non_cntr1 = get_non_cntr(sid1)
-					non_cntr2 = get_non_cntr(sid2)
+					# With and without stop & "said" words, at every cutoff.
+					char_kls = kl_at_cutoffs(char_ranked[sid1],
+						char_ranked[sid2], CUTOFFS)
+					non_kls = kl_at_cutoffs(char_ranked[sid1],
+						non_ranked[sid1], CUTOFFS)
 
 					# For top 100, 500, 1000, 3000, 5000, 10000, and all words.
-					for num_top in (100, 500, 1000, 3000, 5000, 10000,
-						1000000000):
-						char_dist1 = gen_dist(char_cntr1.most_common(num_top))
-						char_dist2 = gen_dist(char_cntr2.most_common(num_top))
-						
-						non_dist1 = gen_dist(non_cntr1.most_common(num_top))
-						# non_dist2 = gen_dist(non_cntr2.most_common(num_top))
-
-						row += [
-							Probability.kl_divergence(char_dist1, char_dist2),
-							Probability.kl_divergence(char_dist1, non_dist1)
-							# Probability.kl_divergence(char_dist2, non_dist2),
-							# Probability.kl_divergence(non_dist1, non_dist2)
-						]
+					for i in xrange(len(CUTOFFS)):
+						row += [char_kls[0, i], non_kls[0, i]]
 
 					# For top 500, 1000, 3000, 5000, 100000, and all words
 					# without stop words.
-					for num_top in (500, 1000, 3000, 5000, 10000, 1000000000):
-						char_dist1 = gen_dist([(w, c) for w, c
-							in char_cntr1.most_common(num_top)
-							if w not in STOPWORDS and w not in said_words])
-						char_dist2 = gen_dist([(w, c) for w, c
-							in char_cntr2.most_common(num_top)
-							if w not in STOPWORDS and w not in said_words])
-
-						non_dist1 = gen_dist([(w, c) for w, c
-							in non_cntr1.most_common(num_top)
-							if w not in STOPWORDS and w not in said_words])
-						# non_dist2 = gen_dist([(w, c) for w, c
-						# 	in non_cntr2.most_common(num_top)
-						# 	if w not in STOPWORDS])
-
-						row += [
-							Probability.kl_divergence(char_dist1, char_dist2),
-							Probability.kl_divergence(char_dist1, non_dist1)
-							# Probability.kl_divergence(char_dist2, non_dist2),
-							# Probability.kl_divergence(non_dist1, non_dist2)
-						]
-
-					writer.writerow(row)
+					for i in xrange(1, len(CUTOFFS)):
+						row += [char_kls[1, i], non_kls[1, i]]
+
+					writer.write(k, [row])
 
 			logging.info(worker_name + ": Finished!")
 
@@ -17,6 +17,7 @@ from multiprocessing import Process
 from aliases import AliasesManager
 from collocates import CollocatesManager
 from corpus import CorpusManager
+from prefetch import prefetch
 
 
 # Configure logging
@@ -48,6 +49,7 @@ def main():
 		sid_groups[i % args.n].append(sid)
 
 	def run_parse_collocates(worker_name, sids):
+		todo = []
 		for sid in sids:
 			collocates_path = collocates_manager.get_fpath(sid, args.tpe)
 
@@ -56,14 +58,19 @@ def main():
 			# aliases .json exists.
 			if aliases_manager.saved(sid, args.tpe) and (args.force or
 				not os.path.exists(collocates_path)):
-				logging.info(worker_name + ": Finding " + args.tpe +
-					" collocates for " + sid + " and saving to " +
-					collocates_path + "...")
-
-				collocates_manager.parse(sid, args.tpe)
+				todo.append(sid)
 			else:
 				logging.info(worker_name + ": Skipping " + sid + "...")
 
+		# The inputs of the next stories are read while a story is parsed.
+		for sid, inputs in prefetch(
+			lambda sid: collocates_manager.load(sid, args.tpe), todo):
+			logging.info(worker_name + ": Finding " + args.tpe +
+				" collocates for " + sid + " and saving to " +
+				collocates_manager.get_fpath(sid, args.tpe) + "...")
+
+			collocates_manager.parse(sid, args.tpe, inputs)
+
 	for i, g in sid_groups.iteritems():
 		p = Process(target=run_parse_collocates, args=("T%d" % (i + 1), g,))
 		p.start()
@@ -0,0 +1,63 @@
+"""
+Shows the hit rates and space used of the result cache by calculation (See
+resultcache.py), and optionally clears or shrinks it.
+"""
+
+import argparse
+import logging
+import os
+import sys
+sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
+
+from resultcache import result_cache
+
+
+# Configure logging
+logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
+	level=logging.INFO)
+
+
+def format_row(name, num_results, size, hits, misses):
+	rate = '%.1f%%' % (100. * hits / (hits + misses)) if hits + misses else '-'
+
+	return '%-40s %10d %12.2f %10d %10d %10s' % (name, num_results,
+		size / 2. ** 20, hits, misses, rate)
+
+
+def main():
+	parser_description = ("Shows the hit rates and space used of the result "
+		"cache by calculation.")
+	parser = argparse.ArgumentParser(description=parser_description)
+
+	parser.add_argument('--clear', dest='clear', nargs='?', const='',
+		help="Clear the cached results (and stats) of the given calculation, "
+			"or of all of them")
+	parser.add_argument('--max-size', dest='max_size', type=float,
+		help="Evict the least recently used results down to the given size "
+			"(in MB)")
+
+	args = parser.parse_args()
+
+	if args.clear is not None:
+		logging.info("Clearing %s..." % (args.clear or 'all results'))
+		result_cache.clear(args.clear or None)
+
+	if args.max_size is not None:
+		num_evicted = result_cache.evict(int(args.max_size * 2 ** 20))
+		logging.info("Evicted %d results..." % num_evicted)
+
+	stats = result_cache.get_stats()
+
+	print '%-40s %10s %12s %10s %10s %10s' % ('NAME', 'ENTRIES', 'SIZE (MB)',
+		'HITS', 'MISSES', 'HIT RATE')
+	for row in stats:
+		print format_row(*row)
+
+	print format_row('TOTAL', *[sum(row[i] for row in stats)
+		for i in range(1, 5)])
+	print "\nSize limit: %.2f MB (%s)" % (result_cache.max_size / 2. ** 20,
+		result_cache.fpath)
+
+
+if __name__ == '__main__':
+	main()
@@ -5,16 +5,12 @@ Computes the role distributions.
 """
 
 import argparse
-import csv
 import logging
 import os
 import sys
 sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
 
-from collocates import CollocatesManager
-from corpus import CorpusManager
-from ranks import RANK_GROUPS
-from role import map_role, ROLES
+from features import run_features
 
 
 # Configure logging
@@ -28,58 +24,17 @@ def main():
 
 	parser.add_argument('out_dirpath', help="Path to output directory for "
 		"generated .tsv files")
-	
-	args = parser.parse_args()
-
-	collocates_manager = CollocatesManager()
-	corpus_manager = CorpusManager()
-	
-	# Get publication dates for all stories.
-	dates = corpus_manager.get_dates()
-	# Story Id's.
-	sids = corpus_manager.get_ids(origin='gen')
-
-	# Create the output directory if it doesn't already exist.
-	if not os.path.exists(args.out_dirpath):
-		os.makedirs(args.out_dirpath)
-
-	for rg in RANK_GROUPS:
-		rg_name, ranks = rg
 
-		path = os.path.join(args.out_dirpath, '%s.tsv' % (rg_name.lower()))
+	parser.add_argument('-n', '--num-workers', dest='n', type=int, default=1,
+		help="# worker threads to spawn (Default is 1)")
+	parser.add_argument('--restart', dest='restart', action='store_true',
+		help="Start over instead of resuming an interrupted run")
 
-		logging.info("Calculating for %s... (Outputting to %s)" %
-			(rg_name, path))
-
-		with open(path, 'wb') as f:
-			writer = csv.writer(f, delimiter='\t', quotechar='"')
-
-			# Write header.
-			writer.writerow(['STORY ID', 'PUB. DATE', 'GENRE'] +
-				['# %s' % r for r in ROLES])
-
-			for sid in sids:
-				if not collocates_manager.saved(sid, tpe='character'):
-					logging.info("Skipping %s..." % sid)
-					continue
-
-				genre = (None if sid.startswith('000') else
-					corpus_manager.get_genre(sid))
-				row = [sid, dates[sid] if sid in dates else 'DNE',
-					genre if genre else 'DNE']
-
-				try:
-					collocates = collocates_manager.get(sid, tpe='character',
-						ranks=ranks)
+	args = parser.parse_args()
 
-					for role in ROLES:
-						row.append(len([coll for coll in collocates
-										if map_role(coll['type']) == role]))
-										
-					writer.writerow(row)
-				except IndexError:
-					logging.info("Skipping %s..." % sid)
-					continue
+	# Each story's collocates are read once, for all rank groups.
+	run_features(args.out_dirpath, ['role_dist'], n=args.n,
+		resume=not args.restart, subdirs=False)
 	
 if __name__ == '__main__':
 	main()
@@ -0,0 +1,78 @@
+"""
+Generates the unigram counts .tsv, nouns .json, and token statistics .json files
+for each story in the corpus with an identified character aliases .json file
+(If they don't already exist), from a single scan of its CoreNLP .xml file.
+"""
+
+import argparse
+import logging
+import os
+import sys
+sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
+
+from collections import defaultdict
+from multiprocessing import Process
+
+from aliases import AliasesManager
+from corpus import CorpusManager
+from nouns import make_policy
+from scan import ScanManager
+
+
+# Configure logging
+logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
+	level=logging.INFO)
+
+
+def main():
+	parser_description = ("Generates the unigram counts .tsv, nouns .json, and "
+		"token statistics .json files for each story in the corpus with an "
+		"identified character aliases .json file (If they don't already "
+		"exist), from a single scan of its CoreNLP .xml file.")
+	parser = argparse.ArgumentParser(description=parser_description)
+
+	parser.add_argument('n', help="# worker threads to spawn", type=int)
+
+	parser.add_argument('-f', '--force', dest='force', action='store_true',
+		help="Force re-scanning")
+
+	# Noun vocabulary policies (At most one, see extract_nouns.py).
+	parser.add_argument('-k', '--top-k', dest='top_k', type=int,
+		help="Only keep the top k nouns (by count) of each story")
+	parser.add_argument('-m', '--min-count', dest='min_count', type=int,
+		help="Only keep the nouns occurring at least this many times in a "
+		"story")
+	parser.add_argument('-s', '--shared', dest='shared', action='store_true',
+		help="Only keep the nouns in the corpus-level shared noun vocabulary")
+
+	args = parser.parse_args()
+
+	aliases_manager = AliasesManager()
+	corpus_manager = CorpusManager()
+	scan_manager = ScanManager(noun_policy=make_policy(top_k=args.top_k,
+		min_count=args.min_count, shared=args.shared))
+
+	sid_groups = defaultdict(list)
+	for i, sid in enumerate(corpus_manager.get_ids(origin='gen')):
+		sid_groups[i % args.n].append(sid)
+
+	def run_scan(worker_name, sids):
+		for sid in sids:
+			# Only scans the story if the corresponding character aliases .json
+			# exists, and the force option is specified or any of the outputs
+			# don't exist.
+			if aliases_manager.saved(sid, 'character') and (args.force or
+				not scan_manager.saved(sid)):
+				logging.info(worker_name + ": Scanning " + sid + "...")
+
+				scan_manager.gen(sid)
+			else:
+				logging.info(worker_name + ": Skipping " + sid + "...")
+
+	for i, g in sid_groups.iteritems():
+		p = Process(target=run_scan, args=("T%d" % (i + 1), g,))
+		p.start()
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,83 @@
+"""
+Summarizes the (character, concept, or noun) mentions of each story with
+identified aliases (# mentions, gendered pronoun counts, and first and last
+mention offsets of each entity) and aggregates them into a corpus-level .tsv
+table read by the mention-based scripts.
+"""
+
+import argparse
+import logging
+import os
+import sys
+sys.path.insert(1, os.path.join(sys.path[0], os.path.join('..', 'src')))
+
+from multiprocessing import Pool
+
+from aliases import AliasesManager
+from corpus import CorpusManager
+
+
+# Configure logging
+logging.basicConfig(format="%(levelname)s: [%(asctime)s] %(message)s",
+	level=logging.INFO)
+
+
+aliases_manager = AliasesManager()
+
+
+# Worker function, returning the mention summaries of the given story
+# (re-generating its summary .json file from the aliases if forced).
+def summarize_story(params):
+	sid, tpe, force = params
+
+	if force:
+		aliases_manager.save_summary(sid, tpe)
+
+	return sid, aliases_manager.get_summary(sid, tpe)
+
+
+def main():
+	parser_description = ("Summarizes the (character, concept, or noun) "
+		"mentions of each story with identified aliases and aggregates them "
+		"into a corpus-level .tsv table.")
+	parser = argparse.ArgumentParser(description=parser_description)
+
+	parser.add_argument('tpe', help="Summarize 'character', 'concept', or "
+		"'noun' mentions")
+	parser.add_argument('n', help="# worker threads to spawn", type=int)
+
+	parser.add_argument('-f', '--force', dest='force', action='store_true',
+		help="Force re-generation of the per-story summaries")
+
+	args = parser.parse_args()
+
+	if args.tpe not in ['character', 'concept', 'noun']:
+		raise ValueError("tpe must be 'character', 'concept', or 'noun'.")
+
+	corpus_manager = CorpusManager()
+
+	sids = []
+	for sid in corpus_manager.get_ids(origin='gen'):
+		if not aliases_manager.saved(sid, tpe=args.tpe):
+			logging.info("Skipping %s..." % sid)
+			continue
+
+		sids.append(sid)
+
+	logging.info("Summarizing %s mentions of %d stories..." % (args.tpe,
+		len(sids)))
+
+	pool = Pool(args.n)
+	summaries = pool.map(summarize_story, [(sid, args.tpe, args.force)
+		for sid in sids])
+	pool.close()
+	pool.join()
+
+	logging.info("Saving to %s..." %
+		aliases_manager.get_mentions_table_fpath(args.tpe))
+
+	aliases_manager.save_mentions_table(args.tpe, summaries)
+
+
+if __name__ == '__main__':
+	main()
@@ -6,16 +6,18 @@ Identifies and manages aliases for all stories.
 
 import csv
 import json
+import logging
 import os
 import sys
 import xml.etree.ElementTree as ET
 
-from collections import Counter, defaultdict
+from collections import Counter, OrderedDict, defaultdict
 
 from characters import CharactersManager
 from concepts import ConceptsManager
-from corpus import CorpusManager
+from corpus import CorpusManager, STORE_DIRPATH
 from nouns import NounsManager
+from prefetch import open_input, read_file
 
 
 # Set of pronouns.
@@ -24,6 +26,93 @@ PRONOUNS = set(['he', 'her', 'hers', 'herself', 'him', 'himself', 'his', 'I',
 	'them', 'themselves', 'they', 'us', 'we', 'who', 'whoever', 'whom',
 	'whomever', 'you', 'your', 'yourself', 'yourselves'])
 
+# Gendered pronouns.
+MALE_PRONOUNS = set(['he', 'him', 'himself', 'his'])
+FEMALE_PRONOUNS = set(['her', 'hers', 'herself', 'she'])
+
+# Columns of the corpus-level mentions table.
+MENTIONS_COLUMNS = ['STORY ID', 'NAME', 'RANK', '# MENTIONS',
+	'# MALE PRONOUNS', '# FEMALE PRONOUNS', 'FIRST OFFSET', 'LAST OFFSET']
+
+
+def summarize_mentions(aliases):
+	"""
+	Summarizes the mentions of each entity in the given list of identified
+	aliases.
+
+	@param aliases - List of identified aliases (as returned by
+		AliasIdentifier.ident)
+	@return List of entity mention summaries, in order of first mention, with
+		each summary in the form,
+
+		{
+			'name': [Character/Concept/Noun identifier],
+			'rank': [Rank of the Character/Concept/Noun],
+			'mentions': [# mentions],
+			'male': [# mentions that are male pronouns],
+			'female': [# mentions that are female pronouns],
+			'first_offset': [Starting character offset of first mention],
+			'last_offset': [Ending character offset of last mention]
+		}
+	"""
+
+	summaries = OrderedDict()
+	for alias in aliases:
+		key = (alias['entity']['name'], alias['entity']['rank'])
+		if key not in summaries:
+			summaries[key] = {
+				'name': key[0],
+				'rank': key[1],
+				'mentions': 0,
+				'male': 0,
+				'female': 0,
+				'first_offset': alias['begin_offset'],
+				'last_offset': alias['end_offset']
+			}
+
+		summary = summaries[key]
+		summary['mentions'] += 1
+
+		span = alias['span'].lower()
+		if span in MALE_PRONOUNS:
+			summary['male'] += 1
+		elif span in FEMALE_PRONOUNS:
+			summary['female'] += 1
+
+		summary['first_offset'] = min(summary['first_offset'],
+			alias['begin_offset'])
+		summary['last_offset'] = max(summary['last_offset'],
+			alias['end_offset'])
+
+	return summaries.values()
+
+
+def get_rank_mentions(summaries):
+	"""
+	Returns a counter of the # mentions of each entity rank in the given
+	mention summaries (as returned by summarize_mentions).
+	"""
+
+	cntr = Counter()
+	for summary in summaries:
+		cntr[summary['rank']] += summary['mentions']
+
+	return cntr
+
+
+def get_name_mentions(summaries):
+	"""
+	Returns a counter of the # mentions of each entity name in the given
+	mention summaries (as returned by summarize_mentions), with names inserted
+	in order of first mention.
+	"""
+
+	cntr = Counter()
+	for summary in summaries:
+		cntr[summary['name']] += summary['mentions']
+
+	return cntr
+
 
 class AliasIdentifier(object):
 	"""
@@ -74,7 +163,8 @@ class AliasIdentifier(object):
 		Reads a BookNLP .tokens file, returning the pronouns corresponding to
 		the given list of entities.
 
-		@param booknlp_tokens_path - Filepath to BookNLP .tokens
+		@param booknlp_tokens_path - Filepath to BookNLP .tokens (or file
+			object, e.g. prefetched)
 		@param entities - List of entities for which to grab pronoun
 			co-referents
 		@return Table mapping token index to pronoun, where a pronoun is
@@ -89,7 +179,7 @@ class AliasIdentifier(object):
 		# token), name, beginning character offset, and ending character offset.
 		aliases_read = defaultdict(list)
 
-		with open(booknlp_tokens_path) as f:
+		with open_input(booknlp_tokens_path) as f:
 			# Skip header.
 			next(f)
 
@@ -149,7 +239,7 @@ class AliasIdentifier(object):
 	def ident(self, tokree, corenlp_filepath, pronoun_table=None):
 		"""
 		Identifies the instances of aliases from the tokree in the CoreNLP .xml
-		located by corenlp_filepath, returning a list of identifed aliases with
+		located by corenlp_filepath (or file object), returning a list of identifed aliases with
 		each alias represented as,
 
 		{
@@ -304,10 +394,36 @@ class AliasesManager(object):
 
 		return os.path.exists(self.get_fpath(sid, tpe))
 
-	def ident(self, sid, tpe):
+	def load(self, sid, tpe):
+		"""
+		Reads the files that the aliases of the given story and type are
+		identified from (See ident), e.g. to be prefetched (See prefetch.py).
+
+		@return Tuple of the entities, and the (in-memory) BookNLP .tokens and
+			CoreNLP .xml files
+		"""
+
+		if tpe == 'character':
+			entities = self.characters_manager.get_characters(sid)
+		elif tpe == 'concept':
+			entities = self.concepts_manager.get_concepts(sid)
+		elif tpe == 'noun':
+			entities = self.nouns_manager.get_nouns(sid)
+		else:
+			raise ValueError("'tpe' must be 'character', 'concept', or 'noun'.")
+
+		return entities, \
+			read_file(self.corpus_manager.get_booknlp_tokens(sid)), \
+			read_file(self.corpus_manager.get_corenlp_fpath(sid))
+
+	def ident(self, sid, tpe, inputs=None):
 		"""
 		Generates the identified aliases .json file for the given story and type
 		(Overwrites it if it already exists).
+
+		@param sid - Story Id of story
+		@param tpe - 'character', 'concept', or 'noun'
+		@param inputs - Inputs read by load (Default is None, for reading them)
 		"""
 
 		fpath = self.get_fpath(sid, tpe)
@@ -317,25 +433,19 @@ class AliasesManager(object):
 		if not os.path.exists(dirpath):
 			os.makedirs(dirpath)
 
-		if tpe == 'character':
-			entities = self.characters_manager.get_characters(sid)
-		elif tpe == 'concept':
-			entities = self.concepts_manager.get_concepts(sid)
-		elif tpe == 'noun':
-			entities = self.nouns_manager.get_nouns(sid)
-		else:
-			raise ValueError("'tpe' must be 'character', 'concept', or 'noun'.")
+		if inputs is None:
+			inputs = self.load(sid, tpe)
+
+		entities, booknlp_tokens, corenlp = inputs
 
 		tokree = self.identifier.tokreefy(entities)
 
-		booknlp_tokens_path = self.corpus_manager.get_booknlp_tokens(sid)
-		pronoun_table = self.identifier.get_pronouns(booknlp_tokens_path,
-			entities)
+		pronoun_table = self.identifier.get_pronouns(booknlp_tokens, entities)
 
-		aliases = self.identifier.ident(tokree,
-			self.corpus_manager.get_corenlp_fpath(sid), pronoun_table)
+		aliases = self.identifier.ident(tokree, corenlp, pronoun_table)
 
 		self.identifier.save(aliases, self.get_fpath(sid, tpe))
+		self.save_summary(sid, tpe, aliases)
 
 	def get_aliases(self, sid, tpe):
 		"""
@@ -346,3 +456,173 @@ class AliasesManager(object):
 
 		with open(self.get_fpath(sid, tpe)) as f:
 			return json.load(f)
+
+	def get_summary_fpath(self, sid, tpe):
+		"""
+		Returns the filepath to the mention summary .json file for the given
+		story and type (next to the aliases .json file).
+		"""
+
+		return os.path.splitext(self.get_fpath(sid, tpe))[0] + '.summary.json'
+
+	def save_summary(self, sid, tpe, aliases=None):
+		"""
+		Saves the mention summary .json file for the given story and type.
+
+		@param aliases - List of identified aliases (Default is None, for
+			reading them from the saved aliases .json file)
+		"""
+
+		if aliases is None:
+			aliases = self.get_aliases(sid, tpe)
+
+		fpath = self.get_summary_fpath(sid, tpe)
+		with open(fpath + '.tmp', 'w') as out:
+			json.dump(summarize_mentions(aliases), out, sort_keys=True)
+		os.rename(fpath + '.tmp', fpath)
+
+	def get_summary(self, sid, tpe):
+		"""
+		Retrieves the mention summaries (See summarize_mentions) for the given
+		story and type, generating the summary .json file from the aliases if
+		it doesn't exist.
+		"""
+
+		fpath = self.get_summary_fpath(sid, tpe)
+		if not os.path.exists(fpath):
+			self.save_summary(sid, tpe)
+
+		with open(fpath) as f:
+			return json.load(f)
+
+	def get_mentions_table_fpath(self, tpe):
+		"""
+		Returns the filepath to the corpus-level mentions .tsv table for the
+		given type.
+		"""
+
+		return os.path.join(STORE_DIRPATH, '%s_mentions.tsv' % tpe)
+
+	def save_mentions_table(self, tpe, summaries):
+		"""
+		Saves the corpus-level mentions .tsv table for the given type, with one
+		row per story entity.
+
+		@param tpe - 'character', 'concept', or 'noun'
+		@param summaries - Iterable of (<story Id>, <mention summaries>) pairs
+		"""
+
+		fpath = self.get_mentions_table_fpath(tpe)
+
+		dirpath = os.path.dirname(fpath)
+		if not os.path.exists(dirpath):
+			os.makedirs(dirpath)
+
+		with open(fpath + '.tmp', 'wb') as f:
+			writer = csv.writer(f, delimiter='\t', quotechar='"')
+
+			# Write header.
+			writer.writerow(MENTIONS_COLUMNS)
+
+			for sid, story_summaries in summaries:
+				# Stories without any mentions still get a (story Id only) row.
+				if len(story_summaries) == 0:
+					writer.writerow([sid])
+
+				for summary in story_summaries:
+					writer.writerow([sid, summary['name'].encode('utf-8'),
+						summary['rank'], summary['mentions'], summary['male'],
+						summary['female'], summary['first_offset'],
+						summary['last_offset']])
+
+		os.rename(fpath + '.tmp', fpath)
+
+	def get_summarized_ids(self, tpe):
+		"""
+		Returns the Id's of the stories whose mentions of the given type go in
+		the mentions table (those with identified aliases).
+		"""
+
+		return [sid for sid in self.corpus_manager.get_ids(origin='gen')
+			if self.saved(sid, tpe)]
+
+	def mentions_table_outdated(self, tpe, sids):
+		"""
+		Checks whether the saved mentions table for the given type is missing,
+		or older than the aliases or mention summary of any of the given stories
+		(e.g. re-identified since).
+		"""
+
+		fpath = self.get_mentions_table_fpath(tpe)
+		if not os.path.exists(fpath):
+			return True
+
+		mtime = os.path.getmtime(fpath)
+		for sid in sids:
+			for path in [self.get_fpath(sid, tpe),
+				self.get_summary_fpath(sid, tpe)]:
+				if not os.path.exists(path) or os.path.getmtime(path) > mtime:
+					return True
+
+		return False
+
+	def read_mentions_table(self, tpe):
+		"""
+		Reads the saved mentions table for the given type.
+
+		@return Map from story Id to mention summaries (See summarize_mentions)
+		"""
+
+		table = OrderedDict()
+		with open(self.get_mentions_table_fpath(tpe), 'rb') as f:
+			reader = csv.reader(f, delimiter='\t', quotechar='"')
+
+			# Skip header.
+			next(reader)
+
+			for row in reader:
+				sid = row[0]
+				if sid not in table:
+					table[sid] = []
+
+				if len(row) == 1:
+					continue
+
+				table[sid].append({
+					'name': row[1].decode('utf-8'),
+					'rank': int(row[2]),
+					'mentions': int(row[3]),
+					'male': int(row[4]),
+					'female': int(row[5]),
+					'first_offset': int(row[6]),
+					'last_offset': int(row[7])
+				})
+
+		return table
+
+	def get_mentions_table(self, tpe):
+		"""
+		Retrieves the corpus-level mentions table for the given type (See
+		save_mentions_table), rebuilding it first if it's missing or out of
+		date with the stories' aliases (summarize_mentions.py rebuilds it with
+		several worker processes).
+
+		@return Map from story Id to mention summaries (See summarize_mentions)
+		"""
+
+		sids = self.get_summarized_ids(tpe)
+
+		table = None
+		if not self.mentions_table_outdated(tpe, sids):
+			table = self.read_mentions_table(tpe)
+
+		# Stories with aliases identified or removed since.
+		if table is None or set(table) != set(sids):
+			logging.info("Rebuilding the %s mentions table (%d stories)..." %
+				(tpe, len(sids)))
+
+			self.save_mentions_table(tpe, [(sid, self.get_summary(sid, tpe))
+				for sid in sids])
+			table = self.read_mentions_table(tpe)
+
+		return table
@@ -0,0 +1,305 @@
+"""
+Map-reduce harness for the calc_* scripts. A worker function is mapped over the
+stories in a process pool, calculating every parameter combination (e.g. rank
+group and role) of a story at once, and the results are reduced into one .tsv
+file per combination, with rows in the order of the stories. The files are
+checkpointed per story (See checkpoint.py), so that an interrupted run resumes
+where it stopped. The stories' artifacts can be prefetched (See prefetch.py),
+so that each process reads the next stories while calculating the current one.
+The resident memory of each worker is reported when it starts and once the
+stories are done, to check that the resources loaded before forking (See
+resources.py) stay shared.
+"""
+
+import inspect
+import itertools
+import logging
+import os
+
+from multiprocessing import active_children, Pool
+
+from checkpoint import CheckpointedWriter
+from collocates import CollocatesManager
+from prefetch import DEFAULT_DEPTH, prefetch
+from resources import log_rss
+from resultcache import cached
+
+
+# Minimum # stories sent to a worker at a time when prefetching, as a multiple
+# of the prefetch depth (as only the stories of a chunk are prefetched).
+PREFETCH_CHUNKS = 4
+
+
+# Collocates manager, locating the input files of cached worker functions.
+collocates_manager = CollocatesManager()
+
+
+def cached_worker(name, tpes, params=None, fpaths=None):
+	"""
+	Decorator caching the results of a worker function, taking a story Id and
+	the artifacts read from the story's collocates of the given types (e.g.
+	prefetched), in the global result cache (See resultcache.cached).
+
+	@param name - Name (and version) of the calculation
+	@param tpes - Types ('character', 'concept', or 'noun') of the collocates
+		the results are calculated from
+	@param params - Function taking a story Id and returning the
+		JSON-serializable parameters, e.g. of the calculators set up by main
+		(Default is None, for none)
+	@param fpaths - Function returning the paths to any other input files, e.g.
+		lexicons or models (Default is None, for none)
+	@return Decorator
+	"""
+
+	def get_inputs(sid):
+		return [fpath for tpe in tpes
+			for fpath in collocates_manager.get_input_fpaths(sid, tpe)] + \
+			([] if fpaths is None else fpaths())
+
+	def decorator(func):
+		return cached(name, get_inputs, params,
+			given=inspect.getargspec(func).args[1:])(func)
+
+	return decorator
+
+
+def init_worker(initializer, initargs):
+	"""
+	Initializes a worker process with the given initializer (if any), reporting
+	its resident memory (as inherited from the parent) before and after.
+	"""
+
+	log_rss("Worker %d started" % os.getpid())
+
+	if initializer is not None:
+		initializer(*initargs)
+
+		log_rss("Worker %d initialized" % os.getpid())
+
+
+def map_story(params):
+	"""
+	Applies the given worker function to the given story (in a worker
+	process).
+
+	@return (<story Id>, <result>) tuple
+	"""
+
+	func, sid = params
+
+	return sid, func(sid)
+
+
+def map_chunk(params):
+	"""
+	Applies the given worker function to the given chunk of stories (in a
+	worker process), prefetching their artifacts with the given function.
+
+	@return List of (<story Id>, <result>) tuples
+	"""
+
+	func, load, sids, depth = params
+
+	return [(sid, func(sid, data)) for sid, data
+		in prefetch(load, sids, depth)]
+
+
+def get_param_filename(key):
+	"""
+	Returns the name of the .tsv file for the given (<rank group name>, <role>)
+	combination (as '<role>-<rank group>.tsv', with role 'all' for None).
+	"""
+
+	rg_name, role = key
+	role_name = role.lower() if role else 'all'
+
+	return '%s-%s.tsv' % (role_name, rg_name.lower())
+
+
+class StoryMapReducer(object):
+	"""
+	Maps a worker function over stories and reduces its results into a series
+	of .tsv files, one per parameter combination.
+	"""
+
+	def __init__(self, out_dirpath, keys, header, filename=get_param_filename,
+		n=1, chunk_size=1, initializer=None, initargs=(), depth=DEFAULT_DEPTH):
+		"""
+		@param out_dirpath - Path to output directory
+		@param keys - List of parameter combinations, in output order
+		@param header - Header row of every .tsv file, or map from combination
+			to header row
+		@param filename - Function returning the (relative) path of the .tsv file
+			of a combination (Default is get_param_filename)
+		@param n - # worker processes (Default is 1, for calculating in this
+			process)
+		@param chunk_size - # stories sent to a worker at a time (Default is 1)
+		@param initializer - Function called once in each worker before any
+			stories (Default is None)
+		@param initargs - Arguments to initializer (Default is none)
+		@param depth - # stories prefetched ahead, when prefetching (Default is
+			DEFAULT_DEPTH)
+		"""
+
+		self.out_dirpath, self.keys = out_dirpath, keys
+		self.header, self.filename = header, filename
+		self.n, self.chunk_size = n, chunk_size
+		self.initializer, self.initargs = initializer, initargs
+		self.depth = depth
+
+	def get_out_path(self, key):
+		"""
+		Returns the path to the .tsv file of the given combination.
+		"""
+
+		return os.path.join(self.out_dirpath, self.filename(key))
+
+	def get_header(self, key):
+		"""
+		Returns the header row of the .tsv file of the given combination.
+		"""
+
+		return self.header[key] if isinstance(self.header, dict) else \
+			self.header
+
+	def map(self, func, sids, load=None):
+		"""
+		Maps the given worker function over the given stories, yielding its
+		results along with their stories, in the order of the stories.
+
+		@param func - Worker function (defined at module level, so that it can
+			be pickled)
+		@param sids - List of story Id's
+		@param load - Function (defined at module level) returning the
+			artifacts of a story, which are prefetched and passed to the worker
+			function along with the story Id (Default is None, for no
+			prefetching)
+		@return Iterator of (<story Id>, <result>) tuples
+		"""
+
+		if self.n == 1:
+			if self.initializer is not None:
+				self.initializer(*self.initargs)
+
+			if load is None:
+				results = ((sid, func(sid)) for sid in sids)
+			else:
+				results = ((sid, func(sid, data)) for sid, data
+					in prefetch(load, sids, self.depth))
+
+			for result in results:
+				yield result
+
+			return
+
+		log_rss("Forking %d workers" % self.n)
+
+		pool = Pool(self.n, init_worker, (self.initializer, self.initargs))
+		try:
+			if load is None:
+				results = pool.imap(map_story, [(func, sid) for sid in sids],
+					self.chunk_size)
+			else:
+				# Each worker prefetches the stories of its chunk.
+				size = max(self.chunk_size, PREFETCH_CHUNKS * self.depth)
+				results = itertools.chain.from_iterable(pool.imap(map_chunk,
+					[(func, load, sids[i:i + size], self.depth)
+						for i in range(0, len(sids), size)]))
+
+			for result in results:
+				yield result
+
+			for worker in active_children():
+				log_rss("Worker %d finished" % worker.pid, worker.pid)
+
+			pool.close()
+		except:
+			pool.terminate()
+			raise
+		finally:
+			pool.join()
+
+	def run(self, func, sids, prefix=lambda sid: [sid], signature=None,
+		resume=True, load=None):
+		"""
+		Maps the given worker function over the given stories, writing a row
+		for each story to the .tsv file of each combination. Stories already
+		completed by an interrupted run are skipped (if resuming).
+
+		@param func - Worker function (defined at module level, so that it can
+			be pickled) taking a story Id (and its artifacts, if prefetching)
+			and returning a map from combination to list of values
+			(Combinations left out, or a return value of None for the whole
+			story, are skipped)
+		@param sids - List of story Id's
+		@param prefix - Function returning the first values of the row of a
+			story (Default is just the story Id)
+		@param signature - JSON-serializable settings that the values depend
+			on, beyond the output paths (See CheckpointedWriter) (Default is
+			None)
+		@param resume - Whether or not to resume an interrupted run, if any
+			(Default is True)
+		@param load - Function returning the artifacts of a story to prefetch
+			(See map) (Default is None)
+		@return # stories written
+		"""
+
+		writers = []
+		try:
+			for key in self.keys:
+				out_path = self.get_out_path(key)
+
+				# Create the output directory if it doesn't already exist.
+				dirpath = os.path.dirname(out_path)
+				if dirpath and not os.path.exists(dirpath):
+					os.makedirs(dirpath)
+
+				logging.info("Outputting to %s..." % out_path)
+
+				writers.append((key, CheckpointedWriter(out_path,
+					self.get_header(key), signature=signature, resume=resume)))
+
+			# Stories completed for every combination are skipped.
+			todo = [sid for sid in sids
+				if not all(writer.done(sid) for _, writer in writers)]
+			if len(todo) < len(sids):
+				logging.info("Skipping %d completed stories..." %
+					(len(sids) - len(todo)))
+
+			num_written = num_processed = 0
+			for sid, vals in self.map(func, todo, load):
+				if vals is None:
+					logging.info("Skipping %s..." % sid)
+				else:
+					num_written += 1
+
+				row_prefix = None
+				for key, writer in writers:
+					rows = []
+					if vals is not None and key in vals:
+						if row_prefix is None:
+							row_prefix = prefix(sid)
+
+						rows.append(row_prefix + list(vals[key]))
+
+					# Skipped stories are recorded too, so as not to be redone.
+					writer.write(sid, rows)
+
+				num_processed += 1
+				if num_processed % 100 == 0:
+					logging.info("Processed %d/%d stories..." % (num_processed,
+						len(todo)))
+
+			# Outputs missing any story are left to be resumed, not finalized.
+			if num_processed != len(todo):
+				raise RuntimeError("Processed %d of %d stories." %
+					(num_processed, len(todo)))
+		except:
+			for _, writer in writers:
+				writer.close()
+			raise
+
+		for _, writer in writers:
+			writer.finalize()
+
+		return num_written
@@ -0,0 +1,207 @@
+"""
+Checkpointed, resumable .tsv outputs. Rows are written through a staging file
+next to the output ('<output>.partial'), and each completed unit of work (e.g.
+a story, or a block of story pairs) is recorded in a journal ('<output>.journal')
+along with the size of the staging file once its rows were written. An
+interrupted run can then resume, skipping the completed units (and dropping any
+rows of an incomplete one), and the output only appears, atomically, once the
+run has finished.
+"""
+
+import csv
+import hashlib
+import json
+import logging
+import os
+
+
+# Extensions of the staging and journal files.
+PARTIAL_EXT = '.partial'
+JOURNAL_EXT = '.journal'
+
+
+def encode_unit(unit):
+	"""
+	Encodes the given unit (any JSON-serializable key, e.g. a story Id or a
+	tuple of them) as a single line of text.
+	"""
+
+	return json.dumps(unit, separators=(',', ':'))
+
+
+def digest(obj):
+	"""
+	Returns a short digest of the given JSON-serializable object (e.g. a list of
+	story pairs), for use in a signature.
+	"""
+
+	return hashlib.md5(encode_unit(obj)).hexdigest()
+
+
+class CheckpointedWriter(object):
+	"""
+	Writes the rows of a .tsv file unit by unit, so that writing can resume
+	after an interruption.
+	"""
+
+	def __init__(self, out_path, header, signature=None, resume=True,
+		sync=False):
+		"""
+		@param out_path - Output path to .tsv file
+		@param header - Header row
+		@param signature - JSON-serializable settings that the units depend on
+			(e.g. a block size), which an interrupted run must match to be
+			resumed (Default is None, for just the header)
+		@param resume - Whether or not to resume from the staging and journal
+			files of an interrupted run, if any (Default is True)
+		@param sync - Whether or not to sync the staging and journal files to
+			disk after each unit, rather than just flushing them (to survive
+			a system crash, and not just the process dying) (Default is False)
+		"""
+
+		self.out_path, self.header = out_path, header
+		self.sync = sync
+
+		self.partial_path = out_path + PARTIAL_EXT
+		self.journal_path = out_path + JOURNAL_EXT
+
+		# First entry of the journal, identifying the run.
+		self.signature = '#' + encode_unit([header, signature])
+
+		# Encoded completed units.
+		self.completed = set()
+
+		offset = self.load_journal() if resume else None
+
+		if offset is None:
+			self.f = open(self.partial_path, 'wb')
+			self.writer = csv.writer(self.f, delimiter='\t', quotechar='"')
+
+			# Write header.
+			self.writer.writerow(header)
+
+			self.journal = open(self.journal_path, 'wb')
+			self.commit(None)
+		else:
+			logging.info("Resuming %s (%d units completed)..." % (out_path,
+				len(self.completed)))
+
+			# Rows after the last completed unit are dropped.
+			self.f = open(self.partial_path, 'r+b')
+			self.f.truncate(offset)
+			self.f.seek(offset)
+			self.writer = csv.writer(self.f, delimiter='\t', quotechar='"')
+
+			self.journal = open(self.journal_path, 'ab')
+
+	def load_journal(self):
+		"""
+		Reads the journal of an interrupted run into the completed units.
+
+		@return Size of the staging file as of the last completed unit (None if
+			there's nothing to resume)
+		"""
+
+		if not os.path.exists(self.partial_path) or \
+			not os.path.exists(self.journal_path):
+			return None
+
+		offset = None
+		with open(self.journal_path, 'rb') as f:
+			for k, line in enumerate(f):
+				# Partially written (last) line.
+				if not line.endswith('\n'):
+					break
+
+				entry_offset, unit = line.rstrip('\n').split('\t', 1)
+
+				# A run with other settings.
+				if k == 0 and unit != self.signature:
+					logging.info("Discarding checkpoint of %s (Different "
+						"settings)..." % self.out_path)
+					return None
+
+				offset = int(entry_offset)
+				if k > 0:
+					self.completed.add(unit)
+
+		if offset is None or offset > os.path.getsize(self.partial_path):
+			self.completed.clear()
+			return None
+
+		return offset
+
+	def done(self, unit):
+		"""
+		Checks whether the given unit has been completed.
+		"""
+
+		return encode_unit(unit) in self.completed
+
+	def commit(self, unit):
+		"""
+		Records the given unit as completed, once its rows are in the staging
+		file (None records the signature, once the header is written).
+		"""
+
+		self.f.flush()
+		if self.sync:
+			os.fsync(self.f.fileno())
+
+		encoded = self.signature if unit is None else encode_unit(unit)
+
+		self.journal.write('%d\t%s\n' % (self.f.tell(), encoded))
+		self.journal.flush()
+		if self.sync:
+			os.fsync(self.journal.fileno())
+
+		if unit is not None:
+			self.completed.add(encoded)
+
+	def write(self, unit, rows):
+		"""
+		Writes the rows of the given unit and records it as completed (unless it
+		already has been).
+
+		@param unit - Unit (JSON-serializable key)
+		@param rows - Iterable of rows (An empty one records the unit as
+			completed without any rows)
+		@return Whether or not the rows were written
+		"""
+
+		if self.done(unit):
+			return False
+
+		self.writer.writerows(rows)
+		self.commit(unit)
+
+		return True
+
+	def close(self):
+		"""
+		Closes the staging and journal files, leaving them to resume from.
+		"""
+
+		if not self.f.closed:
+			self.f.close()
+		if not self.journal.closed:
+			self.journal.close()
+
+	def finalize(self):
+		"""
+		Moves the staging file to the output path, and removes the journal.
+		"""
+
+		self.close()
+
+		os.rename(self.partial_path, self.out_path)
+		os.remove(self.journal_path)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		if exc_type is None:
+			self.finalize()
+		else:
+			self.close()
@@ -0,0 +1,122 @@
+"""
+Calculates the class similarity of stories with respect to categories (e.g.
+genres or periods), as the cosine similarity of each story's collocate vector
+to the mean (centroid) vector of its category, for every story and category at
+once from a shared sparse story x term matrix.
+"""
+
+import numpy as np
+
+from collections import Counter
+from scipy.sparse import csr_matrix, diags
+from sklearn.feature_extraction.text import CountVectorizer
+
+from store import Vocabulary
+
+
+# Analyzer splitting collocate lemmas into terms, as in
+# CollocatesManager.get_dtmatrix.
+analyzer = CountVectorizer().build_analyzer()
+
+
+def count_terms(lemmas):
+	"""
+	Returns the term counts of the given collocate lemmas.
+	"""
+
+	return Counter(analyzer(' '.join(lemmas)))
+
+
+def build_matrix(cntrs, vocab=None):
+	"""
+	Builds the story x term count matrix of the given term counters.
+
+	@param cntrs - List of term counters, one per story (row)
+	@param vocab - Vocabulary (store.Vocabulary) giving the columns (Default
+		is a new in-memory one)
+	@return Count matrix (in CSR format), and the vocabulary
+	"""
+
+	vocab = Vocabulary() if vocab is None else vocab
+
+	indptr, indices, data = [0], [], []
+	for cntr in cntrs:
+		terms = sorted(cntr)
+		indices.extend(vocab.encode(terms, add=True))
+		data.extend(cntr[t] for t in terms)
+		indptr.append(len(indices))
+
+	X = csr_matrix((np.array(data, dtype=np.float64),
+		np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+		shape=(len(cntrs), len(vocab)))
+
+	return X, vocab
+
+
+def calc_class_sims(X, cat_rows, min_df=10, loo=False):
+	"""
+	Calculates the class similarity of each story with respect to its
+	category. As in CollocatesManager.get_dtmatrix, each category only keeps
+	the terms with a document frequency of at least min_df among its stories,
+	and story vectors are normalized (L2) before taking the category mean.
+
+	@param X - Story x term count matrix (in CSR format)
+	@param cat_rows - Map from category to list of rows (stories) of X
+	@param min_df - Minimum document frequency of a term within a category
+		(Default is 10)
+	@param loo - If True, then each story is compared against the mean of the
+		other stories of its category (leave-one-out), otherwise against the
+		mean of all of them (Default is False)
+	@return Map from category to array of class similarities, aligned with its
+		rows (NaN for stories with no terms kept, or a category with none)
+	"""
+
+	cats = sorted(cat_rows)
+
+	# Document frequencies of the terms in each category, from one
+	# (category x story) group-by product.
+	group_inds = np.concatenate([[k] * len(cat_rows[cat])
+		for k, cat in enumerate(cats)]).astype(np.int64)
+	group_rows = np.concatenate([cat_rows[cat] for cat in cats]).astype(
+		np.int64)
+	groups = csr_matrix((np.ones(len(group_rows)), (group_inds, group_rows)),
+		shape=(len(cats), X.shape[0]))
+	dfs = (groups * (X > 0).astype(np.float64)).toarray()
+
+	sims = {}
+	for k, cat in enumerate(cats):
+		rows = np.asarray(cat_rows[cat], dtype=np.int64)
+		cols = np.flatnonzero(dfs[k] >= min_df)
+
+		n = len(rows)
+		sims[cat] = np.empty(n)
+		sims[cat].fill(np.nan)
+
+		if len(cols) == 0 or n == 0 or (loo and n == 1):
+			continue
+
+		sub = X[rows][:, cols]
+		norms = np.sqrt(np.asarray(sub.multiply(sub).sum(axis=1)).ravel())
+		units = diags(np.where(norms > 0, 1.0 / np.where(norms > 0, norms, 1.0),
+			0.0)) * sub
+
+		mean = np.asarray(units.mean(axis=0)).ravel()
+		dots = units * mean
+		mean_sq = mean.dot(mean)
+
+		with np.errstate(divide='ignore', invalid='ignore'):
+			if loo:
+				# With unit story vector x and centroid m of all n stories, the
+				# centroid of the others is (n * m - x) / (n - 1).
+				sq_norms = (norms > 0).astype(np.float64)
+				loo_dots = n * dots - sq_norms
+				loo_norms = np.sqrt(np.maximum(n ** 2 * mean_sq - 2 * n * dots
+					+ sq_norms, 0.0))
+				cat_sims = loo_dots / loo_norms
+			else:
+				cat_sims = dots / np.sqrt(mean_sq)
+
+		cat_sims[norms == 0] = np.nan
+		sims[cat] = cat_sims
+
+	return sims
@@ -6,6 +6,7 @@ the corpus.
 """
 
 import csv
+import numpy as np
 import os
 import sys
 
@@ -17,6 +18,7 @@ from aliases import AliasesManager
 from characters import CharactersManager
 from dependency import DependencyParser
 from corpus import CorpusManager
+from prefetch import read_file
 from role import map_role
 
 
@@ -81,10 +83,40 @@ class CollocatesManager(object):
 
 		return os.path.exists(self.get_fpath(sid, tpe))
 
-	def parse(self, sid, tpe):
+	def get_input_fpaths(self, sid, tpe):
+		"""
+		Returns the filepaths of the files that the collocates of the given
+		story and type are read from (See get): the collocates .tsv file and
+		the aliases .json file.
+		"""
+
+		return [self.get_fpath(sid, tpe), self.aliases_manager.get_fpath(sid,
+			tpe)]
+
+	def load(self, sid, tpe):
+		"""
+		Reads the files that the collocates of the given story and type are
+		parsed from (See parse), e.g. to be prefetched (See prefetch.py).
+
+		@return Tuple of the (in-memory) CoreNLP .xml file, the aliases, and
+			the character aliases
+		"""
+
+		character_aliases = self.aliases_manager.get_aliases(sid, 'character')
+		aliases = character_aliases if tpe == 'character' else \
+			self.aliases_manager.get_aliases(sid, tpe)
+
+		return read_file(self.corpus_manager.get_corenlp_fpath(sid)), aliases, \
+			character_aliases
+
+	def parse(self, sid, tpe, inputs=None):
 		"""
 		Generates the collocates .tsv file for the given story and type
 		(Overwrites it if it already exists).
+
+		@param sid - Story Id of story
+		@param tpe - 'character', 'concept', or 'noun'
+		@param inputs - Inputs read by load (Default is None, for reading them)
 		"""
 
 		fpath = self.get_fpath(sid, tpe)
@@ -94,13 +126,12 @@ class CollocatesManager(object):
 		if not os.path.exists(dirpath):
 			os.makedirs(dirpath)
 
-		corenlp_fpath = self.corpus_manager.get_corenlp_fpath(sid)
+		if inputs is None:
+			inputs = self.load(sid, tpe)
 
-		character_aliases = self.aliases_manager.get_aliases(sid, 'character')
-		aliases = character_aliases if tpe == 'character' else \
-			self.aliases_manager.get_aliases(sid, tpe)
+		corenlp, aliases, character_aliases = inputs
 
-		self.depparser.save(corenlp_fpath, aliases, character_aliases, fpath)
+		self.depparser.save(corenlp, aliases, character_aliases, fpath)
 
 	def get(self, sid, tpe, role=None, ranks=None):
 		"""
@@ -171,18 +202,77 @@ class CollocatesManager(object):
 
 				collocates.append(coll)
 
-			# Filter collocates based on the role.
-			if role:
-				collocates = [coll for coll in collocates
-								if map_role(coll['type']) == role]
+			return self.filter(collocates, role=role, ranks=ranks)
+
+	@staticmethod
+	def filter(collocates, role=None, ranks=None):
+		"""
+		Filters the given collocates (as returned by get) on role and character
+		ranks, so that the collocates of a story can be read once for many
+		combinations.
 
-			# Filter collocates based on the ranks.
-			if ranks:
-				ranks = set(ranks)
-				collocates = [coll for coll in collocates
-								if coll['alias']['entity']['rank'] in ranks]
+		@param collocates - List of collocates
+		@param role - Role to filter on (If None (default), all collocates are
+			kept)
+		@param ranks - List of character ranks to filter on (If None (default),
+			collocates for all characters are kept)
+		@return List of collocates
+		"""
+
+		# Filter collocates based on the role.
+		if role:
+			collocates = [coll for coll in collocates
+							if map_role(coll['type']) == role]
+
+		# Filter collocates based on the ranks.
+		if ranks:
+			ranks = set(ranks)
+			collocates = [coll for coll in collocates
+							if coll['alias']['entity']['rank'] in ranks]
+
+		return collocates
+
+	def get_arrays(self, sid, tpe):
+		"""
+		Returns the collocates from the saved .tsv file for the given story and
+		type (See get) as parallel arrays with one entry per collocate, so that
+		they can be filtered by rank and role many times over without
+		re-reading the file.
+
+		@param sid - Story Id of story
+		@param tpe - 'character', 'concept', or 'noun'
+		@return Map from field ('type', 'role', 'rank', 'lemma', or 'word') to
+			array
+		"""
+
+		collocates = self.get(sid, tpe)
+
+		types = [coll['type'] for coll in collocates]
+
+		return {
+			'type': np.array(types, dtype=object),
+			'role': np.array([map_role(t) for t in types], dtype=object),
+			'rank': np.array([coll['alias']['entity']['rank']
+				for coll in collocates], dtype=np.int64),
+			'lemma': np.array([coll['token']['lemma'] for coll in collocates],
+				dtype=object),
+			'word': np.array([coll['token']['word'] for coll in collocates],
+				dtype=object)
+		}
+
+	def get_lemmas(self, sid, tpe):
+		"""
+		Returns the set of lemmas of the collocates in the saved .tsv file for
+		the given story and type (without joining them with the aliases).
+		"""
+
+		with open(self.get_fpath(sid, tpe), 'rb') as f:
+			reader = csv.reader(f, delimiter='\t', quotechar='"')
+
+			# Skip header.
+			next(reader)
 
-			return collocates
+			return set(row[3] for row in reader)
 
 	def get_dtmatrix(self, sids, tpe, role=None, ranks=None, min_df=10,
 		normal=False):
@@ -1,8 +1,10 @@
 import csv
 import json
+import numpy as np
 import os
 
 from collections import Counter
+from scipy.sparse import csr_matrix
 
 from corpus import CorpusManager
 from unigrams import UnigramsManager
@@ -11,13 +13,57 @@ from unigrams import UnigramsManager
 CONCEPTS = set(['man', 'woman', 'life', 'mind'])
 
 
+def load_lexicon(fpath):
+	"""
+	Loads a concept lexicon, with one concept lemma per line (Multi-word
+	entries are hyphenated).
+
+	@param fpath - Path to lexicon file
+	@return Set of concept lemmas
+	"""
+
+	with open(fpath) as f:
+		return set(l.strip().replace(' ', '-').decode('utf-8') for l in f
+			if l.strip())
+
+
+def format_concepts(concept_counter):
+	"""
+	Formats the given concept counts according to the concepts .json format
+	(As returned by ConceptsManager.get_concepts).
+
+	@param concept_counter - Counter of concept lemmas
+	@return List of concepts in reverse order of frequency
+	"""
+
+	return [{
+				'aliases': [
+					{
+						'alias': concept,
+						'count': count
+					}
+				],
+				'character': concept,
+				'count': count
+			}
+			for concept, count
+			in sorted(concept_counter.items(), key=lambda i: -i[1])]
+
+
 class ConceptsFromUnigramsExtractor(object):
 	"""
 	Extracts a concepts from a unigram counts .tsv file.
 	"""
 
-	def __init__(self):
-		pass
+	def __init__(self, concepts=None, pos=None):
+		"""
+		@param concepts - Set of concept lemmas (Default is CONCEPTS)
+		@param pos - Simplified POS tag (e.g. 'N') to restrict concept unigrams
+			to (If None (default), counts are summed across POS tags)
+		"""
+
+		self.concepts = CONCEPTS if concepts is None else concepts
+		self.pos = pos
 
 	def extract(self, unigrams_path):
 		"""
@@ -29,21 +75,12 @@ class ConceptsFromUnigramsExtractor(object):
 		with open(unigrams_path, 'rb') as f:
 			reader = csv.reader(f, delimiter='\t', quotechar='"')
 			for row in reader:
-				if row[0] in CONCEPTS:
-					concept_counter[row[0]] += int(row[2])
-
-		return [{
-					'aliases': [
-						{
-							'alias': concept,
-							'count': count
-						}
-					],
-					'character': concept,
-					'count': count
-				}
-				for concept, count
-				in sorted(concept_counter.items(), key=lambda i: -i[1])]
+				lemma = row[0].decode('utf-8')
+				if lemma in self.concepts and (self.pos is None or
+					row[1].decode('utf-8') == self.pos):
+					concept_counter[lemma] += int(row[2])
+
+		return format_concepts(concept_counter)
 
 	def save(self, concepts, out_path):
 		"""
@@ -55,16 +92,124 @@ class ConceptsFromUnigramsExtractor(object):
 			json.dump(concepts, f, sort_keys=True, indent=4)
 
 
+class ConceptsFromMatrixExtractor(ConceptsFromUnigramsExtractor):
+	"""
+	Extracts concepts from the corpus unigram matrix. The concept lemmas are
+	resolved to unigram Id's once, after which the concept counts of any number
+	of stories are gathered from the matrix columns of those Id's.
+	"""
+
+	def __init__(self, concepts=None, pos=None, unigrams_manager=None):
+		"""
+		@param concepts - Set of concept lemmas (Default is CONCEPTS)
+		@param pos - Simplified POS tag (See ConceptsFromUnigramsExtractor)
+		@param unigrams_manager - Unigrams manager whose matrix to read
+			(Default is a new one)
+		"""
+
+		super(ConceptsFromMatrixExtractor, self).__init__(concepts, pos)
+
+		self.um = (UnigramsManager() if unigrams_manager is None else
+			unigrams_manager)
+
+		self.resolve()
+
+	def resolve(self):
+		"""
+		Resolves the concept lemmas to unigram Id's, building the (sparse)
+		unigram x concept indicator matrix that sums unigram counts into concept
+		counts.
+		"""
+
+		self.um.vocab.refresh()
+
+		# Concepts in column order.
+		self.concept_list = sorted(self.concepts)
+		concept_cols = {c: j for j, c in enumerate(self.concept_list)}
+
+		rows, cols = [], []
+		for i, term in enumerate(self.um.vocab.terms):
+			lemma, pos = self.um.from_term(term)
+
+			if lemma in concept_cols and (self.pos is None or pos == self.pos):
+				rows.append(i)
+				cols.append(concept_cols[lemma])
+
+		self.num_unigrams = len(self.um.vocab)
+		self.indicator = csr_matrix((np.ones(len(rows), dtype=np.int64),
+			(rows, cols)), shape=(self.num_unigrams, len(self.concept_list)))
+
+	def extract_all(self, sids):
+		"""
+		Extracts the concepts for the given stories (All must be in the corpus
+		unigram matrix).
+
+		@param sids - List of story Id's
+		@return Map from story Id to list of concepts (formatted according to
+			ConceptsManager.get_concepts)
+		"""
+
+		mat, sids = self.um.get_matrix(sids)
+
+		# Unigrams added to the vocabulary after resolving aren't concepts.
+		concept_cnts = mat[:, :self.num_unigrams].dot(self.indicator).tocsr()
+
+		concepts = {}
+		for i, sid in enumerate(sids):
+			start, end = concept_cnts.indptr[i], concept_cnts.indptr[i + 1]
+
+			concepts[sid] = format_concepts(Counter({
+				self.concept_list[j]: int(cnt) for j, cnt
+				in zip(concept_cnts.indices[start:end],
+					concept_cnts.data[start:end]) if cnt > 0}))
+
+		return concepts
+
+	def extract(self, sid):
+		"""
+		Extracts the concepts for the given story (Must be in the corpus unigram
+		matrix).
+		"""
+
+		return self.extract_all([sid])[sid]
+
+
 class ConceptsManager(object):
 	"""
 	Manages the list of concepts for each story in the corpus.
 	"""
 
-	def __init__(self):
-		self.extractor = ConceptsFromUnigramsExtractor()
+	def __init__(self, lexicon_fpath=None, pos=None):
+		"""
+		@param lexicon_fpath - Path to concept lexicon file (If None (default),
+			CONCEPTS are used)
+		@param pos - Simplified POS tag to restrict concepts to (Default is
+			None, for any)
+		"""
+
+		self.concepts = (CONCEPTS if lexicon_fpath is None else
+			load_lexicon(lexicon_fpath))
+		self.pos = pos
+
+		self.extractor = ConceptsFromUnigramsExtractor(self.concepts, pos)
 		self.cm = CorpusManager()
 		self.um = UnigramsManager()
 
+		# Matrix-based extractor (Created on first use, since resolving a large
+		# lexicon takes a pass over the unigram vocabulary).
+		self.matrix_extractor = None
+
+	def get_matrix_extractor(self):
+		"""
+		Returns the matrix-based extractor.
+		"""
+
+		if self.matrix_extractor is None:
+			self.matrix_extractor = ConceptsFromMatrixExtractor(self.concepts,
+				self.pos, self.um)
+
+		return self.matrix_extractor
+
 	def get_fpath(self, sid):
 		"""
 		Returns the filepath to the concepts .json file for the given story.
@@ -97,9 +242,28 @@ class ConceptsManager(object):
 		if it already exists).
 		"""
 
-		concepts = self.extractor.extract(self.um.get_fpath(sid))
+		if self.um.stored(sid):
+			concepts = self.get_matrix_extractor().extract(sid)
+		# Fall back on the story's unigram counts .tsv file.
+		else:
+			concepts = self.extractor.extract(self.um.get_fpath(sid))
+
 		self.extractor.save(concepts, self.get_fpath(sid))
 
+	def gen_all(self, sids):
+		"""
+		Generates the concepts .json files for the given stories in a single
+		pass over the corpus unigram matrix (Overwrites them if they already
+		exist).
+
+		@param sids - List of story Id's (All must be in the corpus unigram
+			matrix)
+		"""
+
+		for sid, concepts in \
+			self.get_matrix_extractor().extract_all(sids).iteritems():
+			self.extractor.save(concepts, self.get_fpath(sid))
+
 	def get_concepts(self, sid):
 		"""
 		Retrieves the concepts dictioanry for the given story from the stored
@@ -16,6 +16,10 @@ def GetDataPath():
 # Data directory path.
 DATA_DIRPATH = GetDataPath() 
 
+# Path to the directory holding corpus-level stores (vocabularies, matrices,
+# etc.), kept inside the data directory but hidden from the story listing.
+STORE_DIRPATH = os.path.join(DATA_DIRPATH, '.corpus')
+
 
 class StoryManager(object):
 	"""
@@ -786,6 +790,11 @@ class CorpusManager(object):
 
 		for file in textdirs:
 			text_dir = os.path.join(self.dirpath, file)
+
+			# Skip corpus-level stores and stray files.
+			if file.startswith('.') or not os.path.isdir(text_dir):
+				continue
+
 			self.texts.append(StoryManager(dirpath=text_dir, id=file, date=0))
 
 	def get_ids(self, origin):
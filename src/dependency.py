@@ -16,6 +16,8 @@ from collections import defaultdict
 from corenlp_xml.document import Document
 from corenlp_xml.dependencies import DependencyGraph
 
+from prefetch import open_input
+
 
 # List of defined dependency types.
 TYPES = ['acomp', 'agent-verb', 'agent-nusbj', 'agent-nusbjpass', 'amod',
@@ -287,7 +289,8 @@ class DependencyParser(object):
 		'CHAR-r', where r is the rank of the character corresponding to the
 		alias.		
 
-		@param fpath - Filepath to CoreNLP .xml file
+		@param fpath - Filepath to CoreNLP .xml file (or file object, e.g.
+			prefetched)
 		@param aliases - List of aliases (as returned by AliasManager.ident)
 		@param character_aliases - List of character aliases (as returned by
 			AliasManager.ident)
@@ -312,7 +315,7 @@ class DependencyParser(object):
 			for alias in character_aliases:
 				chalias_dict[alias['sentence_index']].append(alias)
 
-		with open(fpath) as f:
+		with open_input(fpath) as f:
 			# Document model.
 			doc = Document(f.read())
 
@@ -350,7 +353,7 @@ class DependencyParser(object):
 		VMOD_INDEX - Verbal modifier token index (if it exists, otherwise blank)
 		VMOD_LEMMA - Verbal modifier lemma (if it exists, otherwise blank)
 
-		@param: fpath - Filepath to CoreNLP .xml file
+		@param: fpath - Filepath to CoreNLP .xml file (or file object)
 		@param: aliases - List of aliases (as returned by AliasIdentifier.ident)
 		@param character_aliases - List of character aliases (as returned by
 			AliasManager.ident)
@@ -4,16 +4,20 @@ Calculates Depth of stories.
 @author: Hardik
 """
 
-import os
+import math
 import numpy as np
+import os
 import sys
 
-from gensim.models import Word2Vec
-from itertools import combinations
+from collections import Counter
 from nltk.corpus import wordnet as wn
+from scipy.sparse import csr_matrix
 
 from collocates import CollocatesManager
 from corpus import DATA_DIRPATH, CorpusManager
+from embeddings import CompactEmbeddings
+from pathsim import PathSimilarityCache
+from resultcache import cached
 from role import map_role
 
 
@@ -21,6 +25,58 @@ from role import map_role
 collocates_manager = CollocatesManager()
 
 
+# Input files and parameters of the (cached) depth calculations of a story (See
+# resultcache.cached).
+def get_char_inputs(calculator, sid):
+	return collocates_manager.get_input_fpaths(sid, 'character')
+
+
+def get_vector_inputs(calculator, sid):
+	return get_char_inputs(calculator, sid) + calculator.MODEL.get_fpaths()
+
+
+def get_params(calculator, sid):
+	return [calculator.role,
+		list(calculator.ranks) if calculator.ranks else None]
+
+
+def pairwise_cosine_stats(vectors, cnts, block_size=1024):
+	"""
+	Calculates the mean and standard deviation of the cosine similarity over
+	every pair of occurrences of the given vectors, without enumerating the
+	pairs. With unit vectors u_k occurring c_k times (n in all), the sum over
+	pairs is (|sum_k c_k u_k|^2 - sum_k c_k |u_k|^2) / 2, and the sum of
+	squares is read off the Gram matrix likewise, one block of rows at a time.
+
+	@param vectors - Array of vectors, one row per unique word
+	@param cnts - Array of # occurrences of each vector (n >= 2 in all)
+	@param block_size - # rows per block of the Gram matrix (Default is 1024)
+	@return Mean and standard deviation of pairwise cosine similarity, as a pair
+	"""
+
+	norms = np.sqrt((vectors ** 2).sum(axis=1))
+	# Zero vectors have zero similarity with everything.
+	units = vectors / np.where(norms > 0, norms, 1.0)[:, np.newaxis]
+	sq_norms = (units ** 2).sum(axis=1)
+
+	n = cnts.sum()
+	num_pairs = n * (n - 1) / 2
+
+	sum_vec = cnts.dot(units)
+	sim_sum = (sum_vec.dot(sum_vec) - cnts.dot(sq_norms)) / 2
+
+	sq_sum = 0.0
+	for start in xrange(0, len(units), block_size):
+		gram = units[start:start + block_size].dot(units.T)
+		sq_sum += cnts[start:start + block_size].dot((gram ** 2).dot(cnts))
+	sq_sum = (sq_sum - cnts.dot(sq_norms ** 2)) / 2
+
+	mean = sim_sum / num_pairs
+	var = max(sq_sum / num_pairs - mean ** 2, 0.0)
+
+	return mean, math.sqrt(var)
+
+
 class DepthCalculator(object):
 	"""
 	Interface for a depth calculator.
@@ -34,11 +90,13 @@ class DepthCalculator(object):
 
 		self.role, self.ranks = role, ranks
 
-	def calc(self, sid):
+	def calc(self, sid=None, collocates=None):
 		"""
-		Calculates the depth for the given story.
+		Calculates the depth for the given story or list of collocates.
 
-		@param sid - Story id of story
+		@param sid - Story id of story (Default is None)
+		@param collocates - Collocates (Default is None, for reading those of
+			the story with the calculator's role and ranks)
 		@return Depth value
 		"""
 
@@ -50,39 +108,60 @@ class VectorDepthCalculator(DepthCalculator):
 	Calculates depth of a story using collocate vectors.
 	"""
 
-	# Shared Word2Vec model.
-	MODEL = Word2Vec.load_word2vec_format(os.path.join(DATA_DIRPATH,
-		'GoogleNews-vectors-negative300.bin.gz'), binary=True)
+	# Shared Word2Vec vectors of the corpus collocate lemmas (Memory-mapped
+	# on first use; See scripts/extract_collocate_vectors.py).
+	MODEL = CompactEmbeddings()
 
-	def calc(self, sid):
+	def __init__(self, role, ranks, block_size=1024, model=None):
 		"""
-		Calculates the depth for the given story by computing the average and
-		standard deviation of pairwise vector distance (cosine) between
-		collocates.
+		@param role - Role to consider (None means all)
+		@param ranks - Iterable of ranks to consider
+		@param block_size - # unique collocates per block of the Gram matrix
+			(Default is 1024)
+		@param model - Embeddings (embeddings.Embeddings) to use instead of
+			the shared collocate vectors (Default is None)
+		"""
+
+		super(VectorDepthCalculator, self).__init__(role, ranks)
+		self.block_size = block_size
 
-		@param sid - Story id of story
+		if model is not None:
+			self.MODEL = model
+
+	@cached('depth.vector/1', get_vector_inputs, get_params)
+	def calc(self, sid=None, collocates=None):
+		"""
+		Calculates the depth for the given story or list of collocates by
+		computing the average and standard deviation of pairwise vector
+		distance (cosine) between collocates.
+
+		@param sid - Story id of story (Default is None)
+		@param collocates - Collocates (Default is None)
 		@return Average and stndard deviation of pairwise vector distance of
 			collocates, as a paire (returns (-1.0, -1.0) if there are not enough
 			collocates)
 		"""
 
-		collocates = collocates_manager.get(sid, tpe='character',
-			role=self.role, ranks=self.ranks)
+		if collocates is None:
+			collocates = collocates_manager.get(sid, tpe='character',
+				role=self.role, ranks=self.ranks)
 
-		words = (coll['token']['lemma'] for coll in collocates)
-		dists = []
-		for w1, w2 in combinations(words, 2):
-			# Ignore collocates with no corresponding vector (including
-			# collocates that are character aliases for now).
-			try:
-				dists.append(1 - self.MODEL.similarity(w1, w2))
-			except KeyError:
-				continue
+		# Unique collocates with a corresponding vector (ignoring the rest,
+		# including collocates that are character aliases for now), and their
+		# multiplicities.
+		cntr = Counter(coll['token']['lemma'] for coll in collocates)
+		rows = [(self.MODEL.get_index(w), c) for w, c in cntr.iteritems()]
+		rows = [(i, c) for i, c in rows if i >= 0]
 
-		if len(dists) == 0:
+		if sum(c for _, c in rows) < 2:
 			return (-1.0, -1.0)
-			
-		return (np.mean(dists), np.std(dists))
+
+		vectors = np.array([self.MODEL.vectors[i] for i, _ in rows],
+			dtype=np.float64)
+		cnts = np.array([c for _, c in rows], dtype=np.float64)
+
+		mean, std = pairwise_cosine_stats(vectors, cnts, self.block_size)
+		return (1 - mean, std)
 
 
 class WordNetDepthCalculator(DepthCalculator):
@@ -90,43 +169,106 @@ class WordNetDepthCalculator(DepthCalculator):
 	Calculates depth of a story using WordNet path distance of collocates.
 	"""
 
-	def calc(self, sid):
+	def __init__(self, role, ranks, cache=None, block_entries=2 ** 22):
 		"""
-		Calculates the depth for the given story by computing the average
-		pairwise path distance between collocates.
+		@param role - Role to consider (None means all)
+		@param ranks - Iterable of ranks to consider
+		@param cache - Synset pair path similarity cache
+			(pathsim.PathSimilarityCache) (Default is a new one)
+		@param block_entries - Max # entries of each block of synset pair
+			counts (and of the collocate counts it's gathered from) (Default is
+			2 ** 22)
+		"""
+
+		super(WordNetDepthCalculator, self).__init__(role, ranks)
+
+		self.cache = PathSimilarityCache() if cache is None else cache
+		self.block_entries = block_entries
+		# Map from lemma to the name of its MFS (None if it has none).
+		self.lemma_synsets = {}
+
+	def get_synset(self, lemma):
+		"""
+		Returns the name of the MFS of the given lemma (None if it has none).
+		"""
+
+		if lemma not in self.lemma_synsets:
+			# TODO: Handle error better.
+			try:
+				# TODO: Add POS tag.
+				syns = wn.synsets(lemma)
+				# Take MFS.
+				self.lemma_synsets[lemma] = \
+					syns[0].name() if len(syns) > 0 else None
+			except UnicodeDecodeError:
+				self.lemma_synsets[lemma] = None
+
+		return self.lemma_synsets[lemma]
+
+	@cached('depth.wordnet/1', get_char_inputs, get_params)
+	def calc(self, sid=None, collocates=None):
+		"""
+		Calculates the depth for the given story or list of collocates by
+		computing the average pairwise path distance between collocates.
+		Distances are looked up once per pair of unique synsets, weighted by the
+		# pairs of collocates they stand for.
 
-		@param sid - Story id of story
+		@param sid - Story id of story (Default is None)
+		@param collocates - Collocates (Default is None)
 		@return Average pairwise path distance of collocates (returns -1.0 if 
 			there are not enough collocates)
 		"""
 
-		collocates = collocates_manager.get(sid, tpe='character',
-			role=self.role, ranks=self.ranks)
+		if collocates is None:
+			collocates = collocates_manager.get(sid, tpe='character',
+				role=self.role, ranks=self.ranks)
 		num_collocates = len(collocates)
 
 		if num_collocates == 0 or num_collocates == 1:
 			return -1.0
 
-		# List of collocate synsets, one per collocate.
-		coll_syns = []
+		# Collocate synsets, one per collocate, coded by unique synset.
+		syn_inds, codes = {}, []
 		for coll in collocates:
-			# TODO: Handle error better.
-			try:
-				# TODO: Add POS tag.
-				syns = wn.synsets(coll['token']['lemma'])
-				if len(syns) > 0:
-					# Take MFS.
-					coll_syns.append(syns[0])
-			except UnicodeDecodeError:
-				pass
+			syn = self.get_synset(coll['token']['lemma'])
+			if syn is not None:
+				codes.append(syn_inds.setdefault(syn, len(syn_inds)))
 
-		dist_sum, n = 0.0, 0
-		for syn1, syn2 in combinations(coll_syns, 2):
-			ps = syn1.path_similarity(syn2)
-			dist_sum += (1 - ps) if ps else 1.0
-			n += 1
-
-		if n == 0:
+		n = len(codes)
+		if n < 2:
 			return -1.0
 
-		return dist_sum / n
+		codes = np.array(codes, dtype=np.int64)
+		num_syns = len(syn_inds)
+		syns = sorted(syn_inds, key=syn_inds.get)
+
+		# Collocate x synset indicator matrix.
+		occurrences = csr_matrix((np.ones(n, dtype=np.int64),
+			(np.arange(n), codes)), shape=(n, num_syns))
+
+		# # collocate pairs with each (ordered) pair of synsets, since path
+		# similarity depends on which synset comes first, gathered for a block
+		# of first synsets at a time: the # occurrences of each synset of the
+		# block before each collocate, summed by the collocate's synset.
+		block_size = max(1, self.block_entries // max(n, num_syns))
+
+		dist_sum = 0.0
+		for start in xrange(0, num_syns, block_size):
+			block = np.arange(start, min(start + block_size, num_syns))
+
+			in_block = codes[:, np.newaxis] == block
+			before = np.cumsum(in_block, axis=0) - in_block
+
+			# Transposed, with one row per second synset.
+			pair_cnts = np.asarray(occurrences.T.dot(before))
+
+			inds2, inds1 = np.nonzero(pair_cnts)
+			pairs = [(syns[block[i]], syns[j]) for i, j in zip(inds1, inds2)]
+
+			sims = self.cache.get(pairs)
+
+			for pair, cnt in zip(pairs, pair_cnts[inds2, inds1]):
+				ps = sims[pair]
+				dist_sum += cnt * ((1 - ps) if ps else 1.0)
+
+		return dist_sum / (n * (n - 1) / 2)
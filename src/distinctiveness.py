@@ -6,19 +6,49 @@ Calculates Distinctiveness of stories.
 
 import os
 import math
+import numpy as np
 import random
 import sys
 
 from collections import Counter, defaultdict
 from scipy import stats
+from scipy.sparse import csr_matrix
 
 from collocates import CollocatesManager
 from corpus import CorpusManager
+from ranks import RANK_GROUPS
+from resultcache import cached
+from role import map_role, ROLES
+from store import Vocabulary
 
 
 # Global collocates manager.
 collocates_manager = CollocatesManager()
 
+# Measures that SparseProbability can calculate between distrubtions.
+MEASURES = ('kl', 'tv', 'js', 'hellinger')
+
+
+# Input files and parameters of the (cached) distinctiveness calculations of a
+# story (See resultcache.cached).
+def get_char_inputs(calculator, sid):
+	return collocates_manager.get_input_fpaths(sid, 'character')
+
+
+def get_char_noun_inputs(calculator, sid):
+	return collocates_manager.get_input_fpaths(sid, 'character') + \
+		collocates_manager.get_input_fpaths(sid, 'noun')
+
+
+def get_params(calculator, sid):
+	return [calculator.role,
+		list(calculator.ranks) if calculator.ranks else None]
+
+
+def get_moments_params(calculator, sid):
+	return [[[rg_name, list(ranks) if ranks else None]
+		for rg_name, ranks in calculator.rank_groups], calculator.roles]
+
 
 class Probability(object):
 	"""
@@ -89,6 +119,84 @@ class Probability(object):
 
 		return stats.skew(dist.values())
 
+	@staticmethod
+	def count_hist(collocates):
+		"""
+		Calculates the frequency-of-frequency histogram of the lemma counts of
+		the given collocates (Character alias collocates are squashed as in
+		Probability.gen_dist). Skew and kurtosis don't depend on scale, so those
+		of the histogram are those of the probability distrubtion, while the
+		histogram has far fewer entries than the vocabulary.
+
+		@param collocates - List of collocates (as returned by
+			CollocatesManager.get)
+		@return Pair of arrays, of the distinct counts and the # lemmas with
+			each count
+		"""
+
+		cnts = Counter(coll['token']['lemma'] for coll in collocates)
+
+		char_cnt = sum(cnt for lemma, cnt in cnts.iteritems()
+			if lemma.startswith('CHAR-'))
+		vals = [cnt for lemma, cnt in cnts.iteritems()
+			if not lemma.startswith('CHAR-')]
+		if char_cnt > 0:
+			vals.append(char_cnt)
+
+		return np.unique(np.array(vals, dtype=np.int64), return_counts=True)
+
+	@staticmethod
+	def hist_moments(hist):
+		"""
+		Calculates the mean and 2nd, 3rd, and 4th central moments of the values
+		described by the given frequency-of-frequency histogram.
+
+		@param hist - Histogram (as returned by Probability.count_hist)
+		@return Tuple of the # values, mean, and the three moments (NaN's if
+			there are no values)
+		"""
+
+		vals, freqs = hist[0].astype(np.float64), hist[1].astype(np.float64)
+
+		num_vals = freqs.sum()
+		if num_vals == 0:
+			return 0, np.nan, np.nan, np.nan, np.nan
+
+		mean = (freqs * vals).sum() / num_vals
+
+		devs = vals - mean
+		m2 = (freqs * devs ** 2).sum() / num_vals
+		m3 = (freqs * devs ** 3).sum() / num_vals
+		m4 = (freqs * devs ** 4).sum() / num_vals
+
+		return num_vals, mean, m2, m3, m4
+
+	@staticmethod
+	def hist_skew(hist):
+		"""
+		Calculates the skew of the values described by the given histogram
+		(as Probability.skew does).
+
+		@param hist - Histogram (as returned by Probability.count_hist)
+		@return Skew
+		"""
+
+		_, _, m2, m3, _ = Probability.hist_moments(hist)
+		return 0.0 if m2 == 0 else m3 / m2 ** 1.5
+
+	@staticmethod
+	def hist_kurtosis(hist):
+		"""
+		Calculates the (Fisher) kurtosis of the values described by the given
+		histogram (as Probability.kurtosis does).
+
+		@param hist - Histogram (as returned by Probability.count_hist)
+		@return Kurtosis
+		"""
+
+		_, _, m2, _, m4 = Probability.hist_moments(hist)
+		return -3.0 if m2 == 0 else m4 / m2 ** 2 - 3
+
 	@staticmethod
 	def kl_divergence(d1, d2):
 		"""
@@ -135,6 +243,323 @@ class Probability(object):
 
 		return 0.5 * tv
 
+	@staticmethod
+	def js_divergence(d1, d2):
+		"""
+		Calculates the Jensen-Shannon divergence (base 2) between two
+		distributions.
+
+		@param d1 - First probability distrubtion (as returned by
+			Probability.gen_dist)
+		@param d2 - Second probability distrubtion (same format as d1)
+		@return Jensen-Shannon divergence
+		"""
+
+		js = 0.0
+		for w in set(d1.keys() + d2.keys()):
+			p, q = d1.get(w, 0.0), d2.get(w, 0.0)
+			m = (p + q) / 2
+
+			if p > 0:
+				js += p * math.log(p / m, 2)
+			if q > 0:
+				js += q * math.log(q / m, 2)
+
+		return 0.5 * js
+
+	@staticmethod
+	def hellinger(d1, d2):
+		"""
+		Calculates the Hellinger distance between two distributions.
+
+		@param d1 - First probability distrubtion (as returned by
+			Probability.gen_dist)
+		@param d2 - Second probability distrubtion (same format as d1)
+		@return Hellinger distance
+		"""
+
+		h = 0.0
+		for w in set(d1.keys() + d2.keys()):
+			h += (math.sqrt(d1.get(w, 0.0)) - math.sqrt(d2.get(w, 0.0))) ** 2
+
+		return math.sqrt(0.5 * h)
+
+
+class SparseProbability(object):
+	"""
+	Provides the distribution functions of Probability on sparse vectors. Each
+	distribution is a row of a (CSR) matrix whose columns are the terms of a
+	shared vocabulary, so that many distributions can be built, and many pairs
+	of them compared, at once with array operations. The stored entries of a
+	row are the keys of the corresponding dictionary (explicit zeros included),
+	and the results are those of Probability (up to the order in which floats
+	are summed).
+	"""
+
+	def __init__(self, vocab=None):
+		"""
+		@param vocab - Vocabulary (store.Vocabulary) giving the columns
+			(Default is a new in-memory one)
+		"""
+
+		self.vocab = Vocabulary() if vocab is None else vocab
+
+	def gen_dists(self, collocates_lists, smooth=False):
+		"""
+		Calculates the probability distrubtions for the given lists of
+		collocates (as Probability.gen_dist does for one).
+
+		@param collocates_lists - List of lists of collocates (as returned by
+			CollocatesManager.get)
+		@param smooth - Whether or not to (Add-1) smooth the distrubtions (
+			Default is False)
+		@return Sparse matrix of distrubtions, one row per list of collocates
+		"""
+
+		num_dists = len(collocates_lists)
+		lens = np.array([len(c) for c in collocates_lists], dtype=np.int64)
+
+		if smooth and (lens == 0).any():
+			raise ZeroDivisionError("Cannot smooth an empty distrubtion.")
+
+		# Lemmas are first given story-local Id's, so that the vocabulary size
+		# used in smoothing counts every character alias lemma separately.
+		local_vocab = Vocabulary()
+		local_ids = local_vocab.encode([coll['token']['lemma']
+			for collocates in collocates_lists for coll in collocates], add=True)
+		num_local = max(len(local_vocab), 1)
+
+		rows = np.repeat(np.arange(num_dists), lens)
+		keys, inv = np.unique(rows * num_local + local_ids, return_inverse=True)
+		cnts = np.bincount(inv, minlength=len(keys)).astype(np.float64)
+		rows, local_ids = keys // num_local, keys % num_local
+
+		# Character alias lemmas are squashed into the single CHAR column.
+		self.vocab.add(['CHAR'])
+		char_id = self.vocab.get_id('CHAR')
+		lookup = self.vocab.encode([
+			'CHAR' if lemma.startswith('CHAR-') else lemma
+			for lemma in local_vocab.terms], add=True)
+		cols = lookup[local_ids]
+
+		lens = lens.astype(np.float64)
+		shape = (num_dists, len(self.vocab))
+
+		if smooth:
+			v_sizes = np.bincount(rows, minlength=num_dists)
+
+			# CHAR is always part of a smoothed distrubtion.
+			rows = np.concatenate([rows, np.arange(num_dists)])
+			cols = np.concatenate([cols, np.repeat(char_id, num_dists)])
+			cnts = np.concatenate([cnts, np.zeros(num_dists)])
+
+			# Sums the character alias counts before smoothing.
+			dists = csr_matrix((cnts, (rows, cols)), shape=shape)
+			dist_rows = np.repeat(np.arange(num_dists), np.diff(dists.indptr))
+			dists.data = (dists.data + 1) / (lens + v_sizes)[dist_rows]
+		else:
+			# Sums the character alias probabilities.
+			dists = csr_matrix((cnts / lens[rows], (rows, cols)), shape=shape)
+
+		return dists
+
+	def from_dicts(self, dists):
+		"""
+		Converts the given dictionary distrubtions (e.g. as returned by
+		Probability.gen_dist) to a sparse matrix of distrubtions.
+
+		@param dists - List of dictionaries from word to probability
+		@return Sparse matrix of distrubtions, one row per dictionary
+		"""
+
+		indptr = np.zeros(len(dists) + 1, dtype=np.int64)
+		indptr[1:] = np.cumsum([len(d) for d in dists])
+
+		indices = self.vocab.encode([w for d in dists for w in d], add=True)
+		data = np.array([p for d in dists for p in d.itervalues()],
+			dtype=np.float64)
+
+		mat = csr_matrix((data, indices, indptr),
+			shape=(len(dists), len(self.vocab)))
+		mat.sort_indices()
+
+		return mat
+
+	def to_dict(self, dists, i):
+		"""
+		Converts the given row of a sparse matrix of distrubtions back to a
+		dictionary distrubtion.
+		"""
+
+		start, end = dists.indptr[i], dists.indptr[i + 1]
+		return dict(zip(self.vocab.decode(dists.indices[start:end]),
+			dists.data[start:end].tolist()))
+
+	@staticmethod
+	def _gather(dists, rows, num_cols):
+		"""
+		Gathers the stored entries of the given rows of a sparse matrix of
+		distrubtions.
+
+		@return Linear keys (<position in rows> * num_cols + <column>) and
+			values of the entries, in order of key
+		"""
+
+		starts = dists.indptr[rows]
+		lens = dists.indptr[rows + 1] - starts
+
+		offsets = np.repeat(starts - (np.cumsum(lens) - lens), lens)
+		inds = offsets + np.arange(lens.sum())
+
+		positions = np.repeat(np.arange(len(rows)), lens)
+		return positions * num_cols + dists.indices[inds], dists.data[inds]
+
+	def _align(self, P, Q, pairs):
+		"""
+		Aligns the distrubtions of each given pair over the union of their
+		supports (i.e. of the keys of the two dictionaries).
+
+		@return # of pairs, and the pair (index into pairs), column, first and
+			second distrubtion values (0 if absent), and whether the value is
+			present in the first distrubtion, for each entry of the union
+		"""
+
+		if pairs is None:
+			if P.shape[0] != Q.shape[0]:
+				raise ValueError("Distrubtions must be paired when there are "
+					"different numbers of them.")
+
+			rows_p = rows_q = np.arange(P.shape[0])
+		else:
+			pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+			rows_p, rows_q = pairs[:, 0], pairs[:, 1]
+
+		P, Q = P.tocsr(), Q.tocsr()
+		P.sum_duplicates()
+		Q.sum_duplicates()
+
+		# The vocabulary may have grown between building P and Q.
+		num_cols = max(P.shape[1], Q.shape[1])
+
+		keys_p, vals_p = self._gather(P, rows_p, num_cols)
+		keys_q, vals_q = self._gather(Q, rows_q, num_cols)
+
+		keys = np.union1d(keys_p, keys_q)
+
+		p, q = np.zeros(len(keys)), np.zeros(len(keys))
+		in_p = np.zeros(len(keys), dtype=bool)
+
+		inds = np.searchsorted(keys, keys_p)
+		p[inds], in_p[inds] = vals_p, True
+		q[np.searchsorted(keys, keys_q)] = vals_q
+
+		return len(rows_p), keys // num_cols, keys % num_cols, p, q, in_p
+
+	@staticmethod
+	def _reduce(pos, vals, num_pairs):
+		return np.bincount(pos, weights=vals, minlength=num_pairs)
+
+	def _kl(self, aligned):
+		num_pairs, pos, cols, p, q, in_p = aligned
+
+		# UNK probabilities of each pair.
+		unk_p, unk_q = np.zeros(num_pairs), np.zeros(num_pairs)
+		has_unk_p = np.zeros(num_pairs, dtype=bool)
+
+		is_unk = cols == self.vocab.get_id('UNK')
+		unk_p[pos[is_unk]], unk_q[pos[is_unk]] = p[is_unk], q[is_unk]
+		has_unk_p[pos[is_unk]] = in_p[is_unk]
+
+		up, uq = unk_p[pos], unk_q[pos]
+
+		# Cases, in order of precedence (A zero UNK probability in the first
+		# distrubtion contributes nothing).
+		both = (p > 0) & (q > 0)
+		p_vs_unk = ~both & (p > 0) & (uq > 0)
+		unk_vs_q = ~both & ~p_vs_unk & (q > 0) & has_unk_p[pos] & (up > 0)
+		unk_vs_unk = ~both & ~p_vs_unk & ~unk_vs_q & (uq > 0) & \
+			has_unk_p[pos] & (up > 0)
+
+		num = np.where(both | p_vs_unk, p, up)
+		den = np.where(both | unk_vs_q, q, uq)
+		mask = both | p_vs_unk | unk_vs_q | unk_vs_unk
+
+		terms = np.zeros(len(pos))
+		terms[mask] = num[mask] * (np.log(num[mask] / den[mask]) / math.log(2))
+
+		return self._reduce(pos, terms, num_pairs)
+
+	def _tv(self, aligned):
+		num_pairs, pos, _, p, q, _ = aligned
+		return 0.5 * self._reduce(pos, np.abs(p - q), num_pairs)
+
+	def _js(self, aligned):
+		num_pairs, pos, _, p, q, _ = aligned
+		m = (p + q) / 2
+
+		terms = np.zeros(len(pos))
+		for x in (p, q):
+			nz = x > 0
+			terms[nz] += x[nz] * (np.log(x[nz] / m[nz]) / math.log(2))
+
+		return 0.5 * self._reduce(pos, terms, num_pairs)
+
+	def _hellinger(self, aligned):
+		num_pairs, pos, _, p, q, _ = aligned
+		return np.sqrt(0.5 * self._reduce(pos, (np.sqrt(p) - np.sqrt(q)) ** 2,
+			num_pairs))
+
+	def kl(self, P, Q, pairs=None):
+		"""
+		Calculates the KL-divergence (base 2) for each pair of distrubtions,
+		falling back on UNK probabilities as Probability.kl_divergence does.
+
+		@param P - First sparse matrix of distrubtions
+		@param Q - Second sparse matrix of distrubtions
+		@param pairs - List of (<row of P>, <row of Q>) pairs (Default is None,
+			for corresponding rows)
+		@return Array of KL-divergences, one per pair
+		"""
+
+		return self._kl(self._align(P, Q, pairs))
+
+	def tv(self, P, Q, pairs=None):
+		"""
+		Calculates the total variation distance for each pair of distrubtions
+		(See kl for parameters).
+		"""
+
+		return self._tv(self._align(P, Q, pairs))
+
+	def js(self, P, Q, pairs=None):
+		"""
+		Calculates the Jensen-Shannon divergence (base 2) for each pair of
+		distrubtions (See kl for parameters).
+		"""
+
+		return self._js(self._align(P, Q, pairs))
+
+	def hellinger(self, P, Q, pairs=None):
+		"""
+		Calculates the Hellinger distance for each pair of distrubtions (See kl
+		for parameters).
+		"""
+
+		return self._hellinger(self._align(P, Q, pairs))
+
+	def calc(self, P, Q, pairs=None, measures=MEASURES):
+		"""
+		Calculates several measures for each pair of distrubtions, aligning the
+		pairs only once (See kl for parameters).
+
+		@param measures - Iterable of measure names (Any of MEASURES)
+		@return Map from measure name to array of values, one per pair
+		"""
+
+		aligned = self._align(P, Q, pairs)
+
+		return {m: getattr(self, '_' + m)(aligned) for m in measures}
+
 
 class DistinctivenessCalculator(object):
 	"""
@@ -159,6 +584,16 @@ class DistinctivenessCalculator(object):
 
 		raise NotImplementedError
 
+	def calc_all(self, sids):
+		"""
+		Calculates the distinctiveness for each of the given stories.
+
+		@param sids - List of story Id's
+		@return List of distinctiveness values, in the order of sids
+		"""
+
+		return [self.calc(sid) for sid in sids]
+
 
 class KurtosisDistinctivenessCalculator(DistinctivenessCalculator):
 	"""
@@ -166,6 +601,7 @@ class KurtosisDistinctivenessCalculator(DistinctivenessCalculator):
 	distrubtion.
 	"""
 
+	@cached('distinctiveness.kurtosis/1', get_char_inputs, get_params)
 	def calc(self, sid):
 		"""
 		Calculates the distinctiveness for the given story as the kurtosis of
@@ -178,8 +614,7 @@ class KurtosisDistinctivenessCalculator(DistinctivenessCalculator):
 		collocates = collocates_manager.get(sid, tpe='character',
 			role=self.role, ranks=self.ranks)
 
-		dist = Probability.gen_dist(collocates, smooth=False)
-		return Probability.kurtosis(dist)
+		return Probability.hist_kurtosis(Probability.count_hist(collocates))
 
 
 class SkewDistinctivenessCalculator(DistinctivenessCalculator):
@@ -188,6 +623,7 @@ class SkewDistinctivenessCalculator(DistinctivenessCalculator):
 	distrubtion.
 	"""
 
+	@cached('distinctiveness.skew/1', get_char_inputs, get_params)
 	def calc(self, sid=None, collocates=None):
 		"""
 		Calculates the distinctiveness for the given story or list of collocates
@@ -202,8 +638,82 @@ class SkewDistinctivenessCalculator(DistinctivenessCalculator):
 			collocates = collocates_manager.get(sid, tpe='character',
 				role=self.role, ranks=self.ranks)
 
-		dist = Probability.gen_dist(collocates, smooth=False)
-		return Probability.skew(dist)
+		return Probability.hist_skew(Probability.count_hist(collocates))
+
+
+class MomentsDistinctivenessCalculator(object):
+	"""
+	Calculates both the skew- and kurtosis-based distinctiveness of a story for
+	every combination of a number of rank groups and roles, in one pass over
+	its collocates.
+	"""
+
+	def __init__(self, rank_groups=RANK_GROUPS, roles=[None] + ROLES):
+		"""
+		@param rank_groups - List of (<name>, <ranks>) rank groups (Default is
+			RANK_GROUPS)
+		@param roles - List of roles (None means all) (Default is every role and
+			None)
+		"""
+
+		self.rank_groups, self.roles = rank_groups, roles
+
+	def calc_hists(self, collocates):
+		"""
+		Calculates the frequency-of-frequency histogram (as returned by
+		Probability.count_hist) of the given collocates for each combination of
+		rank group and role.
+
+		@param collocates - List of collocates of all ranks and roles (as
+			returned by CollocatesManager.get)
+		@return Map from (<rank group name>, <role>) to histogram
+		"""
+
+		# Character alias collocates are all counted as lemma -1.
+		vocab = Vocabulary()
+		lemma_ids = vocab.encode([coll['token']['lemma'] for coll in collocates],
+			add=True)
+		is_char = np.array([t.startswith('CHAR-') for t in vocab.terms],
+			dtype=bool)
+		lemma_ids[is_char[lemma_ids]] = -1
+
+		ranks = np.array([coll['alias']['entity']['rank']
+			for coll in collocates], dtype=np.int64)
+		roles = np.array([map_role(coll['type']) for coll in collocates],
+			dtype=object)
+
+		hists = {}
+		for rg_name, rg_ranks in self.rank_groups:
+			in_rg = np.in1d(ranks, rg_ranks) if rg_ranks else \
+				np.ones(len(collocates), dtype=bool)
+
+			for role in self.roles:
+				mask = in_rg & (roles == role) if role else in_rg
+
+				cnts = np.bincount(lemma_ids[mask] + 1, minlength=len(vocab) + 1)
+				cnts = cnts[cnts > 0]
+
+				hists[(rg_name, role)] = np.unique(cnts, return_counts=True)
+
+		return hists
+
+	@cached('distinctiveness.moments/1', get_char_inputs, get_moments_params)
+	def calc(self, sid=None, collocates=None):
+		"""
+		Calculates the skew- and kurtosis-based distinctiveness for the given
+		story or list of collocates, for each combination of rank group and
+		role.
+
+		@param sid - Story id of story (Default is None)
+		@param collocates - Collocates of all ranks and roles (Default is None)
+		@return Map from (<rank group name>, <role>) to (<skew>, <kurtosis>)
+		"""
+
+		if collocates is None:
+			collocates = collocates_manager.get(sid, tpe='character')
+
+		return {k: (Probability.hist_skew(hist), Probability.hist_kurtosis(hist))
+			for k, hist in self.calc_hists(collocates).iteritems()}
 
 
 class KLDistinctivenessCalculator(DistinctivenessCalculator):
@@ -212,18 +722,24 @@ class KLDistinctivenessCalculator(DistinctivenessCalculator):
 	distribution.
 	"""
 
-	def calc(self, sid):
+	@cached('distinctiveness.kl/1', get_char_noun_inputs, get_params)
+	def calc(self, sid=None, char_collocates=None, noun_collocates=None):
 		"""
-		Calculates the distinctiveness for the given story as the KL-divergence
-		against the noun distrubtion.
+		Calculates the distinctiveness for the given story (or lists of
+		character and noun collocates) as the KL-divergence against the noun
+		distrubtion.
 
-		@param sid - Story id of story
+		@param sid - Story id of story (Default is None)
+		@param char_collocates - Character collocates (Default is None)
+		@param noun_collocates - Noun collocates (Default is None)
 		@return KL-divergence
 		"""
 
-		char_collocates = collocates_manager.get(sid, tpe='character',
-			role=self.role, ranks=self.ranks)
-		noun_collocates = collocates_manager.get(sid, tpe='noun')
+		if char_collocates is None:
+			char_collocates = collocates_manager.get(sid, tpe='character',
+				role=self.role, ranks=self.ranks)
+		if noun_collocates is None:
+			noun_collocates = collocates_manager.get(sid, tpe='noun')
 
 		# TODO: Figure out which order ir better here.
 		d1 = Probability.gen_dist(noun_collocates, smooth=False)
@@ -231,6 +747,26 @@ class KLDistinctivenessCalculator(DistinctivenessCalculator):
 
 		return Probability.kl_divergence(d1, d2)
 
+	def calc_all(self, sids):
+		"""
+		Calculates the distinctiveness for each of the given stories as the
+		KL-divergence against the noun distrubtion, with all the
+		distrubtions compared at once as sparse vectors.
+
+		@param sids - List of story Id's
+		@return Array of KL-divergences, in the order of sids
+		"""
+
+		sparse_prob = SparseProbability()
+
+		d1s = sparse_prob.gen_dists([collocates_manager.get(sid, tpe='noun')
+			for sid in sids], smooth=False)
+		d2s = sparse_prob.gen_dists([collocates_manager.get(sid,
+			tpe='character', role=self.role, ranks=self.ranks) for sid in sids],
+			smooth=False)
+
+		return sparse_prob.kl(d1s, d2s)
+
 
 class TVDistinctivenessCalculator(DistinctivenessCalculator):
 	"""
@@ -238,20 +774,47 @@ class TVDistinctivenessCalculator(DistinctivenessCalculator):
 	noun distribution.
 	"""
 
-	def calc(self, sid):
+	@cached('distinctiveness.tv/1', get_char_noun_inputs, get_params)
+	def calc(self, sid=None, char_collocates=None, noun_collocates=None):
 		"""
-		Calculates the distinctiveness for the given story as the total
-		variation against the noun distrubtion.
+		Calculates the distinctiveness for the given story (or lists of
+		character and noun collocates) as the total variation against the noun
+		distrubtion.
 
-		@param sid - Story id of story
+		@param sid - Story id of story (Default is None)
+		@param char_collocates - Character collocates (Default is None)
+		@param noun_collocates - Noun collocates (Default is None)
 		@return Total variation
 		"""
 
-		char_collocates = collocates_manager.get(sid, tpe='character',
-			role=self.role, ranks=self.ranks)
-		noun_collocates = collocates_manager.get(sid, tpe='noun')
+		if char_collocates is None:
+			char_collocates = collocates_manager.get(sid, tpe='character',
+				role=self.role, ranks=self.ranks)
+		if noun_collocates is None:
+			noun_collocates = collocates_manager.get(sid, tpe='noun')
 
 		d1 = Probability.gen_dist(char_collocates, smooth=False)
 		d2 = Probability.gen_dist(noun_collocates, smooth=False)
 
 		return Probability.total_variation(d1, d2)
+
+	def calc_all(self, sids):
+		"""
+		Calculates the distinctiveness for each of the given stories as the
+		total variation against the noun distrubtion, with all the
+		distrubtions compared at once as sparse vectors.
+
+		@param sids - List of story Id's
+		@return Array of total variations, in the order of sids
+		"""
+
+		sparse_prob = SparseProbability()
+
+		d1s = sparse_prob.gen_dists([collocates_manager.get(sid,
+			tpe='character', role=self.role, ranks=self.ranks) for sid in sids],
+			smooth=False)
+		d2s = sparse_prob.gen_dists([collocates_manager.get(sid, tpe='noun')
+			for sid in sids], smooth=False)
+
+		return sparse_prob.tv(d1s, d2s)
+
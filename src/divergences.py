@@ -0,0 +1,310 @@
+"""
+Calculates divergences between the distributions of many pairs of stories (up
+to every pair in a category), in blocks of pairs spread over a pool of worker
+processes, and between the distributions of the top words of two stories at
+many vocabulary cutoffs at once.
+"""
+
+import math
+import numpy as np
+
+from itertools import imap, izip
+from multiprocessing import Pool
+
+from checkpoint import CheckpointedWriter, digest
+from distinctiveness import SparseProbability
+
+
+# Distributions and settings of a worker process (Set by init_worker, and
+# inherited rather than pickled, since workers are forked).
+worker_state = {}
+
+
+def init_worker(P, Q, measures, sparse_prob):
+	worker_state.update(P=P, Q=Q, measures=measures, sparse_prob=sparse_prob)
+
+
+def calc_block(pairs):
+	"""
+	Calculates the measures (in the worker state) for the given block of pairs.
+
+	@param pairs - Array of (<row of P>, <row of Q>) pairs
+	@return The pairs, and an array of values with one row per pair and one
+		column per measure
+	"""
+
+	P, Q = worker_state['P'], worker_state['Q']
+	measures = worker_state['measures']
+
+	vals = worker_state['sparse_prob'].calc(P, Q, pairs, measures)
+	return pairs, np.column_stack([vals[m] for m in measures])
+
+
+def iter_pair_blocks(num_p, num_q, block_size, pairs=None, skip_same=False):
+	"""
+	Splits the pairs of rows to compare into blocks.
+
+	@param num_p - # rows (distributions) of the first matrix
+	@param num_q - # rows (distributions) of the second matrix
+	@param block_size - # rows of each matrix per block (Blocks hold up to
+		block_size ** 2 pairs)
+	@param pairs - List of (<row of P>, <row of Q>) pairs (Default is None, for
+		every pair)
+	@param skip_same - Whether or not to leave out pairs of a row with itself
+		(Default is False)
+	@return Generator of arrays of pairs
+	"""
+
+	if pairs is not None:
+		pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+
+		step = block_size ** 2
+		for start in xrange(0, len(pairs), step):
+			yield pairs[start:start + step]
+
+		return
+
+	for i in xrange(0, num_p, block_size):
+		rows_p = np.arange(i, min(i + block_size, num_p))
+
+		for j in xrange(0, num_q, block_size):
+			rows_q = np.arange(j, min(j + block_size, num_q))
+
+			block = np.column_stack([np.repeat(rows_p, len(rows_q)),
+				np.tile(rows_q, len(rows_p))])
+			if skip_same:
+				block = block[block[:, 0] != block[:, 1]]
+
+			if len(block) > 0:
+				yield block
+
+
+class PairwiseDivergenceCalculator(object):
+	"""
+	Calculates divergences between pairs of distributions (rows of sparse
+	matrices, as returned by SparseProbability.gen_dists or
+	SparseProbability.from_dicts). Every distribution is loaded once, and the
+	pairs are compared in blocks small enough for their aligned supports to
+	stay in cache.
+	"""
+
+	def __init__(self, measures=('kl', 'tv', 'js'), block_size=64, n=1):
+		"""
+		@param measures - Iterable of measure names (Any of
+			distinctiveness.MEASURES)
+		@param block_size - # distributions on each side of a block (Default
+			is 64)
+		@param n - # worker processes (Default is 1, for none)
+		"""
+
+		self.measures = list(measures)
+		self.block_size = block_size
+		self.n = n
+
+	def calc(self, P, Q=None, pairs=None, sparse_prob=None):
+		"""
+		Calculates the measures for the given pairs of distributions.
+
+		@param P - First sparse matrix of distributions
+		@param Q - Second sparse matrix of distributions (Default is None, for
+			comparing the distributions of P with each other)
+		@param pairs - List of (<row of P>, <row of Q>) pairs (Default is None,
+			for every pair, except a distribution with itself if Q is None)
+		@param sparse_prob - SparseProbability that built P and Q (Needed for
+			KL-divergence UNK handling; Default is a new one)
+		@return Generator of (<row of P>, <row of Q>, <array of values, in the
+			order of measures>) triples, in the order of pairs
+		"""
+
+		for _, block, vals in self.calc_blocks(P, Q, pairs, sparse_prob):
+			for (i, j), v in zip(block, vals):
+				yield i, j, v
+
+	def calc_blocks(self, P, Q=None, pairs=None, sparse_prob=None, skip=None):
+		"""
+		Calculates the measures for the given pairs of distributions, block by
+		block (See calc for parameters).
+
+		@param skip - Function taking the index of a block and returning
+			whether or not to leave it out (Default is None, for none)
+		@return Generator of (<block index>, <array of pairs>, <array of
+			values, with one row per pair and one column per measure>)
+			triples, in the order of pairs
+		"""
+
+		blocks = [(k, block) for k, block in enumerate(iter_pair_blocks(
+			P.shape[0], P.shape[0] if Q is None else Q.shape[0],
+			self.block_size, pairs=pairs, skip_same=Q is None))
+			if skip is None or not skip(k)]
+
+		initargs = (P.tocsr(), P.tocsr() if Q is None else Q.tocsr(),
+			self.measures, SparseProbability() if sparse_prob is None else
+			sparse_prob)
+
+		if self.n > 1:
+			pool = Pool(self.n, init_worker, initargs)
+			results = pool.imap(calc_block, [block for _, block in blocks])
+		else:
+			pool = None
+			init_worker(*initargs)
+			results = imap(calc_block, [block for _, block in blocks])
+
+		try:
+			for (k, _), (block, vals) in izip(blocks, results):
+				yield k, block, vals
+		finally:
+			if pool is not None:
+				pool.terminate()
+				pool.join()
+
+	def calc_matrices(self, P, Q=None, sparse_prob=None):
+		"""
+		Calculates the full matrices of the measures between the given
+		distributions (See calc for parameters).
+
+		@return Map from measure name to (dense) matrix, with rows for P and
+			columns for Q (NaN on the diagonal if Q is None)
+		"""
+
+		num_q = P.shape[0] if Q is None else Q.shape[0]
+
+		mats = {m: np.empty((P.shape[0], num_q)) for m in self.measures}
+		for mat in mats.itervalues():
+			mat.fill(np.nan)
+
+		for i, j, vals in self.calc(P, Q, sparse_prob=sparse_prob):
+			for m, val in zip(self.measures, vals):
+				mats[m][i, j] = val
+
+		return mats
+
+	def write(self, out_path, sids_p, P, sids_q=None, Q=None, pairs=None,
+		sparse_prob=None, resume=True):
+		"""
+		Calculates the measures for the given pairs of distributions (See calc),
+		writing them to a .tsv file in long format (one row per pair). The file
+		is checkpointed per block (See checkpoint.py), so that an interrupted
+		run resumes from its last completed block.
+
+		@param out_path - Output path to .tsv file
+		@param sids_p - Story Id's of the rows of P
+		@param sids_q - Story Id's of the rows of Q (Default is None, for when
+			Q is None)
+		@param resume - Whether or not to resume an interrupted run, if any
+			(Default is True)
+		@return # pairs written
+		"""
+
+		sids_q = sids_p if sids_q is None else sids_q
+
+		num_pairs = 0
+		with CheckpointedWriter(out_path, ['STORY A', 'STORY B'] +
+			[m.upper() for m in self.measures], signature=[self.block_size,
+			digest([list(sids_p), list(sids_q), None if pairs is None else
+			np.asarray(pairs, dtype=np.int64).tolist()])],
+			resume=resume) as writer:
+			for k, block, vals in self.calc_blocks(P, Q, pairs, sparse_prob,
+				skip=writer.done):
+				writer.write(k, [[sids_p[i], sids_q[j]] + v.tolist()
+					for (i, j), v in zip(block, vals)])
+				num_pairs += len(block)
+
+		return num_pairs
+
+
+class RankedCounts(object):
+	"""
+	The words of a counter in order of frequency (as returned by
+	Counter.most_common), encoded with a shared vocabulary, along with the
+	cumulative counts of the words kept by each filtered variant.
+	"""
+
+	def __init__(self, cntr, vocab, excludes=()):
+		"""
+		@param cntr - Word counter
+		@param vocab - Vocabulary (store.Vocabulary) shared by all the counters
+			to compare
+		@param excludes - Sets of words to leave out, one per filtered variant
+			(The unfiltered variant always comes first)
+		"""
+
+		items = cntr.most_common()
+
+		self.ids = vocab.encode([w for w, _ in items], add=True)
+		self.cnts = np.array([c for _, c in items], dtype=np.float64)
+
+		# Masks of the words kept by each variant.
+		self.masks = [np.ones(len(items), dtype=bool)] + \
+			[np.array([w not in exclude for w, _ in items], dtype=bool)
+				for exclude in excludes]
+		self.cum_cnts = [np.concatenate([[0.0], np.cumsum(self.cnts * mask)])
+			for mask in self.masks]
+
+	def totals(self, cutoffs, variant=0):
+		"""
+		Returns the total count of the words kept by the given variant among
+		the top words at each of the given cutoffs.
+		"""
+
+		return self.cum_cnts[variant][np.minimum(cutoffs, len(self.cnts))]
+
+
+def kl_at_cutoffs(r1, r2, cutoffs):
+	"""
+	Calculates the KL-divergence (base 2) between the distributions of the top
+	words of two counters at each of the given cutoffs, for each variant (as
+	Probability.kl_divergence between the normalized counts of the top k words
+	of each counter that the variant keeps). The vocabulary is sorted once and
+	a word enters both distributions at the larger of its two ranks, so that
+	every cutoff and variant is read off prefix sums over the shared words.
+
+	@param r1 - Ranked counts (RankedCounts) of the first counter
+	@param r2 - Ranked counts of the second counter (Same vocabulary and
+		excludes as r1)
+	@param cutoffs - List of cutoffs (# top words)
+	@return Array of KL-divergences, with one row per variant and one column
+		per cutoff
+	"""
+
+	cutoffs = np.asarray(cutoffs, dtype=np.int64)
+
+	# Indices of the words of both counters, aligned in order of word Id.
+	order1 = np.argsort(r1.ids, kind='mergesort')
+	order2 = np.argsort(r2.ids, kind='mergesort')
+	ids1, ids2 = r1.ids[order1], r2.ids[order2]
+
+	pos = np.minimum(np.searchsorted(ids2, ids1), max(len(ids2) - 1, 0))
+	found = ids2[pos] == ids1 if len(ids2) else np.zeros(len(ids1), bool)
+	inds1, inds2 = order1[found], order2[pos[found]]
+
+	# Only words with positive counts in both contribute.
+	shared = (r1.cnts[inds1] > 0) & (r2.cnts[inds2] > 0)
+	inds1, inds2 = inds1[shared], inds2[shared]
+
+	entries = np.maximum(inds1, inds2)
+	order = np.argsort(entries, kind='mergesort')
+	entries, inds1, inds2 = entries[order], inds1[order], inds2[order]
+
+	cnts1, cnts2 = r1.cnts[inds1], r2.cnts[inds2]
+	terms = cnts1 * (np.log(cnts1 / cnts2) / math.log(2))
+
+	# Number of shared words at each cutoff.
+	nums = np.searchsorted(entries, cutoffs)
+
+	kls = np.zeros((len(r1.masks), len(cutoffs)))
+	for v, mask in enumerate(r1.masks):
+		kept = mask[inds1]
+
+		sum_terms = np.concatenate([[0.0], np.cumsum(terms * kept)])[nums]
+		sum_cnts = np.concatenate([[0.0], np.cumsum(cnts1 * kept)])[nums]
+
+		totals1, totals2 = r1.totals(cutoffs, v), r2.totals(cutoffs, v)
+
+		# Sum over the shared words of p * log(p / q), with p = c1 / total1
+		# and q = c2 / total2.
+		valid = sum_cnts > 0
+		kls[v, valid] = (sum_terms[valid] + sum_cnts[valid] *
+			(np.log(totals2[valid] / totals1[valid]) / math.log(2))) / \
+			totals1[valid]
+
+	return kls
@@ -0,0 +1,314 @@
+"""
+Word embeddings stored as an uncompressed .npy matrix with a sorted .vocab file
+(one word per line, in the order of the matrix rows). Both are memory-mapped on
+first use, so that loading is near-instant and forked worker processes share
+the pages read-only. Compact tables holding just the corpus collocate lemmas,
+with rows aligned to the corpus-level term vocabulary, are extracted from them.
+"""
+
+import gzip
+import numpy as np
+import os
+
+from corpus import DATA_DIRPATH, STORE_DIRPATH
+from store import TERMS_VOCAB_FPATH, Vocabulary
+
+
+# Path prefix of the converted GoogleNews Word2Vec embeddings (See
+# scripts/convert_word2vec.py).
+WORD2VEC_PREFIX = os.path.join(DATA_DIRPATH, 'GoogleNews-vectors-negative300')
+
+# Path prefix of the compact embedding table of the corpus collocate lemmas
+# (See scripts/extract_collocate_vectors.py).
+COLLOCATE_VECTORS_PREFIX = os.path.join(STORE_DIRPATH, 'collocate_vectors')
+
+# Data types compact embedding tables can be stored as.
+DTYPES = {'float16': np.float16, 'float32': np.float32}
+
+
+def to_bytes(word):
+	return word.encode('utf-8') if isinstance(word, unicode) else word
+
+
+def to_unicode(word):
+	return word.decode('utf-8') if isinstance(word, str) else word
+
+
+class Embeddings(object):
+	"""
+	Memory-mapped word embeddings, loaded lazily from <prefix>.npy and
+	<prefix>.vocab.
+	"""
+
+	def __init__(self, prefix=WORD2VEC_PREFIX):
+		"""
+		@param prefix - Path prefix of the .npy and .vocab files (Default is
+			WORD2VEC_PREFIX)
+		"""
+
+		self.prefix = prefix
+
+		self.vectors = None
+		# Vocabulary file bytes, and the offset of each line (plus the end).
+		self.vocab_bytes, self.offsets = None, None
+
+	def load(self):
+		"""
+		Memory-maps the embeddings (if they aren't already). Calling this before
+		forking worker processes lets them share the vocabulary index too.
+		"""
+
+		if self.vectors is not None:
+			return
+
+		self.vectors = np.load(self.prefix + '.npy', mmap_mode='r')
+
+		self.vocab_bytes = np.memmap(self.prefix + '.vocab', dtype=np.uint8,
+			mode='r')
+		self.offsets = np.concatenate([[0],
+			np.flatnonzero(self.vocab_bytes == ord('\n')) + 1])
+
+		if len(self.offsets) - 1 != self.vectors.shape[0]:
+			raise ValueError("%s.vocab doesn't match %s.npy." % (self.prefix,
+				self.prefix))
+
+	def get_fpaths(self):
+		"""
+		Returns the paths to the files of the embeddings.
+		"""
+
+		return [self.prefix + '.npy', self.prefix + '.vocab']
+
+	def __len__(self):
+		self.load()
+		return self.vectors.shape[0]
+
+	def get_word(self, i):
+		"""
+		Returns the (utf-8 encoded) word of the given row.
+		"""
+
+		self.load()
+		return self.vocab_bytes[self.offsets[i]:self.offsets[i + 1] - 1] \
+			.tostring()
+
+	def get_index(self, word):
+		"""
+		Returns the row of the given word (-1 if it has no vector), by binary
+		search over the sorted vocabulary.
+		"""
+
+		self.load()
+
+		word = to_bytes(word)
+
+		lo, hi = 0, len(self.offsets) - 1
+		while lo < hi:
+			mid = (lo + hi) // 2
+			if self.get_word(mid) < word:
+				lo = mid + 1
+			else:
+				hi = mid
+
+		if lo < len(self.offsets) - 1 and self.get_word(lo) == word:
+			return lo
+
+		return -1
+
+	def __contains__(self, word):
+		return self.get_index(word) >= 0
+
+	def __getitem__(self, word):
+		"""
+		Returns the vector of the given word (Raises KeyError if it has none).
+		"""
+
+		i = self.get_index(word)
+		if i < 0:
+			raise KeyError("word '%s' not in vocabulary" % to_bytes(word))
+
+		return self.vectors[i]
+
+	def similarity(self, w1, w2):
+		"""
+		Returns the cosine similarity between the vectors of the given words
+		(Raises KeyError if either has none).
+		"""
+
+		v1 = np.asarray(self[w1], dtype=np.float64)
+		v2 = np.asarray(self[w2], dtype=np.float64)
+		return np.dot(v1 / np.sqrt(np.dot(v1, v1)), v2 / np.sqrt(np.dot(v2, v2)))
+
+
+class CompactEmbeddings(Embeddings):
+	"""
+	Embeddings of a restricted vocabulary, loaded lazily from <prefix>.npy,
+	whose rows are aligned to the term Id's of a (corpus-level) vocabulary,
+	and <prefix>.present.npy, marking the terms that have a vector.
+	"""
+
+	def __init__(self, prefix=COLLOCATE_VECTORS_PREFIX,
+		vocab_fpath=TERMS_VOCAB_FPATH):
+		"""
+		@param prefix - Path prefix of the .npy files (Default is
+			COLLOCATE_VECTORS_PREFIX)
+		@param vocab_fpath - Path to the vocabulary the rows are aligned to
+			(Default is TERMS_VOCAB_FPATH)
+		"""
+
+		super(CompactEmbeddings, self).__init__(prefix)
+
+		self.vocab_fpath = vocab_fpath
+		self.vocab, self.present = None, None
+
+	def load(self, vocab=None):
+		"""
+		Memory-maps the embeddings (if they aren't already).
+
+		@param vocab - Vocabulary the rows are aligned to, to share (See
+			resources.py) (Default is None, for loading it)
+		"""
+
+		if self.vectors is not None:
+			return
+
+		self.vectors = np.load(self.prefix + '.npy', mmap_mode='r')
+		self.present = np.load(self.prefix + '.present.npy')
+		self.vocab = Vocabulary(self.vocab_fpath) if vocab is None else vocab
+
+	def get_fpaths(self):
+		# The vocabulary only grows, without changing the rows of the terms
+		# extracted.
+		return [self.prefix + '.npy', self.prefix + '.present.npy']
+
+	def get_word(self, i):
+		self.load()
+		return to_bytes(self.vocab.get_term(i))
+
+	def get_index(self, word):
+		"""
+		Returns the row (i.e. term Id) of the given word (-1 if it has no
+		vector, including terms added to the vocabulary after the table was
+		extracted).
+		"""
+
+		self.load()
+
+		i = self.vocab.get_id(to_unicode(word))
+		if i < 0 or i >= len(self.present) or not self.present[i]:
+			return -1
+
+		return i
+
+
+def extract_compact_embeddings(words, source, prefix=COLLOCATE_VECTORS_PREFIX,
+	vocab=None, dtype=np.float32, normal=False):
+	"""
+	Writes a compact embedding table (as read by CompactEmbeddings) holding
+	the vectors of just the given words, adding them to the vocabulary.
+
+	@param words - Iterable of words
+	@param source - Embeddings to take the vectors from
+	@param prefix - Output path prefix (Default is COLLOCATE_VECTORS_PREFIX)
+	@param vocab - Vocabulary to align the rows to (Default is the
+		corpus-level term vocabulary)
+	@param dtype - Data type of the table (Default is np.float32)
+	@param normal - If True, vectors are normalized to unit length
+	@return # words with a vector
+	"""
+
+	vocab = Vocabulary(TERMS_VOCAB_FPATH) if vocab is None else vocab
+
+	words = sorted(set(to_unicode(w) for w in words))
+	ids = vocab.encode(words, add=True)
+
+	source.load()
+
+	vectors = np.zeros((len(vocab), source.vectors.shape[1]), dtype=dtype)
+	present = np.zeros(len(vocab), dtype=bool)
+	for word, i in zip(words, ids):
+		j = source.get_index(word)
+		if j < 0:
+			continue
+
+		v = np.asarray(source.vectors[j], dtype=np.float64)
+		if normal:
+			norm = np.sqrt(np.dot(v, v))
+			v = v / norm if norm > 0 else v
+
+		vectors[i] = v
+		present[i] = True
+
+	# Written under temporary names, so that readers never see a partial
+	# table.
+	for suffix, arr in (('.npy', vectors), ('.present.npy', present)):
+		with open(prefix + suffix + '.tmp', 'wb') as f:
+			np.save(f, arr)
+		os.rename(prefix + suffix + '.tmp', prefix + suffix)
+
+	return int(present.sum())
+
+
+def convert_word2vec(bin_fpath, prefix, chunk_size=100000):
+	"""
+	Converts an embeddings file in the (binary, optionally gzipped) Word2Vec
+	format to the .npy and .vocab files read by Embeddings. The input is
+	streamed, so the full model is never held in memory.
+
+	@param bin_fpath - Path to Word2Vec .bin (or .bin.gz) file
+	@param prefix - Output path prefix
+	@param chunk_size - # rows copied at a time when sorting (Default is
+		100000)
+	@return # words converted
+	"""
+
+	opener = gzip.open if bin_fpath.endswith('.gz') else open
+
+	tmp_fpath = prefix + '.unsorted.npy'
+
+	with opener(bin_fpath, 'rb') as f:
+		num_words, dim = [int(x) for x in f.readline().split()]
+
+		unsorted = np.lib.format.open_memmap(tmp_fpath, mode='w+',
+			dtype=np.float32, shape=(num_words, dim))
+
+		words = []
+		for i in xrange(num_words):
+			chars = []
+			while True:
+				c = f.read(1)
+				if c == ' ' or c == '':
+					break
+				# Skip the newline ending the previous vector.
+				if c != '\n':
+					chars.append(c)
+
+			words.append(''.join(chars))
+			unsorted[i] = np.fromstring(f.read(4 * dim), dtype='<f4')
+
+	# Rows in order of (utf-8 encoded) word, keeping the first of any
+	# duplicates.
+	order, seen = [], set()
+	for i in sorted(xrange(num_words), key=words.__getitem__):
+		if words[i] not in seen:
+			seen.add(words[i])
+			order.append(i)
+	order = np.array(order, dtype=np.int64)
+
+	vectors = np.lib.format.open_memmap(prefix + '.npy.tmp', mode='w+',
+		dtype=np.float32, shape=(len(order), dim))
+	for start in xrange(0, len(order), chunk_size):
+		vectors[start:start + chunk_size] = \
+			unsorted[order[start:start + chunk_size]]
+	vectors.flush()
+	del vectors, unsorted
+
+	with open(prefix + '.vocab.tmp', 'wb') as out:
+		for i in order:
+			out.write(words[i] + '\n')
+
+	os.rename(prefix + '.npy.tmp', prefix + '.npy')
+	os.rename(prefix + '.vocab.tmp', prefix + '.vocab')
+	os.remove(tmp_fpath)
+
+	return len(order)
@@ -0,0 +1,406 @@
+"""
+Registry of the collocate-based story features (concreteness, sociability,
+dialogicality, abstraction, dictionary proportions, lexicon proportions, role
+and dependency type distributions), each calculated for every character rank
+group and role from a single read of a story's collocates, and the runner
+that outputs them for the corpus (for calc_features.py and the scripts of the
+individual features).
+"""
+
+import logging
+import numpy as np
+import os
+
+from collections import OrderedDict
+
+from calcmap import cached_worker, StoryMapReducer
+from collocates import CollocatesManager
+from corpus import CorpusManager
+from dependency import TYPES
+from lexicons import LEXICONS as REGISTERED_LEXICONS, lexicon_engine
+from prefetch import READ_ERRORS
+from ranks import RANK_GROUPS
+from resources import resources
+from resultcache import cached
+from role import ROLES
+
+
+# Set of top 20 character tokens as represented in collocates.
+CHAR_TOKENS = set(['CHAR-%d' % i for i in range(21)])
+
+# Dependency types of adjective collocates.
+ADJ_TYPES = set(['acomp', 'amod', 'nsubj-adj'])
+
+
+class Feature(object):
+	"""
+	Interface for a story feature. A feature marks each collocate with one
+	indicator per output column, and its values for a set of collocates are
+	either the proportions of the collocates marked (the default) or the
+	counts.
+	"""
+
+	# Output columns.
+	COLUMNS = []
+
+	# Whether values are counts rather than proportions.
+	COUNTS = False
+
+	# Whether the feature is calculated for each role (otherwise only for all
+	# roles, with output files named by rank group alone).
+	BY_ROLE = True
+
+	def load(self):
+		"""
+		Loads any resources (e.g. word lists) the feature needs.
+		"""
+
+		pass
+
+	def indicators(self, arrays):
+		"""
+		Marks the given collocates.
+
+		@param arrays - Collocates of a story (as returned by
+			CollocatesManager.get_arrays)
+		@return Boolean array with one row per collocate and one column per
+			output column
+		"""
+
+		raise NotImplementedError
+
+	def get_filename(self, rg_name, role):
+		"""
+		Returns the name of the output .tsv file for the given rank group and
+		role.
+		"""
+
+		if not self.BY_ROLE:
+			return '%s.tsv' % rg_name.lower()
+
+		role_name = role.lower() if role else 'all'
+		return '%s-%s.tsv' % (role_name, rg_name.lower())
+
+
+def in_set(vals, words):
+	return np.array([v in words for v in vals], dtype=bool)
+
+
+class ConcretenessFeature(Feature):
+	"""
+	Percentage of collocates that are adjectives.
+	"""
+
+	COLUMNS = ['CONCRETENESS']
+	BY_ROLE = False
+
+	def indicators(self, arrays):
+		return in_set(arrays['type'], ADJ_TYPES)[:, np.newaxis]
+
+
+class SociabilityFeature(Feature):
+	"""
+	Percentage of collocates that are other characters.
+	"""
+
+	COLUMNS = ['SOCIABILITY']
+
+	def indicators(self, arrays):
+		return in_set(arrays['lemma'], CHAR_TOKENS)[:, np.newaxis]
+
+
+class LexiconFeature(Feature):
+	"""
+	Percentages of collocates that are in each of a set of lexicons (See
+	lexicons.LEXICONS).
+	"""
+
+	# Names of lexicons, one per output column.
+	LEXICONS = []
+
+	# Collocate field looked up ('lemma' or 'word').
+	FIELD = 'lemma'
+
+	def load(self):
+		resources.get('lexicons')
+
+	def indicators(self, arrays):
+		return lexicon_engine.indicators(arrays[self.FIELD], self.LEXICONS)
+
+
+class DialogicalityFeature(LexiconFeature):
+	"""
+	Percentage of collocates that are "said" words.
+	"""
+
+	COLUMNS = ['DIALOGICALITY']
+	LEXICONS = ['said']
+
+
+class AbstractFeature(LexiconFeature):
+	"""
+	Percentages of collocates that are "abstract" and "physical" words.
+	"""
+
+	COLUMNS = ['ABSTRACTIVITY', 'OBJECTIVITY']
+	LEXICONS = ['abstract', 'physical']
+
+
+class DictsFeature(LexiconFeature):
+	"""
+	Percentages of collocates (words) that are "body", "clothes", "motion",
+	"physical", "sense", and "value" words.
+	"""
+
+	COLUMNS = ['EMBODIMENT', 'CLOTHES', 'MOTION', 'PHYSICAL', 'PERCEPTION',
+		'VALUATION']
+	LEXICONS = ['body', 'clothes', 'motion', 'physical_attributes', 'sense',
+		'values']
+	FIELD = 'word'
+
+
+class LexiconsFeature(LexiconFeature):
+	"""
+	Percentages of collocates that are in each registered lexicon.
+	"""
+
+	COLUMNS = [name.upper() for name in REGISTERED_LEXICONS]
+	LEXICONS = list(REGISTERED_LEXICONS)
+
+
+class RoleDistFeature(Feature):
+	"""
+	# collocates with each role.
+	"""
+
+	COLUMNS = ['# %s' % r for r in ROLES]
+	COUNTS = True
+	BY_ROLE = False
+
+	def indicators(self, arrays):
+		return np.column_stack([arrays['role'] == r for r in ROLES])
+
+
+class DepTypeDistFeature(Feature):
+	"""
+	# collocates with each dependency type.
+	"""
+
+	COLUMNS = ['# %s' % t.upper() for t in TYPES]
+	COUNTS = True
+	BY_ROLE = False
+
+	def indicators(self, arrays):
+		return np.column_stack([arrays['type'] == t for t in TYPES])
+
+
+# Registered features, by name (Also the names of their output directories).
+FEATURES = OrderedDict([
+	('concreteness', ConcretenessFeature),
+	('sociability', SociabilityFeature),
+	('dialogicality', DialogicalityFeature),
+	('abstract', AbstractFeature),
+	('from_dicts', DictsFeature),
+	('lexicons', LexiconsFeature),
+	('role_dist', RoleDistFeature),
+	('dep_type_dist', DepTypeDistFeature)
+])
+
+
+# Input files and parameters of the (cached) features of a story (See
+# resultcache.cached).
+def get_features_inputs(calculator, sid):
+	return calculator.collocates_manager.get_input_fpaths(sid, 'character') + \
+		lexicon_engine.get_fpaths()
+
+
+def get_features_params(calculator, sid):
+	return [calculator.names, [[rg_name, list(ranks) if ranks else None]
+		for rg_name, ranks in calculator.rank_groups], calculator.roles]
+
+
+class FeaturesCalculator(object):
+	"""
+	Calculates registered features of stories for every rank group and role,
+	reading each story's collocates once.
+	"""
+
+	def __init__(self, names=None, rank_groups=RANK_GROUPS,
+		roles=[None] + ROLES):
+		"""
+		@param names - Names of the features to calculate (Default is None, for
+			all registered features)
+		@param rank_groups - List of (<name>, <ranks>) rank groups (Default is
+			RANK_GROUPS)
+		@param roles - List of roles (None for considering all roles; Default
+			is None and ROLES)
+		"""
+
+		self.names = list(FEATURES) if names is None else list(names)
+		self.rank_groups, self.roles = rank_groups, roles
+
+		self.features = OrderedDict()
+		for name in self.names:
+			self.features[name] = FEATURES[name]()
+			self.features[name].load()
+
+		self.collocates_manager = CollocatesManager()
+
+	def get_params(self, name):
+		"""
+		Returns the (<rank group name>, <role>) settings the given feature is
+		calculated for.
+		"""
+
+		roles = self.roles if self.features[name].BY_ROLE else [None]
+		return [(rg_name, role) for rg_name, _ in self.rank_groups
+			for role in roles]
+
+	@cached('features/1', get_features_inputs, get_features_params)
+	def calc(self, sid=None, arrays=None):
+		"""
+		Calculates the features of the given story (whose character collocates
+		must exist), or of its collocate arrays (e.g. prefetched).
+
+		@param sid - Story Id of story (Default is None)
+		@param arrays - Collocate arrays (as returned by
+			CollocatesManager.get_arrays) (Default is None)
+		@return Map from feature name to map from (<rank group name>, <role>)
+			to list of values, in the order of the feature's columns
+		"""
+
+		if arrays is None:
+			arrays = self.collocates_manager.get_arrays(sid, 'character')
+
+		rank_masks = {}
+		for rg_name, ranks in self.rank_groups:
+			rank_masks[rg_name] = np.in1d(arrays['rank'], list(ranks)) \
+				if ranks else np.ones(len(arrays['rank']), dtype=bool)
+		role_masks = {role: arrays['role'] == role for role in self.roles
+			if role}
+
+		vals = {}
+		for name, feature in self.features.iteritems():
+			inds = feature.indicators(arrays).reshape(-1,
+				len(feature.COLUMNS))
+
+			vals[name] = {}
+			for rg_name, role in self.get_params(name):
+				mask = rank_masks[rg_name]
+				if role:
+					mask = mask & role_masks[role]
+
+				total = int(mask.sum())
+				cnts = [int(c) for c in inds[mask].sum(axis=0)]
+
+				if feature.COUNTS:
+					vals[name][(rg_name, role)] = cnts
+				else:
+					vals[name][(rg_name, role)] = [float(c) / total
+						if total > 0 else 0.0 for c in cnts]
+
+		return vals
+
+
+# Calculator for the features to output (Set by run_features before the
+# workers are forked).
+features_calculator = None
+
+
+# Loader of the collocate arrays of a story (None if they can't be read),
+# prefetched while the previous stories are calculated (See prefetch.py).
+def load_arrays(sid):
+	try:
+		return features_calculator.collocates_manager.get_arrays(sid,
+			'character')
+	except READ_ERRORS:
+		return None
+
+
+# Worker function, returning the features of the given story for each feature,
+# rank group, and role from its collocate arrays (None if they can't be read).
+@cached_worker('calc_features/1', ['character'],
+	lambda sid: get_features_params(features_calculator, sid),
+	lexicon_engine.get_fpaths)
+def calc_story_features(sid, arrays):
+	if arrays is None:
+		return None
+
+	vals = features_calculator.calc(arrays=arrays)
+
+	return {(name, rg_name, role): feature_vals
+		for name, params_vals in vals.iteritems()
+		for (rg_name, role), feature_vals in params_vals.iteritems()}
+
+
+def run_features(out_dirpath, names=None, n=1, resume=True, subdirs=True,
+	sids=None):
+	"""
+	Calculates the given features of every story with character collocates
+	across the rank groups and roles, reading each story's collocates once, and
+	outputs a .tsv file per feature, rank group, and role (See
+	Feature.get_filename).
+
+	@param out_dirpath - Path to output directory
+	@param names - Names of the features (Default is None, for all registered
+		features)
+	@param n - # worker processes (Default is 1)
+	@param resume - Whether or not to resume an interrupted run (Default is
+		True)
+	@param subdirs - Whether to output the files of each feature under a
+		sub-directory named after it (Default is True)
+	@param sids - Story Id's (Default is None, for every story for which the
+		CoreNLP .xml and BookNLP files have been generated)
+	"""
+
+	global features_calculator
+
+	collocates_manager = CollocatesManager()
+	corpus_manager = CorpusManager()
+
+	# Get publication dates for all stories.
+	dates = corpus_manager.get_dates()
+
+	# Story Id's with character collocates.
+	if sids is None:
+		sids = corpus_manager.get_ids(origin='gen')
+
+	saved_sids = []
+	for sid in sids:
+		if not collocates_manager.saved(sid, tpe='character'):
+			logging.info("Skipping %s..." % sid)
+			continue
+
+		saved_sids.append(sid)
+
+	features_calculator = FeaturesCalculator(names)
+
+	# Output .tsv files by feature, rank group, and role.
+	keys, headers = [], {}
+	for name, feature in features_calculator.features.iteritems():
+		for rg_name, role in features_calculator.get_params(name):
+			keys.append((name, rg_name, role))
+			headers[(name, rg_name, role)] = ['STORY ID', 'PUB. DATE',
+				'GENRE'] + feature.COLUMNS
+
+	# Returns the path of the .tsv file of the given feature, rank group, and
+	# role (relative to the output directory).
+	def get_filename(key):
+		name, rg_name, role = key
+		filename = features_calculator.features[name].get_filename(rg_name,
+			role)
+
+		return os.path.join(name, filename) if subdirs else filename
+
+	# Returns the first values of the row of the given story.
+	def get_prefix(sid):
+		genre = (None if sid.startswith('000') else
+			corpus_manager.get_genre(sid))
+
+		return [sid, dates[sid] if sid in dates else 'DNE',
+			genre if genre else 'DNE']
+
+	map_reducer = StoryMapReducer(out_dirpath, keys, headers,
+		filename=get_filename, n=n)
+	map_reducer.run(calc_story_features, saved_sids, prefix=get_prefix,
+		resume=resume, load=load_arrays)
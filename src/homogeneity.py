@@ -0,0 +1,103 @@
+"""
+Calculates the homogeneity of stories, as the mean pairwise cosine similarity
+of the collocate vectors of their top characters, for every story at once from
+a shared (story, character) x term matrix.
+"""
+
+import numpy as np
+
+from scipy.sparse import diags
+
+from classsim import build_matrix, count_terms
+
+
+def count_character_terms(arrays, ranks):
+	"""
+	Returns the collocate term counts of each of the given characters of a
+	story (See classsim.count_terms).
+
+	@param arrays - Collocates of the story (as returned by
+		CollocatesManager.get_arrays)
+	@param ranks - Iterable of character ranks
+	@return List of (<rank>, <term counter>) pairs, for the characters with
+		collocates, in order of rank
+	"""
+
+	return [(rank, count_terms(arrays['lemma'][arrays['rank'] == rank]))
+		for rank in sorted(set(ranks)) if (arrays['rank'] == rank).any()]
+
+
+def calc_homogeneities(X, story_inds, num_stories, stop_cols=None):
+	"""
+	Calculates the homogeneity of each story as the mean cosine similarity
+	over the pairs of its characters' vectors. The similarities of every pair
+	in the corpus are taken in one batched row-wise product.
+
+	@param X - (Story, character) x term count matrix (in CSR format)
+	@param story_inds - Array of the story (index) of each row of X
+	@param num_stories - # stories
+	@param stop_cols - Boolean array marking the columns of X (e.g. stopwords)
+		to leave out (Default is None, for none)
+	@return Array of homogeneities, one per story (NaN for stories with fewer
+		than two characters, or with a character whose vector is empty), and
+		boolean array marking the stories whose vectors are all empty
+	"""
+
+	story_inds = np.asarray(story_inds, dtype=np.int64)
+
+	if stop_cols is not None:
+		X = X * diags((~stop_cols[:X.shape[1]]).astype(np.float64))
+
+	norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+	units = diags(np.where(norms > 0, 1.0 / np.where(norms > 0, norms, 1.0),
+		0.0)) * X
+
+	# Pairs of rows of the same story.
+	order = np.argsort(story_inds, kind='mergesort')
+	rows1, rows2 = [], []
+	starts = np.searchsorted(story_inds[order], np.arange(num_stories + 1))
+	for start, end in zip(starts[:-1], starts[1:]):
+		inds1, inds2 = np.triu_indices(end - start, 1)
+		rows1.append(order[start + inds1])
+		rows2.append(order[start + inds2])
+	rows1 = np.concatenate(rows1 + [[]]).astype(np.int64)
+	rows2 = np.concatenate(rows2 + [[]]).astype(np.int64)
+
+	sims = np.asarray(units[rows1].multiply(units[rows2]).sum(axis=1)).ravel()
+	# Cosine similarity with an empty vector is undefined.
+	sims[(norms[rows1] == 0) | (norms[rows2] == 0)] = np.nan
+
+	pair_stories = story_inds[rows1]
+	num_pairs = np.bincount(pair_stories, minlength=num_stories)
+
+	with np.errstate(divide='ignore', invalid='ignore'):
+		homogeneities = np.bincount(pair_stories, weights=sims,
+			minlength=num_stories) / num_pairs
+
+	empty = np.bincount(story_inds, weights=norms, minlength=num_stories) == 0
+
+	return homogeneities, empty
+
+
+def build_character_matrix(story_cntrs, vocab=None):
+	"""
+	Builds the (story, character) x term count matrix of the given character
+	term counts.
+
+	@param story_cntrs - List of lists of (<rank>, <term counter>) pairs, one
+		per story (as returned by count_character_terms)
+	@param vocab - Vocabulary (store.Vocabulary) giving the columns (Default
+		is a new in-memory one)
+	@return Count matrix (in CSR format), array of the story (index) of each
+		row, and the vocabulary
+	"""
+
+	cntrs, story_inds = [], []
+	for i, char_cntrs in enumerate(story_cntrs):
+		for _, cntr in char_cntrs:
+			cntrs.append(cntr)
+			story_inds.append(i)
+
+	X, vocab = build_matrix(cntrs, vocab)
+
+	return X, np.array(story_inds, dtype=np.int64), vocab
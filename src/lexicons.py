@@ -0,0 +1,274 @@
+"""
+Compiles the registered lexicons (word lists under resources/) into one bitmask
+per term of the corpus-level term vocabulary, cached on disk, so that the
+lexicon hits of any batch of collocates are read off with a single gather.
+"""
+
+import csv
+import json
+import numpy as np
+import os
+
+from collections import OrderedDict
+from nltk.stem import WordNetLemmatizer
+
+from corpus import STORE_DIRPATH
+from store import TERMS_VOCAB_FPATH, Vocabulary, locked
+
+
+# Path to the resources directory.
+RESOURCES_DIRPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+	'..', 'resources')
+
+# Path prefix of the compiled lexicon bitmasks (.npy) and their manifest
+# (.json).
+LEXICONS_PREFIX = os.path.join(STORE_DIRPATH, 'lexicons')
+
+
+# Returns a set of words from the file, one per line.
+def load_words(fpath):
+	with open(fpath) as f:
+		return set([l.strip() for l in f])
+
+
+# Returns a set of words from the first column of the .csv file.
+def load_csv_words(fpath):
+	with open(fpath) as f:
+		reader = csv.reader(f, delimiter=',', quotechar='"')
+
+		return set([row[0] for row in reader])
+
+
+# Returns a set of words from the file, one per line, lemmatized.
+def load_lemmatized_words(fpath):
+	words = []
+	with open(fpath) as f:
+		for line in f:
+			words.append(line.strip().replace(' ', '-'))
+
+	lemmatizer = WordNetLemmatizer()
+
+	# Lemmatize and convert to set.
+	return set([lemmatizer.lemmatize(w) for w in words])
+
+
+# Returns a set of "said" words (tab-separated), lemmatized.
+def load_said_words(fpath):
+	words = []
+	with open(fpath) as f:
+		for line in f:
+			words += [p.strip().replace(' ', '-') for p in line.split('\t')]
+
+	lemmatizer = WordNetLemmatizer()
+
+	# Lemmatize and convert to set and add 'say'.
+	return set([lemmatizer.lemmatize(w) for w in words] + ['say'])
+
+
+# Registered lexicons, by name, as (<filename under resources/>, <loader>)
+# pairs. A lexicon added here is compiled (and available to every feature) on
+# the next load.
+LEXICONS = OrderedDict([
+	('said', ('said_dict.txt', load_said_words)),
+	('abstract', ('abstract.txt', load_lemmatized_words)),
+	('physical', ('physical.txt', load_lemmatized_words)),
+	('body', ('dict_body.csv', load_words)),
+	('clothes', ('dict_clothes.csv', load_words)),
+	('motion', ('dict_motion.csv', load_words)),
+	('physical_attributes', ('dict_physical_attributes.csv', load_csv_words)),
+	('sense', ('dict_sense.csv', load_csv_words)),
+	('values', ('dict_values.csv', load_words))
+])
+
+
+def to_unicode(term):
+	return term.decode('utf-8') if isinstance(term, str) else term
+
+
+class LexiconEngine(object):
+	"""
+	Looks up lexicon membership through a bitmask array indexed by term Id,
+	with one bit per registered lexicon (in 64-bit words, so any number of
+	lexicons fit). The array is compiled once and cached along with a manifest
+	of the lexicon files it was compiled from, and recompiled whenever they
+	change. Terms added to the vocabulary later belong to no lexicon, since
+	every lexicon word is added to the vocabulary when compiling.
+	"""
+
+	def __init__(self, prefix=LEXICONS_PREFIX, vocab_fpath=TERMS_VOCAB_FPATH):
+		"""
+		@param prefix - Path prefix of the compiled bitmasks (Default is
+			LEXICONS_PREFIX)
+		@param vocab_fpath - Path to term vocabulary (Default is
+			TERMS_VOCAB_FPATH)
+		"""
+
+		self.prefix = prefix
+		self.vocab_fpath = vocab_fpath
+
+		self.names = list(LEXICONS)
+		self.vocab, self.masks = None, None
+
+	def get_fpaths(self):
+		"""
+		Returns the paths to the files of the registered lexicons.
+		"""
+
+		return [os.path.join(RESOURCES_DIRPATH, fname)
+			for fname, _ in LEXICONS.itervalues()]
+
+	def get_manifest(self):
+		"""
+		Returns the manifest of the registered lexicons: their names, and the
+		size and modification time of their files.
+		"""
+
+		manifest = []
+		for name, (fname, _) in LEXICONS.iteritems():
+			st = os.stat(os.path.join(RESOURCES_DIRPATH, fname))
+			manifest.append([name, fname, st.st_size, int(st.st_mtime)])
+
+		return manifest
+
+	def compile(self):
+		"""
+		Compiles the registered lexicons into the bitmask array and saves it
+		(along with the manifest).
+		"""
+
+		manifest = self.get_manifest()
+
+		vocab = Vocabulary(self.vocab_fpath)
+
+		lexicon_ids = []
+		for name, (fname, loader) in LEXICONS.iteritems():
+			words = [to_unicode(w) for w in
+				loader(os.path.join(RESOURCES_DIRPATH, fname))]
+			lexicon_ids.append(vocab.encode(words, add=True))
+
+		masks = np.zeros((len(vocab), (len(LEXICONS) + 63) // 64),
+			dtype=np.uint64)
+		for k, ids in enumerate(lexicon_ids):
+			masks[ids, k // 64] |= np.uint64(1 << (k % 64))
+
+		# Written under temporary names, with the manifest last, so that
+		# readers never see a partial or mismatched array.
+		with open(self.prefix + '.npy.tmp', 'wb') as f:
+			np.save(f, masks)
+		os.rename(self.prefix + '.npy.tmp', self.prefix + '.npy')
+
+		with open(self.prefix + '.json.tmp', 'wb') as f:
+			json.dump(manifest, f)
+		os.rename(self.prefix + '.json.tmp', self.prefix + '.json')
+
+	def compiled(self):
+		"""
+		Checks whether the saved bitmask array is up to date with the
+		registered lexicons.
+		"""
+
+		if not os.path.exists(self.prefix + '.npy') or \
+			not os.path.exists(self.prefix + '.json'):
+			return False
+
+		with open(self.prefix + '.json', 'rb') as f:
+			return json.load(f) == self.get_manifest()
+
+	def load(self, vocab=None):
+		"""
+		Loads the bitmask array (compiling it first if it's out of date),
+		memory-mapped so that forked workers share its pages.
+
+		@param vocab - Term vocabulary to share (See resources.py) (Default is
+			None, for loading it)
+		"""
+
+		if self.masks is not None:
+			return
+
+		if not self.compiled():
+			with locked(self.prefix + '.lock'):
+				# Compiled by another process in the meantime.
+				if not self.compiled():
+					self.compile()
+
+		self.masks = np.load(self.prefix + '.npy', mmap_mode='r')
+
+		if vocab is None:
+			self.vocab = Vocabulary(self.vocab_fpath)
+		else:
+			# Pick up the terms added when compiling.
+			vocab.refresh()
+			self.vocab = vocab
+
+	def get_masks(self, terms):
+		"""
+		Returns the bitmasks of the given terms (Zero for terms outside the
+		vocabulary or added after compiling).
+
+		@param terms - Iterable of terms
+		@return Array of bitmasks, with one row per term
+		"""
+
+		self.load()
+
+		ids = np.array([self.vocab.get_id(to_unicode(t)) for t in terms],
+			dtype=np.int64)
+		known = (ids >= 0) & (ids < len(self.masks))
+
+		masks = np.zeros((len(ids), self.masks.shape[1]), dtype=np.uint64)
+		masks[known] = self.masks[ids[known]]
+
+		return masks
+
+	def has(self, masks, name):
+		"""
+		Checks which of the given bitmasks have the bit of the given lexicon.
+
+		@return Boolean array, with one entry per bitmask
+		"""
+
+		k = self.names.index(name)
+		return ((masks[:, k // 64] >> np.uint64(k % 64)) & np.uint64(1)) \
+			.astype(bool)
+
+	def indicators(self, terms, names=None):
+		"""
+		Marks the given terms by lexicon.
+
+		@param terms - Iterable of terms
+		@param names - Names of lexicons (Default is None, for all registered
+			lexicons)
+		@return Boolean array with one row per term and one column per lexicon
+		"""
+
+		names = self.names if names is None else names
+
+		masks = self.get_masks(terms)
+
+		inds = np.zeros((len(masks), len(names)), dtype=bool)
+		for j, name in enumerate(names):
+			inds[:, j] = self.has(masks, name)
+
+		return inds
+
+	def get_words(self, name):
+		"""
+		Returns the words of the given lexicon, as compiled (e.g. lemmatized).
+		"""
+
+		self.load()
+
+		return self.vocab.decode(np.flatnonzero(self.has(self.masks, name)))
+
+	def count(self, terms, names=None):
+		"""
+		Returns the # of the given terms in each of the given lexicons (See
+		indicators).
+		"""
+
+		return self.indicators(terms, names).sum(axis=0)
+
+
+# Shared lexicon engine (Loaded on first use).
+lexicon_engine = LexiconEngine()
@@ -0,0 +1,181 @@
+"""
+Counts the non-character words (lemmas) of each story, i.e. those of the tokens
+that are neither character aliases nor character collocates, and stores them as
+integer-coded count vectors over a corpus-level term vocabulary.
+"""
+
+import numpy as np
+import os
+
+from collections import Counter
+
+from aliases import AliasesManager
+from collocates import CollocatesManager
+from corpus import CorpusManager
+from store import TERMS_VOCAB_FPATH, Vocabulary
+from tokens import iter_tokens
+
+
+# Default character ranks whose aliases and collocates are left out.
+RANKS = range(1, 21)
+
+
+class NonCharacterCounter(object):
+	"""
+	Counts the lemmas of the tokens of a CoreNLP .xml file that aren't covered
+	by character aliases or character collocates.
+	"""
+
+	def __init__(self, ranks=RANKS):
+		"""
+		@param ranks - Iterable of character ranks whose aliases and collocates
+			are left out (Default is RANKS)
+		"""
+
+		self.ranks = set(ranks)
+
+	def get_positions(self, aliases, collocates):
+		"""
+		Returns the global token indices of the given aliases, and the
+		(sentence index, token index within sentence) positions of the given
+		collocates, as a pair of sets.
+		"""
+
+		alias_indices = set(i for a in aliases
+			if a['entity']['rank'] in self.ranks for i in a['indices'])
+
+		collocate_positions = set((coll['alias']['sentence_index'],
+			coll['token']['index']) for coll in collocates
+			if coll['alias']['entity']['rank'] in self.ranks)
+
+		return alias_indices, collocate_positions
+
+	def count(self, corenlp_fpath, aliases, collocates):
+		"""
+		Counts the non-character lemmas of the CoreNLP .xml file located by the
+		given path.
+
+		@param corenlp_fpath - Path to CoreNLP .xml file
+		@param aliases - List of character aliases (as returned by
+			AliasesManager.get_aliases)
+		@param collocates - List of character collocates (as returned by
+			CollocatesManager.get)
+		@return Counter of lemmas
+		"""
+
+		alias_indices, collocate_positions = self.get_positions(aliases,
+			collocates)
+
+		lemma_cntr = Counter()
+		for i, sent_ind, tok_ind, t in iter_tokens(corenlp_fpath):
+			if i not in alias_indices and \
+				(sent_ind, tok_ind) not in collocate_positions:
+				lemma_cntr[t[1].text] += 1
+
+		return lemma_cntr
+
+
+class NonCharacterManager(object):
+	"""
+	Manages the non-character lemma counts of each story in the corpus. Each
+	story's counts are saved as a binary file of int32's, holding the term Id's
+	(in the corpus-level term vocabulary) followed by the corresponding counts,
+	so that they load without any parsing.
+	"""
+
+	def __init__(self, ranks=RANKS):
+		"""
+		@param ranks - Iterable of character ranks whose aliases and collocates
+			are left out (Default is RANKS)
+		"""
+
+		self.counter = NonCharacterCounter(ranks)
+		self.ranks = ranks
+
+		self.aliases_manager = AliasesManager()
+		self.collocates_manager = CollocatesManager()
+		self.corpus_manager = CorpusManager()
+
+		self.vocab = Vocabulary(TERMS_VOCAB_FPATH)
+
+	def get_fpath(self, sid):
+		"""
+		Returns the filepath to the non-character lemma counts .bin file for
+		the given story.
+		"""
+
+		if not self.corpus_manager.belongs(sid):
+			raise ValueError(sid +
+				" does not correspond to a story in the corpus.")
+
+		return os.path.join(self.corpus_manager.get_dirpath(sid),
+			'non_character.bin')
+
+	def saved(self, sid):
+		"""
+		Checks whether the non-character lemma counts .bin for the given story
+		has been generated.
+		"""
+
+		return os.path.exists(self.get_fpath(sid))
+
+	def gen(self, sid):
+		"""
+		Generates the non-character lemma counts .bin file for the given story
+		(Overwrites it if it already exists). The character aliases .json and
+		character collocates .tsv must exist.
+		"""
+
+		aliases = self.aliases_manager.get_aliases(sid, 'character')
+		collocates = self.collocates_manager.get(sid, 'character',
+			ranks=self.ranks)
+
+		lemma_cntr = self.counter.count(
+			self.corpus_manager.get_corenlp_fpath(sid), aliases, collocates)
+
+		self.save(sid, lemma_cntr)
+
+	def save(self, sid, lemma_cntr):
+		"""
+		Saves the given lemma counter as the non-character lemma counts .bin
+		file for the given story, adding any new lemmas to the term vocabulary.
+		"""
+
+		lemmas = sorted(lemma_cntr)
+
+		ids = self.vocab.encode(lemmas, add=True)
+		cnts = [lemma_cntr[lemma] for lemma in lemmas]
+
+		arr = np.array([ids, cnts], dtype=np.int32)
+
+		# Written under a temporary name, so that readers never see a partial
+		# file.
+		fpath = self.get_fpath(sid)
+		arr.tofile(fpath + '.tmp')
+		os.rename(fpath + '.tmp', fpath)
+
+	def get_arrays(self, sid):
+		"""
+		Returns the non-character lemma counts for the given story (Must exist
+		and if not, generate them with NonCharacterManager.gen), as a pair of
+		int32 arrays of term Id's and counts.
+		"""
+
+		arr = np.fromfile(self.get_fpath(sid), dtype=np.int32)
+		ids, cnts = arr.reshape(2, -1)
+
+		return ids, cnts
+
+	def get(self, sid):
+		"""
+		Returns the non-character lemma counts for the given story as a
+		Counter of lemmas (See get_arrays).
+		"""
+
+		ids, cnts = self.get_arrays(sid)
+
+		# Pick up lemmas added by other processes.
+		if len(ids) > 0 and ids.max() >= len(self.vocab):
+			self.vocab.refresh()
+
+		return Counter(dict(zip(self.vocab.decode(ids), cnts.tolist())))
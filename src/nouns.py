@@ -5,42 +5,175 @@ Manages the nouns in each story.
 """
 
 import csv
+import heapq
 import json
 import os
-import xml.etree.ElementTree as ET
 
 from collections import Counter
 
-from corpus import CorpusManager
+from corpus import CorpusManager, STORE_DIRPATH
+from tokens import iter_tokens
 from unigrams import UnigramsManager
 
 
+# Path to the corpus-level shared noun vocabulary.
+NOUN_VOCAB_FPATH = os.path.join(STORE_DIRPATH, 'nouns.vocab')
+
+
+class NounPolicy(object):
+	"""
+	Interface for a noun vocabulary policy, deciding which of a story's nouns
+	are kept as entities.
+	"""
+
+	def select(self, noun_cntr):
+		"""
+		Selects the nouns to keep.
+
+		@param noun_cntr - Counter of (lowercase) nouns
+		@return List of (noun, count) pairs to keep, in reverse order of
+			frequency
+		"""
+
+		raise NotImplementedError
+
+
+class AllNounsPolicy(NounPolicy):
+	"""
+	Keeps every noun.
+	"""
+
+	def select(self, noun_cntr):
+		return sorted(noun_cntr.items(), key=lambda i: -i[1])
+
+
+class TopKNounsPolicy(NounPolicy):
+	"""
+	Keeps the k most frequent nouns, selected with a bounded (size k) min-heap
+	over the stream of noun counts.
+	"""
+
+	def __init__(self, k):
+		self.k = k
+
+	def select(self, noun_cntr):
+		heap = []
+		for noun, cnt in noun_cntr.iteritems():
+			if len(heap) < self.k:
+				heapq.heappush(heap, (cnt, noun))
+			elif cnt > heap[0][0]:
+				heapq.heapreplace(heap, (cnt, noun))
+
+		return [(noun, cnt) for cnt, noun in sorted(heap, reverse=True)]
+
+
+class MinCountNounsPolicy(NounPolicy):
+	"""
+	Keeps the nouns occurring at least a minimum # of times.
+	"""
+
+	def __init__(self, min_count):
+		self.min_count = min_count
+
+	def select(self, noun_cntr):
+		return sorted(((noun, cnt) for noun, cnt in noun_cntr.iteritems()
+			if cnt >= self.min_count), key=lambda i: -i[1])
+
+
+class SharedVocabularyNounsPolicy(NounPolicy):
+	"""
+	Keeps the nouns in a corpus-level shared noun vocabulary (See
+	NounsManager.build_vocab).
+	"""
+
+	def __init__(self, fpath=NOUN_VOCAB_FPATH):
+		"""
+		@param fpath - Path to the shared noun vocabulary, with one noun per
+			line
+		"""
+
+		with open(fpath) as f:
+			self.vocab = frozenset(l.rstrip('\n').decode('utf-8') for l in f)
+
+	def select(self, noun_cntr):
+		return sorted(((noun, cnt) for noun, cnt in noun_cntr.iteritems()
+			if noun in self.vocab), key=lambda i: -i[1])
+
+
+def make_policy(top_k=None, min_count=None, shared=False):
+	"""
+	Returns the noun vocabulary policy for the given settings (At most one may
+	be given; if none are, all nouns are kept).
+
+	@param top_k - Keep the top k nouns by count
+	@param min_count - Keep the nouns with at least this count
+	@param shared - Keep the nouns in the shared noun vocabulary
+	@return Noun vocabulary policy
+	"""
+
+	if sum([top_k is not None, min_count is not None, bool(shared)]) > 1:
+		raise ValueError("Only one noun vocabulary policy may be given.")
+
+	if top_k is not None:
+		return TopKNounsPolicy(top_k)
+	elif min_count is not None:
+		return MinCountNounsPolicy(min_count)
+	elif shared:
+		return SharedVocabularyNounsPolicy()
+	else:
+		return AllNounsPolicy()
+
+
 class NounsExtractor(object):
 	"""
 	Extracts nouns from a CoreNLP .xml file.
 	"""
 
-	def __init__(self):
-		pass
+	def __init__(self, policy=None):
+		"""
+		@param policy - Noun vocabulary policy (Default is to keep all nouns)
+		"""
 
-	def extract(self, corenlp_fpath, aliases):
+		self.policy = AllNounsPolicy() if policy is None else policy
+
+	def count(self, corenlp_fpath, aliases):
 		"""
-		Extracts the nouns from a CoreNLP .xml file, skipping over any noun that
-		is covered by an alias.
+		Counts the (lowercase) nouns in a CoreNLP .xml file, skipping over any
+		noun that is covered by an alias.
 
 		@param corenlp_fpath - Path to CoreNLP .xml file
 		@param aliases - List of aliases to check against (as returned by
 			AliasesManager.ident)
-		@return List of nouns in reverse order of frequency (formatted according
-			to CharactersManager.get_characters)
+		@return Counter of nouns
 		"""
 
 		alias_indices = set(i for a in aliases for i in a['indices'])
-		
-		corenlp_xml = ET.parse(corenlp_fpath).getroot()
-		noun_cntr = Counter([t[1].text for i, t
-			in enumerate(corenlp_xml.iter('token'))
-			if i not in alias_indices and t[4].text[0] == 'N'])
+
+		noun_cntr = Counter()
+		for i, _, _, t in iter_tokens(corenlp_fpath):
+			if i not in alias_indices and t[4].text[0] == 'N':
+				noun_cntr[t[1].text] += 1
+
+		return self.filter(noun_cntr)
+
+	def filter(self, noun_cntr):
+		"""
+		Drops the nouns that aren't lowercase from the given noun counter.
+
+		@return The noun counter
+		"""
+
+		# Only consider lowercase nouns.
+		for noun in [n for n in noun_cntr if n != n.lower()]:
+			del noun_cntr[noun]
+
+		return noun_cntr
+
+	def to_entities(self, noun_cnts):
+		"""
+		Formats the given (noun, count) pairs as entities (formatted according
+		to CharactersManager.get_characters).
+		"""
 
 		return [{
 					'aliases': [
@@ -52,12 +185,23 @@ class NounsExtractor(object):
 					'entity': noun,
 					'count': cnt
 				}
-				for noun, cnt
-				in sorted(noun_cntr.items(), key=lambda i: -i[1])
-				# Only consider lowercase nouns.
-				if noun == noun.lower()]
+				for noun, cnt in noun_cnts]
+
+	def extract(self, corenlp_fpath, aliases):
+		"""
+		Extracts the nouns from a CoreNLP .xml file, skipping over any noun that
+		is covered by an alias, and keeping only those selected by the noun
+		vocabulary policy.
 
-		return unigram_cnts
+		@param corenlp_fpath - Path to CoreNLP .xml file
+		@param aliases - List of aliases to check against (as returned by
+			AliasesManager.ident)
+		@return List of nouns in reverse order of frequency (formatted according
+			to CharactersManager.get_characters)
+		"""
+
+		return self.to_entities(self.policy.select(self.count(corenlp_fpath,
+			aliases)))
 
 	def save(self, nouns, out_path):
 		"""
@@ -78,8 +222,12 @@ class NounsManager(object):
 	Manages the list of nouns for each story in the corpus.
 	"""
 
-	def __init__(self):
-		self.extractor = NounsExtractor()
+	def __init__(self, policy=None):
+		"""
+		@param policy - Noun vocabulary policy (Default is to keep all nouns)
+		"""
+
+		self.extractor = NounsExtractor(policy)
 
 		self.corpus_manager = CorpusManager()
 
@@ -146,6 +294,15 @@ class NounsManager(object):
 		aliases = get_aliases(sid)
 		nouns = self.extractor.extract(corenlp_fpath, aliases)
 
+		self.save(sid, nouns)
+
+	def save(self, sid, nouns):
+		"""
+		Saves the given list of nouns (as returned by NounsExtractor.extract)
+		as the nouns .json file for the given story (Overwrites it if it
+		already exists).
+		"""
+
 		out_path = self.get_fpath(sid)
 
 		par_dirpath = os.path.split(out_path)[0]
@@ -163,3 +320,34 @@ class NounsManager(object):
 
 		with open(self.get_fpath(sid)) as f:
 			return json.load(f)
+
+	def build_vocab(self, size=None, min_df=1, fpath=NOUN_VOCAB_FPATH):
+		"""
+		Builds the corpus-level shared noun vocabulary from the document
+		frequencies of (lowercase) noun unigrams in the corpus unigram matrix,
+		and saves it with one noun per line, in reverse order of document
+		frequency.
+
+		@param size - Maximum # of nouns (If None (default), no maximum)
+		@param min_df - Minimum document frequency (Default is 1)
+		@param fpath - Output path (Default is NOUN_VOCAB_FPATH)
+		@return List of nouns in the vocabulary
+		"""
+
+		noun_df = Counter()
+		for (lemma, pos), df in UnigramsManager().get_doc_counts().iteritems():
+			if pos == 'N' and lemma == lemma.lower() and \
+				not lemma.startswith('ALIAS-') and df >= min_df:
+				noun_df[lemma] += df
+
+		nouns = [noun for noun, _ in noun_df.most_common(size)]
+
+		dirpath = os.path.dirname(fpath)
+		if not os.path.exists(dirpath):
+			os.makedirs(dirpath)
+
+		with open(fpath, 'w') as f:
+			for noun in nouns:
+				f.write(noun.encode('utf-8') + '\n')
+
+		return nouns
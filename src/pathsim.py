@@ -0,0 +1,194 @@
+"""
+Persistent cache of WordNet path similarities between pairs of synsets, shared
+by every story and run, with a pool of worker processes for the pairs not yet
+cached.
+"""
+
+import os
+import sqlite3
+
+from collections import OrderedDict
+from multiprocessing import Pool
+from nltk.corpus import wordnet as wn
+
+from corpus import STORE_DIRPATH
+
+
+# Path to the synset pair path similarity cache database.
+PATH_SIMS_FPATH = os.path.join(STORE_DIRPATH, 'path_similarities.sqlite')
+
+
+def calc_path_similarities(pairs):
+	"""
+	Calculates the path similarity of each of the given (ordered) pairs of
+	synsets (Path similarity isn't always symmetric, as a root node is only
+	simulated for the first synset's part-of-speech).
+
+	@param pairs - List of (<synset name>, <synset name>) pairs
+	@return List of path similarities (None for synsets that aren't connected)
+	"""
+
+	return [wn.synset(s1).path_similarity(wn.synset(s2)) for s1, s2 in pairs]
+
+
+class PathSimilarityCache(object):
+	"""
+	Caches the path similarities of pairs of synsets (by name) in an SQLite
+	database on disk, which several processes may share, and the most recently
+	cached ones in memory.
+	"""
+
+	def __init__(self, fpath=PATH_SIMS_FPATH, n=1, chunk_size=1000,
+		max_size=10 ** 6, lookup_size=10000):
+		"""
+		@param fpath - Path to cache database (Default is PATH_SIMS_FPATH)
+		@param n - # worker processes for uncached pairs (Default is 1, for
+			none)
+		@param chunk_size - # uncached pairs per worker task (Default is 1000)
+		@param max_size - Max # pairs kept in memory (Default is 10 ** 6)
+		@param lookup_size - # pairs looked up in the database per query
+			(Default is 10000)
+		"""
+
+		self.fpath = fpath
+		self.n = n
+		self.chunk_size = chunk_size
+		self.max_size = max_size
+		self.lookup_size = lookup_size
+
+		# Pairs in the order they were cached in memory.
+		self.sims = OrderedDict()
+
+		# Opened on first use, so that the cache can be created before forking.
+		self.conn = None
+		self.pool = None
+
+	def connect(self):
+		if self.conn is not None:
+			return self.conn
+
+		dirpath = os.path.dirname(self.fpath)
+		if dirpath and not os.path.exists(dirpath):
+			try:
+				os.makedirs(dirpath)
+			except OSError:
+				# Created by another process in the meantime.
+				pass
+
+		self.conn = sqlite3.connect(self.fpath, timeout=600)
+		# Readers don't block the (single) writer and vice versa.
+		self.conn.execute('PRAGMA journal_mode=WAL')
+		self.conn.execute('CREATE TABLE IF NOT EXISTS sims (s1 TEXT, s2 TEXT, '
+			'sim REAL, PRIMARY KEY (s1, s2))')
+		# Pairs being looked up (Private to the connection).
+		self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS lookup (s1 TEXT, '
+			's2 TEXT)')
+		self.conn.commit()
+
+		return self.conn
+
+	def compute(self, pairs):
+		"""
+		Calculates the path similarities of the given pairs, using the worker
+		pool if there are enough of them.
+		"""
+
+		chunks = [pairs[i:i + self.chunk_size] for i in xrange(0, len(pairs),
+			self.chunk_size)]
+
+		if self.n > 1 and len(chunks) > 1:
+			if self.pool is None:
+				self.pool = Pool(self.n)
+
+			results = self.pool.map(calc_path_similarities, chunks)
+		else:
+			results = map(calc_path_similarities, chunks)
+
+		return [sim for chunk_sims in results for sim in chunk_sims]
+
+	def lookup(self, pairs):
+		"""
+		Looks up the given pairs in the database, a batch of them (joined with
+		the database through a temporary table) per query.
+
+		@param pairs - List of (<synset name>, <synset name>) pairs
+		@return Map from pair to path similarity, for the pairs in the database
+		"""
+
+		conn = self.connect()
+
+		sims = {}
+		for i in xrange(0, len(pairs), self.lookup_size):
+			with conn:
+				conn.execute('DELETE FROM lookup')
+				conn.executemany('INSERT INTO lookup VALUES (?, ?)',
+					pairs[i:i + self.lookup_size])
+
+			for s1, s2, sim in conn.execute('SELECT sims.s1, sims.s2, sims.sim '
+				'FROM lookup JOIN sims ON sims.s1 = lookup.s1 AND '
+				'sims.s2 = lookup.s2'):
+				sims[(s1, s2)] = sim
+
+		return sims
+
+	def remember(self, sims):
+		"""
+		Keeps the given path similarities in memory, dropping those cached
+		earliest beyond the size limit.
+		"""
+
+		self.sims.update(sims)
+		while len(self.sims) > self.max_size:
+			self.sims.popitem(last=False)
+
+	def get(self, pairs):
+		"""
+		Returns the path similarities of the given (ordered) pairs of synsets,
+		calculating and storing those that aren't cached yet.
+
+		@param pairs - Iterable of (<synset name>, <synset name>) pairs
+		@return Map from pair to path similarity (None for synsets that aren't
+			connected)
+		"""
+
+		conn = self.connect()
+
+		sims, missing = {}, []
+		for pair in pairs:
+			if pair in self.sims:
+				sims[pair] = self.sims[pair]
+			else:
+				missing.append(pair)
+
+		if missing:
+			stored = self.lookup(missing)
+			cold = [pair for pair in missing if pair not in stored]
+
+			if cold:
+				cold_sims = self.compute(cold)
+
+				with conn:
+					conn.executemany('INSERT OR IGNORE INTO sims VALUES (?, ?, '
+						'?)', [(s1, s2, sim) for (s1, s2), sim
+							in zip(cold, cold_sims)])
+
+				stored.update(zip(cold, cold_sims))
+
+			sims.update(stored)
+			self.remember(stored)
+
+		return sims
+
+	def close(self):
+		"""
+		Shuts down the worker pool and closes the database.
+		"""
+
+		if self.pool is not None:
+			self.pool.close()
+			self.pool.join()
+			self.pool = None
+
+		if self.conn is not None:
+			self.conn.close()
+			self.conn = None
@@ -0,0 +1,141 @@
+"""
+Prefetching of story artifacts (e.g. CoreNLP .xml, aliases .json, and
+collocates .tsv files), so that the next stories of a per-story loop are read
+and decoded in background threads while the current one is processed. At most
+a fixed number of stories are loaded ahead, bounding the memory used.
+"""
+
+import io
+import json
+import sys
+
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+
+# Default # stories loaded ahead.
+DEFAULT_DEPTH = 4
+
+# Default # loader threads.
+DEFAULT_NUM_THREADS = 2
+
+# Errors raised when reading a story's malformed (e.g. empty or truncated)
+# artifacts, for which loaders return None instead.
+READ_ERRORS = (IndexError, StopIteration)
+
+
+def read_file(fpath):
+	"""
+	Reads the given file into memory.
+
+	@param fpath - Filepath
+	@return In-memory file object (which can be read, iterated over, and closed
+		like the file itself)
+	"""
+
+	with open(fpath, 'rb') as f:
+		return io.BytesIO(f.read())
+
+
+def read_json(fpath):
+	"""
+	Reads and decodes the given .json file.
+	"""
+
+	with open(fpath) as f:
+		return json.load(f)
+
+
+def open_input(f):
+	"""
+	Opens the given input, which is either a filepath or an (e.g. prefetched)
+	file object, which is returned as is.
+	"""
+
+	return open(f, 'rb') if isinstance(f, basestring) else f
+
+
+def prefetch(load, sids, depth=DEFAULT_DEPTH, num_threads=DEFAULT_NUM_THREADS):
+	"""
+	Iterates over the given stories along with their artifacts, loading the
+	artifacts of the next stories in background threads.
+
+	@param load - Function taking a story Id and returning its artifacts
+		(Any exception is raised, as a RuntimeError, once the story is
+		reached)
+	@param sids - Iterable of story Id's
+	@param depth - # stories loaded ahead (Default is DEFAULT_DEPTH)
+	@param num_threads - # loader threads (Default is DEFAULT_NUM_THREADS)
+	@return Iterator of (<story Id>, <artifacts>) tuples, in the order of the
+		stories
+	"""
+
+	sids, depth = iter(sids), max(1, depth)
+
+	pool = ThreadPool(max(1, min(num_threads, depth)))
+	try:
+		pending = deque()
+		for sid in sids:
+			pending.append((sid, pool.apply_async(load, (sid,))))
+			if len(pending) == depth:
+				break
+
+		while pending:
+			sid, result = pending.popleft()
+			try:
+				data = result.get()
+			except Exception as e:
+				# Re-raised as another error, since a StopIteration would
+				# otherwise silently end this generator (and the run).
+				raise RuntimeError("Failed to load %s: %s: %s" % (sid,
+					type(e).__name__, e)), None, sys.exc_info()[2]
+
+			# Keep the pipeline full before handing over the current story.
+			for next_sid in sids:
+				pending.append((next_sid, pool.apply_async(load, (next_sid,))))
+				break
+
+			yield sid, data
+
+			# Not held on to while the next story is waited for.
+			del data
+	finally:
+		pool.terminate()
+		pool.join()
+
+
+def prefetch_collocates(collocates_manager, sids, tpe, role=None, ranks=None,
+	arrays=False, depth=DEFAULT_DEPTH):
+	"""
+	Iterates over the given stories along with their collocates, reading those
+	of the next stories in background threads (See prefetch).
+
+	@param collocates_manager - Collocates manager
+		(collocates.CollocatesManager)
+	@param sids - Iterable of story Id's
+	@param tpe - 'character', 'concept', or 'noun'
+	@param role - Role to restrict the collocates to (Default is None, for all)
+	@param ranks - Ranks to restrict the collocates to (Default is None, for
+		all)
+	@param arrays - Whether to read the collocates as arrays (See
+		CollocatesManager.get_arrays; role and ranks don't apply) (Default is
+		False)
+	@param depth - # stories loaded ahead (Default is DEFAULT_DEPTH)
+	@return Iterator of (<story Id>, <collocates>) tuples, in the order of the
+		stories (with None for collocates that haven't been parsed or can't be
+		read)
+	"""
+
+	def load(sid):
+		if not collocates_manager.saved(sid, tpe=tpe):
+			return None
+
+		try:
+			if arrays:
+				return collocates_manager.get_arrays(sid, tpe)
+
+			return collocates_manager.get(sid, tpe=tpe, role=role, ranks=ranks)
+		except READ_ERRORS:
+			return None
+
+	return prefetch(load, sids, depth)
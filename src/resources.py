@@ -0,0 +1,204 @@
+"""
+Registry of the heavy read-only resources shared by the calculations (lexicons,
+"said" words, stopwords, SentiWordNet scores, embeddings, and the term
+vocabulary). Each is loaded once per process into a compact, immutable form
+(frozen sets, and arrays memory-mapped from disk where possible), so that
+loading them in the parent before forking a worker pool lets every worker
+inherit them copy-on-write instead of loading its own. The resident memory of
+a process (and its workers) can be reported to check that it does.
+"""
+
+import logging
+import os
+
+from collections import OrderedDict
+
+from lexicons import RESOURCES_DIRPATH
+from store import TERMS_VOCAB_FPATH, Vocabulary
+
+
+# Path to "said" words.
+SAID_WORDS_FPATH = os.path.join(RESOURCES_DIRPATH, 'said_dict.txt')
+
+# Fields of /proc/<pid>/status reported (in kB).
+RSS_FIELDS = ('VmRSS', 'RssAnon', 'RssFile', 'RssShmem')
+
+
+def load_terms_vocab():
+	return Vocabulary(TERMS_VOCAB_FPATH)
+
+
+def load_said_words():
+	# Read off the compiled lexicon, rather than lemmatizing the words again.
+	return frozenset(resources.get('lexicons').get_words('said'))
+
+
+def load_stopwords():
+	from nltk.corpus import stopwords
+
+	return frozenset(stopwords.words('english'))
+
+
+def load_lexicons():
+	from lexicons import lexicon_engine
+
+	lexicon_engine.load(vocab=resources.get('terms_vocab'))
+
+	return lexicon_engine
+
+
+def load_sentiwordnet():
+	from sentiment import SentiWordNetTable
+
+	table = SentiWordNetTable()
+	table.load(vocab=resources.get('terms_vocab'))
+
+	return table
+
+
+def load_collocate_vectors():
+	from depth import VectorDepthCalculator
+
+	VectorDepthCalculator.MODEL.load(vocab=resources.get('terms_vocab'))
+
+	return VectorDepthCalculator.MODEL
+
+
+def load_word2vec():
+	from embeddings import Embeddings
+
+	model = Embeddings()
+	model.load()
+
+	return model
+
+
+def load_wordnet():
+	from nltk.corpus import wordnet
+
+	# Forces the lazy corpus reader to read the WordNet index.
+	wordnet.synsets('entity')
+
+	return wordnet
+
+
+# Registered resources, by name, with their loaders.
+RESOURCES = OrderedDict([
+	('terms_vocab', load_terms_vocab),
+	('said_words', load_said_words),
+	('stopwords', load_stopwords),
+	('lexicons', load_lexicons),
+	('sentiwordnet', load_sentiwordnet),
+	('collocate_vectors', load_collocate_vectors),
+	('word2vec', load_word2vec),
+	('wordnet', load_wordnet)
+])
+
+
+def get_rss(pid=None):
+	"""
+	Returns the resident memory of the given process, read from
+	/proc/<pid>/status.
+
+	@param pid - Process Id (Default is None, for this process)
+	@return Map from field (See RSS_FIELDS) to size in kB (Empty if it can't be
+		read, e.g. outside Linux)
+	"""
+
+	fpath = os.path.join('/proc', 'self' if pid is None else str(pid),
+		'status')
+
+	rss = {}
+	try:
+		with open(fpath) as f:
+			for line in f:
+				field, _, value = line.partition(':')
+				if field in RSS_FIELDS:
+					rss[field] = int(value.split()[0])
+	except (IOError, OSError):
+		pass
+
+	return rss
+
+
+def format_rss(rss):
+	"""
+	Formats the given resident memory (as returned by get_rss) in MB.
+	"""
+
+	if 'VmRSS' not in rss:
+		return 'RSS unavailable'
+
+	parts = ['%s %.1f MB' % (field[3:].lower(), rss[field] / 1024.)
+		for field in RSS_FIELDS[1:] if field in rss]
+
+	return 'RSS %.1f MB%s' % (rss['VmRSS'] / 1024.,
+		' (%s)' % ', '.join(parts) if parts else '')
+
+
+def log_rss(label, pid=None):
+	"""
+	Logs the resident memory of the given process (None for this one).
+	"""
+
+	logging.info("%s: %s" % (label, format_rss(get_rss(pid))))
+
+
+class ResourceRegistry(object):
+	"""
+	Loads registered resources on first use, once per process, and shares them
+	with every caller (and, if loaded before forking, every worker).
+	"""
+
+	def __init__(self, loaders=RESOURCES):
+		"""
+		@param loaders - Map from resource name to loader (Default is
+			RESOURCES)
+		"""
+
+		self.loaders = loaders
+		self.resources = {}
+
+	def get(self, name):
+		"""
+		Returns the given resource, loading it if it isn't already.
+		"""
+
+		if name not in self.resources:
+			if name not in self.loaders:
+				raise ValueError("Unregistered resource %s." % name)
+
+			self.resources[name] = self.loaders[name]()
+
+		return self.resources[name]
+
+	def loaded(self, name):
+		"""
+		Checks whether the given resource has been loaded (in this process).
+		"""
+
+		return name in self.resources
+
+	def preload(self, names):
+		"""
+		Loads the given resources (before forking workers, which then inherit
+		them), logging the resident memory of this process before and after.
+
+		@param names - Iterable of resource names
+		"""
+
+		names = [name for name in names if not self.loaded(name)]
+		if not names:
+			return
+
+		before = get_rss()
+		for name in names:
+			logging.info("Loading %s..." % name)
+			self.get(name)
+
+		logging.info("Loaded %s: %s before, %s after" % (', '.join(names),
+			format_rss(before), format_rss(get_rss())))
+
+
+# Global resource registry.
+resources = ResourceRegistry()
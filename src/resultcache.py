@@ -0,0 +1,347 @@
+"""
+Content-addressed cache of calculator results, shared by every process and run.
+A result is keyed on the name (and version) of the calculation, its parameters,
+and the hashes of the contents of its input files (e.g. a story's collocates
+and aliases), so that it's reused by any experiment with the same inputs, and
+never once they change. Results are kept in an SQLite database on disk, with
+the least recently used ones evicted once it outgrows its size limit.
+"""
+
+import cPickle as pickle
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import time
+
+from corpus import STORE_DIRPATH
+
+
+# Path to the result cache database.
+RESULTS_FPATH = os.path.join(STORE_DIRPATH, 'results.sqlite')
+
+# Default size limit of the cached results (in bytes).
+DEFAULT_MAX_SIZE = 2 ** 30
+
+# Fraction of the size limit that eviction brings the cached results down to.
+EVICT_RATIO = 0.9
+
+
+def hash_contents(fpath, chunk_size=2 ** 20):
+	"""
+	Returns the SHA-1 hash of the contents of the given file.
+	"""
+
+	sha1 = hashlib.sha1()
+	with open(fpath, 'rb') as f:
+		for chunk in iter(lambda: f.read(chunk_size), ''):
+			sha1.update(chunk)
+
+	return sha1.hexdigest()
+
+
+class ResultCache(object):
+	"""
+	Caches calculator results in an SQLite database on disk (along with the
+	hashes of the input files, and hit and miss counts by calculation).
+	"""
+
+	def __init__(self, fpath=RESULTS_FPATH, max_size=DEFAULT_MAX_SIZE,
+		evict_interval=100):
+		"""
+		@param fpath - Path to cache database (Default is RESULTS_FPATH)
+		@param max_size - Size limit of the cached results, in bytes (Default
+			is DEFAULT_MAX_SIZE)
+		@param evict_interval - # results stored (by this process) between
+			checks of the size limit (Default is 100)
+		"""
+
+		self.fpath = fpath
+		self.max_size = max_size
+		self.evict_interval = evict_interval
+
+		self.enabled = True
+
+		# Map from file path to (<size>, <modification time>, <hash>).
+		self.file_hashes = {}
+		self.num_puts = 0
+
+		# Opened on first use (in each process), so that the cache can be
+		# created before forking.
+		self.conn, self.pid = None, None
+
+	def connect(self):
+		if self.conn is not None and self.pid == os.getpid():
+			return self.conn
+
+		dirpath = os.path.dirname(self.fpath)
+		if dirpath and not os.path.exists(dirpath):
+			try:
+				os.makedirs(dirpath)
+			except OSError:
+				# Created by another process in the meantime.
+				pass
+
+		self.conn = sqlite3.connect(self.fpath, timeout=600)
+		self.pid = os.getpid()
+
+		# Readers don't block the (single) writer and vice versa.
+		self.conn.execute('PRAGMA journal_mode=WAL')
+		with self.conn:
+			self.conn.execute('CREATE TABLE IF NOT EXISTS results (key TEXT '
+				'PRIMARY KEY, name TEXT, value BLOB, size INTEGER, accessed '
+				'REAL)')
+			self.conn.execute('CREATE INDEX IF NOT EXISTS results_accessed ON '
+				'results (accessed)')
+			self.conn.execute('CREATE TABLE IF NOT EXISTS files (path TEXT '
+				'PRIMARY KEY, size INTEGER, mtime REAL, hash TEXT)')
+			self.conn.execute('CREATE TABLE IF NOT EXISTS stats (name TEXT '
+				'PRIMARY KEY, hits INTEGER, misses INTEGER)')
+
+		return self.conn
+
+	def get_file_hash(self, fpath):
+		"""
+		Returns the hash of the contents of the given file, which is only
+		re-read when its size or modification time changes.
+		"""
+
+		fpath = os.path.abspath(fpath)
+		st = os.stat(fpath)
+
+		if fpath in self.file_hashes:
+			size, mtime, h = self.file_hashes[fpath]
+			if size == st.st_size and mtime == st.st_mtime:
+				return h
+
+		conn = self.connect()
+
+		row = conn.execute('SELECT size, mtime, hash FROM files WHERE path = ?',
+			(fpath,)).fetchone()
+		if row is not None and row[0] == st.st_size and row[1] == st.st_mtime:
+			h = row[2]
+		else:
+			h = hash_contents(fpath)
+
+			with conn:
+				conn.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)',
+					(fpath, st.st_size, st.st_mtime, h))
+
+		self.file_hashes[fpath] = (st.st_size, st.st_mtime, h)
+
+		return h
+
+	def make_key(self, name, params, fpaths):
+		"""
+		Returns the key of the result of the given calculation.
+
+		@param name - Name (and version) of the calculation
+		@param params - JSON-serializable parameters
+		@param fpaths - List of paths to input files
+		@return Key
+		"""
+
+		return hashlib.sha1(json.dumps([name, params,
+			[self.get_file_hash(fpath) for fpath in fpaths]],
+			sort_keys=True)).hexdigest()
+
+	def count(self, name, hit):
+		with self.conn:
+			self.conn.execute('INSERT OR IGNORE INTO stats VALUES (?, 0, 0)',
+				(name,))
+			self.conn.execute('UPDATE stats SET %s = %s + 1 WHERE name = ?' %
+				(('hits',) * 2 if hit else ('misses',) * 2), (name,))
+
+	def get(self, name, key):
+		"""
+		Looks up the result with the given key (counting a hit or miss for the
+		given calculation).
+
+		@return Whether or not the result is cached, and the result (None if it
+			isn't)
+		"""
+
+		conn = self.connect()
+
+		row = conn.execute('SELECT value FROM results WHERE key = ?',
+			(key,)).fetchone()
+
+		self.count(name, row is not None)
+		if row is None:
+			return False, None
+
+		with conn:
+			conn.execute('UPDATE results SET accessed = ? WHERE key = ?',
+				(time.time(), key))
+
+		return True, pickle.loads(str(row[0]))
+
+	def put(self, name, key, value):
+		"""
+		Stores the given result of the given calculation under the given key.
+		"""
+
+		conn = self.connect()
+
+		data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+		with conn:
+			conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+				(key, name, sqlite3.Binary(data), len(data), time.time()))
+
+		self.num_puts += 1
+		if self.num_puts % self.evict_interval == 0:
+			self.evict()
+
+	def evict(self, max_size=None):
+		"""
+		Evicts the least recently used results once the cached results outgrow
+		the size limit, down to a fraction (EVICT_RATIO) of it.
+
+		@param max_size - Size limit, in bytes (Default is None, for the
+			cache's)
+		@return # results evicted
+		"""
+
+		max_size = self.max_size if max_size is None else max_size
+
+		conn = self.connect()
+
+		total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM '
+			'results').fetchone()[0]
+		if total <= max_size:
+			return 0
+
+		keys = []
+		for key, size in conn.execute('SELECT key, size FROM results ORDER BY '
+			'accessed'):
+			if total <= max_size * EVICT_RATIO:
+				break
+
+			keys.append((key,))
+			total -= size
+
+		with conn:
+			conn.executemany('DELETE FROM results WHERE key = ?', keys)
+
+		return len(keys)
+
+	def calc(self, name, params, fpaths, func, *args, **kwargs):
+		"""
+		Returns the result of the given calculation from the cache, calling the
+		given function (with the given arguments) and storing its result if it
+		isn't cached.
+
+		@param name - Name (and version) of the calculation
+		@param params - JSON-serializable parameters
+		@param fpaths - List of paths to input files
+		@param func - Function calculating the result
+		@return Result
+		"""
+
+		if not self.enabled:
+			return func(*args, **kwargs)
+
+		key = self.make_key(name, params, fpaths)
+
+		hit, value = self.get(name, key)
+		if not hit:
+			value = func(*args, **kwargs)
+			self.put(name, key, value)
+
+		return value
+
+	def get_stats(self):
+		"""
+		Returns the # cached results, their size (in bytes), and the # hits and
+		misses, by calculation.
+
+		@return List of (<name>, <# results>, <size>, <# hits>, <# misses>)
+			tuples, sorted by name
+		"""
+
+		conn = self.connect()
+
+		stats = {name: [0, 0, hits, misses] for name, hits, misses
+			in conn.execute('SELECT name, hits, misses FROM stats')}
+		for name, num_results, size in conn.execute('SELECT name, COUNT(*), '
+			'SUM(size) FROM results GROUP BY name'):
+			stats.setdefault(name, [0, 0, 0, 0])[:2] = [num_results, size]
+
+		return [tuple([name] + stats[name]) for name in sorted(stats)]
+
+	def clear(self, name=None):
+		"""
+		Removes the cached results (and stats) of the given calculation (None
+		for all of them).
+		"""
+
+		conn = self.connect()
+
+		with conn:
+			if name is None:
+				conn.execute('DELETE FROM results')
+				conn.execute('DELETE FROM stats')
+			else:
+				conn.execute('DELETE FROM results WHERE name = ?', (name,))
+				conn.execute('DELETE FROM stats WHERE name = ?', (name,))
+
+	def close(self):
+		"""
+		Closes the database.
+		"""
+
+		if self.conn is not None and self.pid == os.getpid():
+			self.conn.close()
+
+		self.conn, self.pid = None, None
+
+
+# Global result cache.
+result_cache = ResultCache()
+
+
+def cached(name, inputs, params=None, given=()):
+	"""
+	Decorator caching the results of a calculation (a function or method with a
+	story Id argument, sid) in the global result cache. A call is only cached
+	when its story Id is given, and every other argument (besides self) is
+	either one of the given arguments, i.e. derived from the story's input
+	files alone (e.g. its collocates, prefetched by a calc_* script), or left
+	as None. Calls with other arguments, e.g. collocates filtered by role, or
+	without a story Id, are calculated without the cache, however they're
+	passed.
+
+	@param name - Name (and version) of the calculation
+	@param inputs - Function taking the arguments up to the story Id (self and
+		the story Id, for methods) and returning the list of paths to the input
+		files
+	@param params - Function taking the same arguments and returning the
+		JSON-serializable parameters (Default is None, for none)
+	@param given - Names of the arguments that may be given in cached calls
+		(Default is none)
+	@return Decorator
+	"""
+
+	def decorator(func):
+		argnames = inspect.getargspec(func).args
+		key_argnames = argnames[:argnames.index('sid') + 1]
+
+		@functools.wraps(func)
+		def wrapper(*args, **kwargs):
+			callargs = inspect.getcallargs(func, *args, **kwargs)
+			if callargs['sid'] is None or any(val is not None
+				for arg, val in callargs.iteritems()
+				if arg not in key_argnames and arg not in given):
+				return func(*args, **kwargs)
+
+			key_args = [callargs[arg] for arg in key_argnames]
+
+			return result_cache.calc(name,
+				None if params is None else params(*key_args),
+				inputs(*key_args), func, *args, **kwargs)
+
+		return wrapper
+
+	return decorator
@@ -0,0 +1,118 @@
+"""
+Samples unordered pairs of items (e.g. stories) uniformly without replacement,
+by drawing pair indices and mapping them back to pairs, so that sampling k pairs
+takes O(k) time however many pairs there are.
+"""
+
+import math
+import random
+
+from itertools import combinations
+
+
+def num_pairs(n):
+	"""
+	Returns the # unordered pairs of n items.
+	"""
+
+	return n * (n - 1) // 2
+
+
+def get_pair(m):
+	"""
+	Returns the unordered pair (i, j), with i < j, of item indices with the
+	given pair index. Pairs are indexed in the order (0, 1), (0, 2), (1, 2),
+	(0, 3), (1, 3), (2, 3), ..., so the mapping doesn't depend on the # items.
+
+	@param m - Pair index
+	@return (i, j) pair
+	"""
+
+	j = int((1 + math.sqrt(1 + 8 * m)) / 2)
+
+	# Corrects for floating point error in the square root.
+	while num_pairs(j) > m:
+		j -= 1
+	while num_pairs(j + 1) <= m:
+		j += 1
+
+	return m - num_pairs(j), j
+
+
+def sample_pairs(items, k, seed=None, rng=None):
+	"""
+	Samples k unique unordered pairs of the given items, uniformly.
+
+	@param items - List of items
+	@param k - # pairs to sample (All pairs are returned if there aren't more
+		than k)
+	@param seed - Random seed (Default is None, for no seeding)
+	@param rng - Random number generator to draw from (Default is a new one
+		seeded with seed)
+	@return List of (<item>, <item>) pairs, with the first item of each
+		listed before the second
+	"""
+
+	total = num_pairs(len(items))
+
+	if k >= total:
+		return list(combinations(items, 2))
+
+	rng = random.Random(seed) if rng is None else rng
+
+	pairs = []
+	for m in sorted(rng.sample(xrange(total), k)):
+		i, j = get_pair(m)
+		pairs.append((items[i], items[j]))
+
+	return pairs
+
+
+def allocate(sizes, k):
+	"""
+	Allocates k draws across strata proportionally to their sizes (Largest
+	remainder method), without allocating more to a stratum than its size.
+
+	@param sizes - Map from stratum to size
+	@param k - Total # draws
+	@return Map from stratum to # draws
+	"""
+
+	total = sum(sizes.itervalues())
+	if k >= total:
+		return dict(sizes)
+
+	quotas = {s: float(k) * size / total for s, size in sizes.iteritems()}
+	alloc = {s: int(q) for s, q in quotas.iteritems()}
+
+	# Hands out the rest by largest remainder (Ties broken by stratum).
+	rest = k - sum(alloc.itervalues())
+	for s in sorted(quotas, key=lambda s: (alloc[s] - quotas[s], s))[:rest]:
+		alloc[s] += 1
+
+	return alloc
+
+
+def stratified_sample_pairs(groups, k, seed=None, proportional=False):
+	"""
+	Samples unique unordered pairs of items within each of the given groups
+	(e.g. story categories), uniformly within each group.
+
+	@param groups - Map from group to list of items
+	@param k - # pairs to sample per group, or in total if proportional
+	@param seed - Random seed (Default is None, for no seeding)
+	@param proportional - Whether k is the total # pairs, allocated to the
+		groups proportionally to their # pairs (Default is False)
+	@return Map from group to list of pairs (as returned by sample_pairs)
+	"""
+
+	if proportional:
+		ks = allocate({g: num_pairs(len(items)) for g, items
+			in groups.iteritems()}, k)
+	else:
+		ks = {g: k for g in groups}
+
+	# Groups draw in a fixed order, so that a seed reproduces every sample.
+	rng = random.Random(seed)
+
+	return {g: sample_pairs(groups[g], ks[g], rng=rng) for g in sorted(groups)}
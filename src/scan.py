@@ -0,0 +1,184 @@
+"""
+Scans CoreNLP .xml files once, producing the unigram counts, the noun counts,
+and token statistics (sentence lengths and POS tag histograms) together.
+"""
+
+import json
+import os
+
+from collections import Counter
+
+from aliases import AliasesManager
+from corpus import CorpusManager
+from nouns import NounsManager
+from tokens import iter_tokens
+from unigrams import UnigramsManager
+
+
+class CoreNLPScanner(object):
+	"""
+	Walks the token stream of a CoreNLP .xml file a single time, counting
+	unigrams and nouns (skipping over tokens covered by character aliases) and
+	collecting token statistics.
+	"""
+
+	def __init__(self, unigram_counter, nouns_extractor):
+		"""
+		@param unigram_counter - Unigram counter (unigrams.UnigramCounter)
+		@param nouns_extractor - Nouns extractor (nouns.NounsExtractor)
+		"""
+
+		self.unigram_counter = unigram_counter
+		self.nouns_extractor = nouns_extractor
+
+	def scan(self, corenlp_fpath, aliases):
+		"""
+		Scans the CoreNLP .xml file located by the given path.
+
+		@param corenlp_fpath - Path to CoreNLP .xml file
+		@param aliases - List of character aliases (as returned by
+			AliasesManager.ident)
+		@return Unigram counter (as returned by UnigramCounter.count), noun
+			counter (as returned by NounsExtractor.count), and token statistics
+			(as returned by TokenStatsManager.get) as a triple
+		"""
+
+		alias_indices = self.unigram_counter.get_indices(aliases)
+
+		unigram_cnts, noun_cntr, pos_cntr = Counter(), Counter(), Counter()
+		sentence_lengths = []
+
+		for i, sent_ind, tok_ind, t in iter_tokens(corenlp_fpath):
+			lemma, pos = t[1].text, t[4].text
+
+			pos_cntr[pos] += 1
+
+			if sent_ind > len(sentence_lengths):
+				sentence_lengths.append(0)
+			sentence_lengths[-1] += 1
+
+			if i in alias_indices:
+				continue
+
+			unigram_cnts[(lemma, pos[0])] += 1
+			if pos[0] == 'N':
+				noun_cntr[lemma] += 1
+
+		self.unigram_counter.add_characters(unigram_cnts, aliases)
+		self.nouns_extractor.filter(noun_cntr)
+
+		token_stats = {
+			'num_tokens': sum(sentence_lengths),
+			'num_sentences': len(sentence_lengths),
+			'sentence_lengths': sentence_lengths,
+			'pos_counts': dict(pos_cntr)
+		}
+
+		return unigram_cnts, noun_cntr, token_stats
+
+
+class TokenStatsManager(object):
+	"""
+	Manages the token statistics (sentence lengths and POS tag histogram) for
+	each story in the corpus.
+	"""
+
+	def __init__(self):
+		self.corpus_manager = CorpusManager()
+
+	def get_fpath(self, sid):
+		"""
+		Returns the filepath to the token statistics .json file for the given
+		story.
+		"""
+
+		if not self.corpus_manager.belongs(sid):
+			raise ValueError(sid +
+				" does not correspond to a story in the corpus.")
+
+		return os.path.join(self.corpus_manager.get_dirpath(sid),
+			'token_stats.json')
+
+	def saved(self, sid):
+		"""
+		Checks whether the token statistics .json for the given story has been
+		generated.
+		"""
+
+		return os.path.exists(self.get_fpath(sid))
+
+	def save(self, sid, token_stats):
+		"""
+		Saves the given token statistics as the token statistics .json file for
+		the given story (Overwrites it if it already exists).
+		"""
+
+		with open(self.get_fpath(sid), 'w') as f:
+			json.dump(token_stats, f, sort_keys=True, indent=4)
+
+	def get(self, sid):
+		"""
+		Retrieves the token statistics for the given story, represented as,
+
+		{
+			'num_tokens': [# tokens],
+			'num_sentences': [# sentences],
+			'sentence_lengths': [List of sentence lengths (in tokens), in
+				order],
+			'pos_counts': [Map from POS tag to # tokens]
+		}
+		"""
+
+		with open(self.get_fpath(sid)) as f:
+			return json.load(f)
+
+
+class ScanManager(object):
+	"""
+	Generates the unigram counts, nouns, and token statistics of each story from
+	a single scan of its CoreNLP .xml, saving each to its manager's location.
+	"""
+
+	def __init__(self, noun_policy=None):
+		"""
+		@param noun_policy - Noun vocabulary policy (Default is to keep all
+			nouns)
+		"""
+
+		self.aliases_manager = AliasesManager()
+		self.corpus_manager = CorpusManager()
+		self.nouns_manager = NounsManager(noun_policy)
+		self.token_stats_manager = TokenStatsManager()
+		self.unigrams_manager = UnigramsManager()
+
+		self.scanner = CoreNLPScanner(self.unigrams_manager.unigram_counter,
+			self.nouns_manager.extractor)
+
+	def saved(self, sid):
+		"""
+		Checks whether all the products of the scan have been generated for the
+		given story.
+		"""
+
+		return self.unigrams_manager.saved(sid) and \
+			self.nouns_manager.saved(sid) and \
+			self.token_stats_manager.saved(sid)
+
+	def gen(self, sid):
+		"""
+		Scans the given story, generating its unigram counts .tsv (also added
+		to the corpus unigram matrix), nouns .json, and token statistics .json
+		files (Overwrites them if they already exist).
+		"""
+
+		aliases = self.aliases_manager.get_aliases(sid, 'character')
+		unigram_cnts, noun_cntr, token_stats = self.scanner.scan(
+			self.corpus_manager.get_corenlp_fpath(sid), aliases)
+
+		self.unigrams_manager.save(sid, unigram_cnts)
+
+		extractor = self.nouns_manager.extractor
+		self.nouns_manager.save(sid, extractor.to_entities(
+			extractor.policy.select(noun_cntr)))
+
+		self.token_stats_manager.save(sid, token_stats)
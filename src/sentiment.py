@@ -0,0 +1,237 @@
+"""
+Precomputed SentiWordNet scores of the corpus collocate lemmas, stored as a
+table aligned to the corpus-level term vocabulary (memory-mapped on first use),
+and the polarity between characters computed from them.
+"""
+
+import numpy as np
+import os
+
+from corpus import STORE_DIRPATH
+from store import TERMS_VOCAB_FPATH, Vocabulary
+
+
+# Path prefix of the SentiWordNet score table (.npy) and its presence mask
+# (.present.npy).
+SENTIWORDNET_PREFIX = os.path.join(STORE_DIRPATH, 'sentiwordnet')
+
+# WordNet parts-of-speech of the table's slots (None for any part-of-speech).
+WN_POSES = [None, 'n', 'v', 'a', 'r']
+
+
+def get_wn_pos(tpe):
+	"""
+	Returns the WordNet part-of-speech of the collocates of the given dependency
+	type (See dependency.TYPES), or None if it isn't known.
+	"""
+
+	if tpe in ('acomp', 'amod') or tpe.endswith('-adj'):
+		return 'a'
+	elif tpe.endswith('-verb'):
+		return 'v'
+	elif tpe in ('appos', 'nmod:of', 'poss') or tpe.endswith('-noun') or \
+		tpe.endswith('subj') or tpe.endswith('subjpass') or \
+		tpe.endswith('-dobj') or tpe.endswith('-iobj'):
+		return 'n'
+
+	return None
+
+
+def to_unicode(term):
+	return term.decode('utf-8') if isinstance(term, str) else term
+
+
+def lookup_scores(lemma):
+	"""
+	Looks up the SentiWordNet scores of the first senti-synset of the given
+	lemma, for any part-of-speech and each of WN_POSES.
+
+	@param lemma - Lemma
+	@return Array of (positive score, negative score) pairs, one per
+		part-of-speech (NaN's where the lemma has no senti-synsets)
+	"""
+
+	# Loads SentiWordNet on first use.
+	from nltk.corpus import sentiwordnet as swn
+
+	scores = np.empty((len(WN_POSES), 2))
+	scores.fill(np.nan)
+
+	for i, pos in enumerate(WN_POSES):
+		try:
+			sentisyns = list(swn.senti_synsets(lemma, pos))
+		except UnicodeDecodeError:
+			continue
+
+		if len(sentisyns) > 0:
+			scores[i] = (sentisyns[0].pos_score(), sentisyns[0].neg_score())
+
+	return scores
+
+
+def build_sentiwordnet_table(lemmas, prefix=SENTIWORDNET_PREFIX, vocab=None):
+	"""
+	Writes the SentiWordNet score table (as read by SentiWordNetTable) for the
+	given lemmas, adding them to the vocabulary.
+
+	@param lemmas - Iterable of lemmas
+	@param prefix - Output path prefix (Default is SENTIWORDNET_PREFIX)
+	@param vocab - Vocabulary to align the rows to (Default is the
+		corpus-level term vocabulary)
+	@return # lemmas with senti-synsets
+	"""
+
+	vocab = Vocabulary(TERMS_VOCAB_FPATH) if vocab is None else vocab
+
+	lemmas = sorted(set(to_unicode(l) for l in lemmas))
+	ids = vocab.encode(lemmas, add=True)
+
+	scores = np.empty((len(vocab), len(WN_POSES), 2))
+	scores.fill(np.nan)
+	present = np.zeros(len(vocab), dtype=bool)
+	for lemma, i in zip(lemmas, ids):
+		scores[i] = lookup_scores(lemma)
+		present[i] = True
+
+	# Written under temporary names, so that readers never see a partial
+	# table.
+	for suffix, arr in (('.npy', scores), ('.present.npy', present)):
+		with open(prefix + suffix + '.tmp', 'wb') as f:
+			np.save(f, arr)
+		os.rename(prefix + suffix + '.tmp', prefix + suffix)
+
+	return int((~np.isnan(scores[present, 0, 0])).sum())
+
+
+class SentiWordNetTable(object):
+	"""
+	SentiWordNet scores of lemmas, read from the precomputed table (loaded
+	lazily from <prefix>.npy and <prefix>.present.npy). Lemmas outside the
+	table are looked up in SentiWordNet itself (and remembered).
+	"""
+
+	def __init__(self, prefix=SENTIWORDNET_PREFIX,
+		vocab_fpath=TERMS_VOCAB_FPATH):
+		"""
+		@param prefix - Path prefix of the table (Default is
+			SENTIWORDNET_PREFIX)
+		@param vocab_fpath - Path to the vocabulary the rows are aligned to
+			(Default is TERMS_VOCAB_FPATH)
+		"""
+
+		self.prefix = prefix
+		self.vocab_fpath = vocab_fpath
+
+		self.scores, self.present, self.vocab = None, None, None
+		# Scores of lemmas outside the table.
+		self.extra_scores = {}
+
+	def load(self, vocab=None):
+		"""
+		Loads the table (memory-mapped), unless it's already loaded.
+
+		@param vocab - Term vocabulary to share (See resources.py) (Default is
+			None, for loading it)
+		"""
+
+		if self.scores is not None:
+			return
+
+		if os.path.exists(self.prefix + '.npy'):
+			self.scores = np.load(self.prefix + '.npy', mmap_mode='r')
+			self.present = np.load(self.prefix + '.present.npy')
+		else:
+			self.scores = np.zeros((0, len(WN_POSES), 2))
+			self.present = np.zeros(0, dtype=bool)
+
+		self.vocab = Vocabulary(self.vocab_fpath) if vocab is None else vocab
+
+	def get_scores(self, lemma):
+		"""
+		Returns the (positive score, negative score) pairs of the first
+		senti-synset of the given lemma for any part-of-speech and each of
+		WN_POSES (NaN's where it has no senti-synsets).
+		"""
+
+		self.load()
+
+		i = self.vocab.get_id(to_unicode(lemma))
+		if 0 <= i < len(self.present) and self.present[i]:
+			return self.scores[i]
+
+		if lemma not in self.extra_scores:
+			self.extra_scores[lemma] = lookup_scores(lemma)
+
+		return self.extra_scores[lemma]
+
+	def get_sentiments(self, lemmas, poses=None):
+		"""
+		Returns the sentiment scores (positive minus negative score) of the
+		given lemmas.
+
+		@param lemmas - Iterable of lemmas
+		@param poses - Iterable of WordNet parts-of-speech, one per lemma (None
+			(default) for looking up any part-of-speech). Lemmas with no
+			senti-synsets for their part-of-speech fall back on any
+			part-of-speech.
+		@return Array of sentiment scores (NaN for lemmas with no
+			senti-synsets)
+		"""
+
+		lemmas = list(lemmas)
+		poses = [None] * len(lemmas) if poses is None else list(poses)
+
+		slots = {pos: i for i, pos in enumerate(WN_POSES)}
+
+		sentiments = np.empty(len(lemmas))
+		for j, (lemma, pos) in enumerate(zip(lemmas, poses)):
+			scores = self.get_scores(lemma)
+
+			pos_score, neg_score = scores[slots.get(pos, 0)]
+			if np.isnan(pos_score):
+				pos_score, neg_score = scores[0]
+
+			sentiments[j] = pos_score - neg_score
+
+		return sentiments
+
+
+def calc_polarity(ranks, sentiments, ranks1, ranks2):
+	"""
+	Calculates the polarity between two groups of characters as the largest
+	difference between the sentiment scores of a character in the first and a
+	character in the second, where the sentiment score of a character is that
+	of its last collocate with one.
+
+	@param ranks - Array of character ranks, one per collocate (in order)
+	@param sentiments - Array of sentiment scores, one per collocate (NaN for
+		collocates with none)
+	@param ranks1 - Iterable of ranks of the first group (Empty for all
+		ranks, as with CollocatesManager.get)
+	@param ranks2 - Iterable of ranks of the second group (Empty for all
+		ranks, e.g. for the remaining ranks of the Top-5 group)
+	@return Polarity (0.0 if either group has no sentiment scores)
+	"""
+
+	scored = ~np.isnan(sentiments)
+	ranks, sentiments = ranks[scored], sentiments[scored]
+
+	# Last sentiment score of each character.
+	char_ranks, inds = np.unique(ranks[::-1], return_index=True)
+	char_sentiments = sentiments[::-1][inds]
+
+	# Returns the sentiment scores of the characters of the given ranks.
+	def select(group_ranks):
+		group_ranks = list(group_ranks)
+		if not group_ranks:
+			return char_sentiments
+
+		return char_sentiments[np.in1d(char_ranks, group_ranks)]
+
+	sentiments1, sentiments2 = select(ranks1), select(ranks2)
+
+	if len(sentiments1) == 0 or len(sentiments2) == 0:
+		return 0.0
+
+	return float(max(0.0, sentiments1.max() - sentiments2.min(),
+		sentiments2.max() - sentiments1.min()))
@@ -0,0 +1,336 @@
+"""
+Corpus-level on-disk stores: append-only vocabularies mapping terms to integer
+Id's, and append-only sparse story x term count matrices. Both are safe to
+append to from several worker processes at once.
+"""
+
+import fcntl
+import numpy as np
+import os
+
+from contextlib import contextmanager
+from scipy.sparse import csr_matrix
+
+from corpus import STORE_DIRPATH
+
+
+# Path to the corpus-level term (lemma) vocabulary.
+TERMS_VOCAB_FPATH = os.path.join(STORE_DIRPATH, 'terms.vocab')
+
+
+@contextmanager
+def locked(fpath):
+	"""
+	Holds an exclusive (advisory) lock on the given lock file for the duration
+	of the block.
+
+	@param fpath - Path to lock file (Created if it doesn't exist)
+	"""
+
+	dirpath = os.path.dirname(fpath)
+	if dirpath and not os.path.exists(dirpath):
+		try:
+			os.makedirs(dirpath)
+		except OSError:
+			# Created by another process in the meantime.
+			pass
+
+	with open(fpath, 'a') as f:
+		fcntl.flock(f, fcntl.LOCK_EX)
+		try:
+			yield
+		finally:
+			fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class Vocabulary(object):
+	"""
+	Append-only mapping between terms (strings) and integer Id's. Id's are
+	assigned in order of first appearance and never change, so arrays indexed
+	by term Id stay valid as the vocabulary grows. If a filepath is given, the
+	vocabulary is backed by a text file with one term per line (the line
+	number being the term Id), otherwise it only lives in memory.
+	"""
+
+	def __init__(self, fpath=None):
+		"""
+		@param fpath - Path to the vocabulary file (None (default) for an
+			in-memory vocabulary)
+		"""
+
+		self.fpath = fpath
+		self.terms = []
+		self.ids = {}
+		# Number of bytes of the vocabulary file read so far.
+		self.offset = 0
+
+		self.refresh()
+
+	def __len__(self):
+		return len(self.terms)
+
+	def __contains__(self, term):
+		return term in self.ids
+
+	def refresh(self):
+		"""
+		Reads any terms appended to the vocabulary file (by this or any other
+		process) since the last read.
+		"""
+
+		if self.fpath is None or not os.path.exists(self.fpath):
+			return
+
+		with open(self.fpath, 'rb') as f:
+			f.seek(self.offset)
+
+			for line in f:
+				# Ignore a partially written last line.
+				if not line.endswith('\n'):
+					break
+
+				self.offset += len(line)
+				self._push(line[:-1].decode('utf-8'))
+
+	def _push(self, term):
+		self.ids[term] = len(self.terms)
+		self.terms.append(term)
+
+	def get_id(self, term, default=-1):
+		"""
+		Returns the Id of the given term (default if it isn't in the
+		vocabulary).
+		"""
+
+		return self.ids.get(term, default)
+
+	def get_term(self, i):
+		"""
+		Returns the term with the given Id.
+		"""
+
+		return self.terms[i]
+
+	def add(self, terms):
+		"""
+		Adds the given terms to the vocabulary (Terms already in it are left
+		as is).
+
+		@param terms - Iterable of terms
+		@return Number of terms added
+		"""
+
+		terms = [t for t in terms if t not in self.ids]
+		if not terms:
+			return 0
+
+		if self.fpath is None:
+			for term in terms:
+				if term not in self.ids:
+					self._push(term)
+
+			return len(terms)
+
+		with locked(self.fpath + '.lock'):
+			# Pick up terms added by other processes first, so that no term is
+			# assigned two Id's.
+			self.refresh()
+
+			new_terms = []
+			for term in terms:
+				if term not in self.ids:
+					self._push(term)
+					new_terms.append(term)
+
+			if new_terms:
+				with open(self.fpath, 'ab') as f:
+					for term in new_terms:
+						line = term.encode('utf-8') + '\n'
+						f.write(line)
+						self.offset += len(line)
+
+			return len(new_terms)
+
+	def encode(self, terms, add=False):
+		"""
+		Encodes the given terms as an array of Id's.
+
+		@param terms - List of terms
+		@param add - If True, then unseen terms are added to the vocabulary,
+			otherwise they are encoded as -1 (Default is False)
+		@return Integer array of term Id's
+		"""
+
+		if add:
+			self.add(set(terms))
+
+		return np.array([self.ids.get(t, -1) for t in terms], dtype=np.int64)
+
+	def decode(self, ids):
+		"""
+		Decodes the given term Id's.
+
+		@param ids - Iterable of term Id's
+		@return List of terms
+		"""
+
+		return [self.terms[i] for i in ids]
+
+
+class SparseRowStore(object):
+	"""
+	Append-only, on-disk sparse matrix of counts with one row per story (and
+	one column per term Id of some vocabulary). A row is stored as its term
+	Id's and counts, appended to a pair of binary files, and located through a
+	row index .tsv with the story Id, offset, and # of entries. Re-appending a
+	story supersedes its previous row.
+	"""
+
+	def __init__(self, name, dirpath=None):
+		"""
+		@param name - Name of the store (Used as the filename prefix)
+		@param dirpath - Directory holding the store files (Default is the
+			corpus store directory)
+		"""
+
+		dirpath = STORE_DIRPATH if dirpath is None else dirpath
+		prefix = os.path.join(dirpath, name)
+
+		self.index_fpath = prefix + '.rows.tsv'
+		self.ids_fpath = prefix + '.ids.bin'
+		self.cnts_fpath = prefix + '.counts.bin'
+		self.lock_fpath = prefix + '.lock'
+
+		# Map from story Id to (offset, # entries) of its row.
+		self.rows = {}
+		# Story Id's in order of (latest) appending.
+		self.sids = []
+		self.index_offset = 0
+
+		self.refresh()
+
+	def refresh(self):
+		"""
+		Reads any rows appended (by this or any other process) since the last
+		read.
+		"""
+
+		if not os.path.exists(self.index_fpath):
+			return
+
+		with open(self.index_fpath, 'rb') as f:
+			f.seek(self.index_offset)
+
+			for line in f:
+				if not line.endswith('\n'):
+					break
+
+				self.index_offset += len(line)
+
+				sid, offset, size = line[:-1].split('\t')
+				sid = sid.decode('utf-8')
+				if sid in self.rows:
+					self.sids.remove(sid)
+
+				self.rows[sid] = (int(offset), int(size))
+				self.sids.append(sid)
+
+	def has(self, sid):
+		"""
+		Checks whether a row has been stored for the given story.
+		"""
+
+		return sid in self.rows
+
+	def append(self, sid, ids, cnts):
+		"""
+		Appends the row for the given story.
+
+		@param sid - Story Id of story
+		@param ids - Array of term Id's
+		@param cnts - Array of counts (aligned with ids)
+		"""
+
+		order = np.argsort(ids)
+		ids = np.asarray(ids, dtype=np.int32)[order]
+		cnts = np.asarray(cnts, dtype=np.int32)[order]
+
+		with locked(self.lock_fpath):
+			self.refresh()
+
+			offset = (os.path.getsize(self.ids_fpath) //
+				np.dtype(np.int32).itemsize
+				if os.path.exists(self.ids_fpath) else 0)
+
+			with open(self.ids_fpath, 'ab') as f:
+				ids.tofile(f)
+			with open(self.cnts_fpath, 'ab') as f:
+				cnts.tofile(f)
+
+			# The index entry is written last, so a row only becomes visible
+			# once its data is complete.
+			with open(self.index_fpath, 'ab') as f:
+				f.write('%s\t%d\t%d\n' % (sid.encode('utf-8'), offset,
+					len(ids)))
+
+			self.refresh()
+
+	def _memmap(self, fpath):
+		if not os.path.exists(fpath) or os.path.getsize(fpath) == 0:
+			return np.zeros(0, dtype=np.int32)
+
+		return np.memmap(fpath, dtype=np.int32, mode='r')
+
+	def get_row(self, sid):
+		"""
+		Returns the stored row for the given story.
+
+		@param sid - Story Id of story
+		@return Pair of arrays, term Id's (sorted) and counts
+		"""
+
+		offset, size = self.rows[sid]
+
+		ids = self._memmap(self.ids_fpath)[offset:offset + size]
+		cnts = self._memmap(self.cnts_fpath)[offset:offset + size]
+
+		return np.array(ids), np.array(cnts)
+
+	def get_matrix(self, sids=None, num_cols=None):
+		"""
+		Returns the story x term count matrix.
+
+		@param sids - List of story Id's, giving the rows (in order) of the
+			matrix (If None (default), all stored stories in order of
+			appending). Stories without a stored row are given an empty row.
+		@param num_cols - # columns (Default is 1 + the largest stored term Id)
+		@return Count matrix (in CSR format)
+		"""
+
+		sids = list(self.sids) if sids is None else sids
+
+		all_ids = self._memmap(self.ids_fpath)
+		all_cnts = self._memmap(self.cnts_fpath)
+
+		indptr = np.zeros(len(sids) + 1, dtype=np.int64)
+		spans = []
+		for i, sid in enumerate(sids):
+			offset, size = self.rows.get(sid, (0, 0))
+			spans.append((offset, size))
+			indptr[i + 1] = indptr[i] + size
+
+		# Gather the row slices (Rows superseded by re-appending are skipped).
+		if spans:
+			sel = np.concatenate([np.arange(o, o + n, dtype=np.int64)
+				for o, n in spans])
+		else:
+			sel = np.zeros(0, dtype=np.int64)
+
+		indices = np.asarray(all_ids[sel], dtype=np.int32)
+		data = np.asarray(all_cnts[sel], dtype=np.int64)
+
+		if num_cols is None:
+			num_cols = int(indices.max()) + 1 if len(indices) > 0 else 0
+
+		return csr_matrix((data, indices, indptr), shape=(len(sids),
+			num_cols))
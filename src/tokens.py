@@ -0,0 +1,49 @@
+"""
+Streams the tokens of CoreNLP .xml files without building the whole document
+tree in memory.
+"""
+
+import xml.etree.ElementTree as ET
+
+
+def iter_tokens(corenlp_fpath):
+	"""
+	Iterates over the tokens of the CoreNLP .xml file located by the given
+	path, in document order. Elements are discarded as soon as they have been
+	read, so memory use doesn't grow with the size of the document.
+
+	@param corenlp_fpath - Path to CoreNLP .xml file
+	@return Generator of tokens, with each token represented as the tuple,
+
+		(<global token index>, <sentence index>, <token index within
+			sentence>, <token element>)
+
+		where indices are 0-based, 1-based, and 1-based, respectively (matching
+		AliasIdentifier.ident), and the token element is only valid until the
+		next token is yielded.
+	"""
+
+	global_tok_ind, sent_ind, tok_ind = -1, 0, 0
+	# Sentences containing token elements (Coreference mentions don't).
+	in_tokens = False
+
+	for event, elem in ET.iterparse(corenlp_fpath, events=('start', 'end')):
+		if event == 'start':
+			if elem.tag == 'tokens':
+				in_tokens = True
+				sent_ind += 1
+				tok_ind = 0
+
+			continue
+
+		if elem.tag == 'token' and in_tokens:
+			global_tok_ind += 1
+			tok_ind += 1
+
+			yield global_tok_ind, sent_ind, tok_ind, elem
+
+			elem.clear()
+		elif elem.tag == 'tokens':
+			in_tokens = False
+		elif elem.tag == 'sentence':
+			elem.clear()
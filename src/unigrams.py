@@ -1,11 +1,13 @@
 import json
 import csv
+import numpy as np
 import os
-import xml.etree.ElementTree as ET
 
 from collections import Counter, defaultdict
 
-from corpus import CorpusManager
+from corpus import CorpusManager, STORE_DIRPATH
+from store import SparseRowStore, Vocabulary
+from tokens import iter_tokens
 
 
 class UnigramCounter(object):
@@ -29,7 +31,7 @@ class UnigramCounter(object):
 
 	    character_map = defaultdict(dict)
 	    for a in aliases:
-	        character_map[a['character']][a['span']] = a['count']
+	        character_map[a['entity']['name']][a['span']] = a['count']
 
 	    character_counter = Counter()
 	    for c, a_map in character_map.iteritems():
@@ -43,22 +45,31 @@ class UnigramCounter(object):
 	    identified aliases.
 	    """
 
-	    return {a['character']: a['character_rank'] for a in aliases}
+	    return {a['entity']['name']: a['entity']['rank'] for a in aliases}
 
 	def count(self, corenlp_fpath, aliases):
 		"""
 		Returns a unigram counter from the CoreNLP XML retrieved from the given
 		filepath, replacing character aliases with ALIAS-n (for the nth ranked
-		character).
+		character). The .xml is streamed rather than parsed in full.
 		"""
 
 		alias_indices = self.get_indices(aliases)
-		corenlp_xml = ET.parse(corenlp_fpath).getroot()
 
-		unigram_cnts = Counter([(t[1].text, t[4].text[0])
-		                            for i, t
-		                            in enumerate(corenlp_xml.iter('token'))
-		                            if i not in alias_indices])
+		unigram_cnts = Counter()
+		for i, _, _, t in iter_tokens(corenlp_fpath):
+			if i not in alias_indices:
+				unigram_cnts[(t[1].text, t[4].text[0])] += 1
+
+		return self.add_characters(unigram_cnts, aliases)
+
+	def add_characters(self, unigram_cnts, aliases):
+		"""
+		Adds the character counts (as ALIAS-n, for the nth ranked character)
+		from the given list of identified aliases to the unigram counter.
+
+		@return The unigram counter
+		"""
 
 		character_cnts = self.get_character_cnts(aliases)
 		character_ranks = self.get_character_ranks(aliases)
@@ -84,13 +95,36 @@ class UnigramCounter(object):
 class UnigramsManager(object):
 	"""
 	Manages the unigrams for each story in the corpus, as well as the whole
-	corpus.
+	corpus. Besides the per-story .tsv files, the counts of all stories are
+	kept in a corpus-level sparse story x unigram matrix (with unigrams coded
+	as integer Id's of a shared vocabulary), from which corpus-wide statistics
+	are read.
 	"""
 
 	def __init__(self):
 		self.corpus_manager = CorpusManager()
 		self.unigram_counter = UnigramCounter()
 
+		# Shared unigram vocabulary and story x unigram count matrix.
+		self.vocab = Vocabulary(os.path.join(STORE_DIRPATH, 'unigrams.vocab'))
+		self.store = SparseRowStore('unigrams')
+
+	@staticmethod
+	def to_term(unigram):
+		"""
+		Returns the vocabulary term for the given (lemma, POS) unigram.
+		"""
+
+		return u'\t'.join(unigram)
+
+	@staticmethod
+	def from_term(term):
+		"""
+		Returns the (lemma, POS) unigram for the given vocabulary term.
+		"""
+
+		return tuple(term.split(u'\t', 1))
+
 	def get_fpath(self, sid):
 		"""
 		Returns the filepath to the unigram counts for the given story.
@@ -114,9 +148,19 @@ class UnigramsManager(object):
 
 		return os.path.exists(self.get_fpath(sid))
 
+	def stored(self, sid):
+		"""
+		Checks whether the unigram counts for the given story have been added
+		to the corpus unigram matrix.
+		"""
+
+		self.store.refresh()
+		return self.store.has(sid)
+
 	def gen(self, sid):
 		"""
-		Generates the unigram counts .tsv file for the given story. 
+		Generates the unigram counts .tsv file for the given story, and adds
+		the counts to the corpus unigram matrix.
 		"""
 
 		# Returns the character aliases for the given story from the stored
@@ -136,6 +180,18 @@ class UnigramsManager(object):
 			with open(fpath) as f:
 				return json.load(f)
 
+		corenlp_fpath = self.corpus_manager.get_corenlp_fpath(sid)
+		aliases = get_character_aliases(sid)
+		unigram_cnts = self.unigram_counter.count(corenlp_fpath, aliases)
+
+		self.save(sid, unigram_cnts)
+
+	def save(self, sid, unigram_cnts):
+		"""
+		Saves the given unigram counts as the unigram counts .tsv file for the
+		given story, and adds them to the corpus unigram matrix.
+		"""
+
 		fpath = self.get_fpath(sid)
 		
 		# Create the parent directory if it doesn't already exist.
@@ -143,15 +199,36 @@ class UnigramsManager(object):
 		if not os.path.exists(dirpath):
 			os.makedirs(dirpath)
 
-		corenlp_fpath = self.corpus_manager.get_corenlp_fpath(sid)
-		aliases = get_character_aliases(sid)
-		unigram_cnts = self.unigram_counter.count(corenlp_fpath, aliases)
 		self.unigram_counter.save(unigram_cnts, fpath)
+		self.add(sid, unigram_cnts)
 
-	def get(self, sid):
+	def add(self, sid, unigram_cnts):
+		"""
+		Adds (or replaces) the given story's unigram counts in the corpus
+		unigram matrix.
+
+		@param sid - Story Id of story
+		@param unigram_cnts - Counter of (lemma, POS) unigrams
+		"""
+
+		terms = [self.to_term(u) for u in unigram_cnts]
+		ids = self.vocab.encode(terms, add=True)
+		cnts = [unigram_cnts[u] for u in unigram_cnts]
+
+		self.store.append(sid, ids, cnts)
+
+	def index(self, sid):
 		"""
-		Returns the unigram counts (as a Counter) for the given story (as stored
-		in the story's unigram counts .tsv file).
+		Adds the counts in the given story's (existing) unigram counts .tsv
+		file to the corpus unigram matrix, without recounting.
+		"""
+
+		self.add(sid, self.read(sid))
+
+	def read(self, sid):
+		"""
+		Returns the unigram counts (as a Counter) for the given story, as stored
+		in the story's unigram counts .tsv file.
 		"""
 
 		unigram_cntr = Counter()
@@ -159,23 +236,95 @@ class UnigramsManager(object):
 			reader = csv.reader(f, delimiter='\t', quotechar='"')
 
 			for row in reader:
-				unigram_cntr[(row[0], row[1])] = int(row[2])
+				unigram_cntr[(row[0].decode('utf-8'),
+					row[1].decode('utf-8'))] = int(row[2])
 
 			return unigram_cntr
 
+	def get(self, sid):
+		"""
+		Returns the unigram counts (as a Counter) for the given story (looked
+		up in the corpus unigram matrix, or else read from the story's unigram
+		counts .tsv file).
+		"""
+
+		if not self.stored(sid):
+			return self.read(sid)
+
+		ids, cnts = self.store.get_row(sid)
+		return Counter({self.from_term(self.vocab.get_term(i)): int(c)
+			for i, c in zip(ids, cnts)})
+
+	def get_matrix(self, sids=None):
+		"""
+		Returns the story x unigram count matrix.
+
+		@param sids - List of story Id's, giving the rows of the matrix (If
+			None (default), all stories in the corpus unigram matrix)
+		@return Count matrix (in CSR format), with columns indexed by unigram
+			Id (see UnigramsManager.get_id), and the list of story Id's (in
+			row order) as a pair
+		"""
+
+		self.store.refresh()
+		self.vocab.refresh()
+
+		sids = list(self.store.sids) if sids is None else sids
+
+		return self.store.get_matrix(sids, num_cols=len(self.vocab)), sids
+
+	def get_id(self, unigram):
+		"""
+		Returns the Id (i.e. matrix column) of the given (lemma, POS) unigram
+		(-1 if it has never been counted).
+		"""
+
+		return self.vocab.get_id(self.to_term(unigram))
+
+	def get_unigram(self, i):
+		"""
+		Returns the (lemma, POS) unigram with the given Id.
+		"""
+
+		return self.from_term(self.vocab.get_term(i))
+
+	def _to_counter(self, vec):
+		nz = np.flatnonzero(vec)
+		return Counter({self.get_unigram(i): int(vec[i]) for i in nz})
+
+	def _get_corpus_matrix(self):
+		"""
+		Returns the story x unigram count matrix of every story in the corpus
+		with saved unigram counts, first adding any saved .tsv files that
+		aren't yet in the corpus unigram matrix (See index).
+		"""
+
+		sids = [sid for sid in self.corpus_manager.get_ids(origin='gen')
+			if self.saved(sid)]
+
+		self.store.refresh()
+		for sid in sids:
+			if not self.store.has(sid):
+				self.index(sid)
+
+		return self.get_matrix(sids)[0]
+
 	def get_doc_counts(self):
 		"""
 		Returns a Counter of the document frequency of each unigram across the
 		entire corpus.
 		"""
 
-		doc_cntr = Counter()
+		mat = self._get_corpus_matrix()
+
+		return self._to_counter(np.asarray((mat > 0).sum(axis=0)).ravel())
 
-		for sid in self.corpus_manager.get_ids(origin='gen'):
-			if not self.saved(sid):
-				continue
+	def get_corpus_counts(self):
+		"""
+		Returns a Counter of the total count of each unigram across the entire
+		corpus.
+		"""
 
-			for unigram in self.get(sid):
-				doc_cntr[unigram] += 1
+		mat = self._get_corpus_matrix()
 
-		return doc_cntr
+		return self._to_counter(np.asarray(mat.sum(axis=0)).ravel())
@@ -0,0 +1,152 @@
+"""
+Checks the map-reduce harness of the calc_* scripts (calcmap.StoryMapReducer),
+in particular that each row is written under the story it was calculated for,
+with one worker process or several, and with or without prefetching.
+
+Run from this directory (The corpus module reads ../datapath.txt):
+
+	python -m unittest test_calcmap
+"""
+
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+	'..', 'src'))
+
+from calcmap import StoryMapReducer
+
+
+# Parameter combinations, and the header row of their .tsv files.
+KEYS = [('All', None), ('Top', 'AGENT')]
+HEADER = ['STORY ID', 'VALUE']
+
+# Stories, along with those without any artifacts to calculate from, and those
+# that aren't calculated for the second combination.
+SIDS = ['s%d' % i for i in range(10)]
+EMPTY_SIDS = ['s3']
+PARTIAL_SIDS = ['s6', 's7']
+
+
+# Loader of the artifacts of a story (None for stories without any).
+def load(sid):
+	return None if sid in EMPTY_SIDS else int(sid[1:]) * 10
+
+
+# Loader failing on story s2 (e.g. with StopIteration, as next(reader) does on
+# an empty .tsv file).
+def load_failing(sid):
+	if sid == 's2':
+		raise StopIteration
+
+	return load(sid)
+
+
+# Worker function, calculating the values of a story from its artifacts.
+def calc(sid, data):
+	if data is None:
+		return None
+
+	vals = {KEYS[0]: [data]}
+	if sid not in PARTIAL_SIDS:
+		vals[KEYS[1]] = [data + 1]
+
+	return vals
+
+
+# Worker function, calculating the values of a story without prefetching.
+def calc_unloaded(sid):
+	return calc(sid, load(sid))
+
+
+class DroppingStoryMapReducer(StoryMapReducer):
+	"""
+	Map-reducer losing the result of story s2 (as a failing worker could).
+	"""
+
+	def map(self, func, sids, load=None):
+		for sid, vals in super(DroppingStoryMapReducer, self).map(func, sids,
+			load):
+			if sid != 's2':
+				yield sid, vals
+
+
+class StoryMapReducerTest(unittest.TestCase):
+
+	def setUp(self):
+		self.out_dirpath = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.out_dirpath)
+
+	def read_rows(self, map_reducer, key):
+		"""
+		Returns the rows of the .tsv file of the given combination.
+		"""
+
+		with open(map_reducer.get_out_path(key), 'rb') as f:
+			return list(csv.reader(f, delimiter='\t', quotechar='"'))
+
+	def assertRowsAligned(self, map_reducer):
+		"""
+		Asserts that the .tsv file of each combination has a row for each of
+		its stories, with the values calculated for that story, in order.
+		"""
+
+		sids = [sid for sid in SIDS if sid not in EMPTY_SIDS]
+		self.assertEqual(self.read_rows(map_reducer, KEYS[0]), [HEADER] +
+			[[sid, str(load(sid))] for sid in sids])
+		self.assertEqual(self.read_rows(map_reducer, KEYS[1]), [HEADER] +
+			[[sid, str(load(sid) + 1)] for sid in sids
+				if sid not in PARTIAL_SIDS])
+
+	def test_alignment(self):
+		for n in [1, 2, 3]:
+			for depth in [1, 4]:
+				map_reducer = StoryMapReducer(os.path.join(self.out_dirpath,
+					'%d-%d' % (n, depth)), KEYS, HEADER, n=n, depth=depth)
+
+				self.assertEqual(map_reducer.run(calc, SIDS, load=load),
+					len(SIDS) - len(EMPTY_SIDS))
+				self.assertRowsAligned(map_reducer)
+
+	def test_alignment_without_prefetching(self):
+		for n in [1, 2]:
+			map_reducer = StoryMapReducer(os.path.join(self.out_dirpath,
+				str(n)), KEYS, HEADER, n=n, chunk_size=3)
+
+			map_reducer.run(calc_unloaded, SIDS)
+			self.assertRowsAligned(map_reducer)
+
+	def test_failing_loader(self):
+		for n in [1, 2]:
+			map_reducer = StoryMapReducer(os.path.join(self.out_dirpath,
+				str(n)), KEYS, HEADER, n=n, depth=1)
+
+			with self.assertRaises(RuntimeError):
+				map_reducer.run(calc, SIDS, load=load_failing)
+
+			# The outputs are left to be resumed, rather than finalized.
+			for key in KEYS:
+				self.assertFalse(os.path.exists(map_reducer.get_out_path(key)))
+
+			map_reducer.run(calc, SIDS, load=load)
+			self.assertRowsAligned(map_reducer)
+
+	def test_lost_result(self):
+		for n in [1, 2]:
+			map_reducer = DroppingStoryMapReducer(os.path.join(
+				self.out_dirpath, str(n)), KEYS, HEADER, n=n)
+
+			with self.assertRaises(RuntimeError):
+				map_reducer.run(calc, SIDS, load=load)
+
+			for key in KEYS:
+				self.assertFalse(os.path.exists(map_reducer.get_out_path(key)))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,166 @@
+"""
+Checks the skew- and kurtosis-based distinctiveness calculated from count-of-
+counts histograms (Probability.hist_skew and Probability.hist_kurtosis, and
+MomentsDistinctivenessCalculator) against scipy.stats.skew and
+scipy.stats.kurtosis on the probability distrubtions themselves.
+
+Run from this directory (The corpus module reads ../datapath.txt):
+
+	python -m unittest test_moments
+"""
+
+import math
+import os
+import random
+import sys
+import unittest
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+	'..', 'src'))
+
+from scipy import stats
+
+from distinctiveness import MomentsDistinctivenessCalculator, Probability
+from ranks import RANK_GROUPS
+from role import map_role, ROLES
+
+
+# Dependency relation types covering every role (and none).
+RELS = ['amod', 'nsubj-verb', 'dobj-verb', 'poss', 'dep']
+
+# Character alias lemmas (squashed into a single word type).
+CHAR_LEMMAS = ['CHAR-1', 'CHAR-2', 'CHAR-3']
+
+
+def make_collocate(lemma, rel, rank):
+	"""
+	Returns a collocate (in the form of CollocatesManager.get) with the given
+	lemma and dependency relation type, of a character of the given rank.
+	"""
+
+	return {
+		'type': rel,
+		'token': {'lemma': lemma},
+		'alias': {'entity': {'rank': rank}}
+	}
+
+
+def gen_collocates(rand, num_collocates):
+	"""
+	Generates random collocates over a vocabulary of random size, with Zipfian
+	lemma frequencies.
+	"""
+
+	lemmas = ['w%d' % i for i in range(rand.randint(1, 100))] + CHAR_LEMMAS
+	weights = [1. / (i + 1) for i in range(len(lemmas))]
+
+	collocates = []
+	for _ in range(num_collocates):
+		r, lemma = rand.uniform(0, sum(weights)), lemmas[-1]
+		for l, w in zip(lemmas, weights):
+			r -= w
+			if r <= 0:
+				lemma = l
+				break
+
+		collocates.append(make_collocate(lemma, rand.choice(RELS),
+			rand.randint(1, 25)))
+
+	return collocates
+
+
+def select(collocates, ranks, role):
+	"""
+	Returns the given collocates of characters of the given ranks and with the
+	given role (None for any).
+	"""
+
+	return [coll for coll in collocates
+		if coll['alias']['entity']['rank'] in ranks and
+			(role is None or map_role(coll['type']) == role)]
+
+
+class MomentsTest(unittest.TestCase):
+
+	def assertMomentsEqual(self, skew, kurtosis, collocates):
+		"""
+		Asserts that the given skew and kurtosis are those of the probability
+		distrubtion of the given collocates, as calculated by scipy.
+		"""
+
+		vals = Probability.gen_dist(collocates).values()
+
+		# Equal probabilities (e.g. 1/3) leave scipy a variance of rounding
+		# error rather than 0, so it's given the (scale-free) counts instead.
+		hist = Probability.count_hist(collocates)
+		if len(hist[0]) == 1:
+			vals = [float(hist[0][0])] * hist[1][0]
+
+		for val, ref in [(skew, stats.skew(vals)),
+			(kurtosis, stats.kurtosis(vals))]:
+			if math.isnan(ref):
+				self.assertTrue(math.isnan(val))
+			else:
+				self.assertAlmostEqual(val, ref, delta=1e-9 * max(1, abs(ref)))
+
+	def test_hist(self):
+		rand = random.Random(0)
+
+		for _ in range(50):
+			collocates = gen_collocates(rand, rand.randint(1, 500))
+			hist = Probability.count_hist(collocates)
+
+			self.assertMomentsEqual(Probability.hist_skew(hist),
+				Probability.hist_kurtosis(hist), collocates)
+
+	def test_rank_groups_and_roles(self):
+		rand = random.Random(1)
+		calculator = MomentsDistinctivenessCalculator()
+
+		for _ in range(20):
+			collocates = gen_collocates(rand, rand.randint(0, 500))
+			moments = calculator.calc(collocates=collocates)
+
+			self.assertEqual(len(moments), len(RANK_GROUPS) * (len(ROLES) + 1))
+			for rg_name, ranks in RANK_GROUPS:
+				for role in [None] + ROLES:
+					skew, kurtosis = moments[(rg_name, role)]
+					self.assertMomentsEqual(skew, kurtosis,
+						select(collocates, ranks, role))
+
+	def test_single_distinct_count(self):
+		# Every lemma (and the characters, squashed) occurs twice, so all
+		# probabilities are equal (and exact).
+		collocates = [make_collocate(lemma, 'amod', 1)
+			for lemma in ['a', 'a', 'b', 'b', 'c', 'c', 'CHAR-1', 'CHAR-2']]
+
+		hist = Probability.count_hist(collocates)
+		self.assertEqual(len(hist[0]), 1)
+
+		self.assertMomentsEqual(Probability.hist_skew(hist),
+			Probability.hist_kurtosis(hist), collocates)
+
+		moments = MomentsDistinctivenessCalculator().calc(collocates=collocates)
+		self.assertMomentsEqual(*moments[('Top', None)] + (collocates,))
+
+	def test_single_collocate(self):
+		collocates = [make_collocate('a', 'nsubj-verb', 3)]
+
+		moments = MomentsDistinctivenessCalculator().calc(collocates=collocates)
+		for rg_name, ranks in RANK_GROUPS:
+			for role in [None] + ROLES:
+				skew, kurtosis = moments[(rg_name, role)]
+				self.assertMomentsEqual(skew, kurtosis,
+					select(collocates, ranks, role))
+
+	def test_empty_story(self):
+		hist = Probability.count_hist([])
+		self.assertMomentsEqual(Probability.hist_skew(hist),
+			Probability.hist_kurtosis(hist), [])
+
+		moments = MomentsDistinctivenessCalculator().calc(collocates=[])
+		for skew, kurtosis in moments.itervalues():
+			self.assertMomentsEqual(skew, kurtosis, [])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,104 @@
+"""
+Checks the prefetching of story artifacts (prefetch.prefetch and
+prefetch.prefetch_collocates), in particular that a failing loader can't cut
+the iteration short.
+
+Run from this directory:
+
+	python -m unittest test_prefetch
+"""
+
+import os
+import sys
+import unittest
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+	'..', 'src'))
+
+from prefetch import prefetch, prefetch_collocates
+
+
+def load(sid):
+	"""
+	Returns the artifacts of the given (integer) story Id.
+	"""
+
+	return sid * 10
+
+
+class FailingLoader(object):
+	"""
+	Loader raising the given error for the given story (e.g. StopIteration, as
+	next(reader) does on an empty .tsv file).
+	"""
+
+	def __init__(self, failing_sid, error):
+		self.failing_sid, self.error = failing_sid, error
+
+	def __call__(self, sid):
+		if sid == self.failing_sid:
+			raise self.error
+
+		return load(sid)
+
+
+class FakeCollocatesManager(object):
+	"""
+	Collocates manager whose stories' collocates are given, with the errors
+	raised on reading malformed collocates .tsv files for some of them.
+	"""
+
+	def __init__(self, collocates, errors):
+		self.collocates, self.errors = collocates, errors
+
+	def saved(self, sid, tpe):
+		return sid in self.collocates or sid in self.errors
+
+	def get(self, sid, tpe, role=None, ranks=None):
+		if sid in self.errors:
+			raise self.errors[sid]
+
+		return self.collocates[sid]
+
+	def get_arrays(self, sid, tpe):
+		return self.get(sid, tpe)
+
+
+class PrefetchTest(unittest.TestCase):
+
+	def test_order(self):
+		sids = range(10)
+
+		for depth in [0, 1, 2, 4, 20]:
+			self.assertEqual(list(prefetch(load, sids, depth)),
+				[(sid, sid * 10) for sid in sids])
+
+		self.assertEqual(list(prefetch(load, [])), [])
+
+	def test_failing_loader(self):
+		for failing_sid, error in [(2, StopIteration()), (4, KeyError(4))]:
+			sids = range(failing_sid + 4)
+
+			for depth in [1, 4]:
+				loaded = []
+				with self.assertRaises(RuntimeError):
+					for sid, data in prefetch(FailingLoader(failing_sid, error),
+						sids, depth):
+						loaded.append((sid, data))
+
+				# The stories before the failing one are still loaded.
+				self.assertEqual(loaded, [(sid, sid * 10)
+					for sid in range(failing_sid)])
+
+	def test_unreadable_collocates(self):
+		collocates_manager = FakeCollocatesManager({'s0': [0], 's3': [3],
+			's5': [5]}, {'s1': StopIteration(), 's2': IndexError()})
+
+		for arrays in [False, True]:
+			self.assertEqual(list(prefetch_collocates(collocates_manager,
+				['s0', 's1', 's2', 's3', 's4', 's5'], 'character',
+				arrays=arrays)), [('s0', [0]), ('s1', None), ('s2', None),
+				('s3', [3]), ('s4', None), ('s5', [5])])
+
+
+if __name__ == '__main__':
+	unittest.main()
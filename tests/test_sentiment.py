@@ -0,0 +1,94 @@
+"""
+Checks the polarity between groups of characters (sentiment.calc_polarity)
+against the pairwise comparison of the characters' sentiment scores that it
+replaced, including the Top-5 group, which is compared against all characters.
+
+Run from this directory (The corpus module reads ../datapath.txt):
+
+	python -m unittest test_sentiment
+"""
+
+import os
+import random
+import sys
+import unittest
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+	'..', 'src'))
+
+import numpy as np
+
+from ranks import RANK_GROUPS
+from sentiment import calc_polarity
+
+
+def get_other_ranks(ranks):
+	"""
+	Returns the remaining ranks in the top 5 grouping (as in calc_polarity.py).
+	"""
+
+	return [r for r in range(1, 6) if r not in ranks]
+
+
+def calc_pairwise_polarity(ranks, sentiments, ranks1, ranks2):
+	"""
+	Returns the largest absolute difference between the last sentiment scores of
+	a character of the first group and a character of the second (with empty
+	groups for all ranks, as with CollocatesManager.get).
+	"""
+
+	def get_sentiment_dict(group_ranks):
+		char_sentiments = {}
+		for rank, sentiment in zip(ranks, sentiments):
+			if np.isnan(sentiment):
+				continue
+
+			if not group_ranks or rank in group_ranks:
+				char_sentiments[rank] = sentiment
+
+		return char_sentiments
+
+	polarity = 0.0
+	for sentiment1 in get_sentiment_dict(ranks1).itervalues():
+		for sentiment2 in get_sentiment_dict(ranks2).itervalues():
+			polarity = max(polarity, abs(sentiment1 - sentiment2))
+
+	return polarity
+
+
+class PolarityTest(unittest.TestCase):
+
+	def test_top_5(self):
+		ranks, sentiments = np.array([1, 2, 7]), np.array([.5, -.5, .2])
+
+		self.assertAlmostEqual(calc_polarity(ranks, sentiments, range(1, 6),
+			get_other_ranks(range(1, 6))), 1.0)
+
+	def test_empty_groups(self):
+		ranks, sentiments = np.array([3, 8]), np.array([.25, -.5])
+
+		self.assertAlmostEqual(calc_polarity(ranks, sentiments, [], [3]), .75)
+		self.assertAlmostEqual(calc_polarity(ranks, sentiments, [1, 2], []),
+			0.0)
+
+	def test_rank_groups(self):
+		rand = random.Random(0)
+
+		for _ in range(200):
+			num_collocates = rand.randint(0, 30)
+			ranks = np.array([rand.randint(1, 10)
+				for _ in range(num_collocates)], dtype=int)
+			sentiments = np.array([float('nan') if rand.random() < .3 else
+				rand.uniform(-1, 1) for _ in range(num_collocates)])
+
+			for rg_name, rg_ranks in RANK_GROUPS:
+				if rg_name not in ('Top', 'Top-2', 'Top-5'):
+					continue
+
+				other_ranks = get_other_ranks(rg_ranks)
+				self.assertAlmostEqual(calc_polarity(ranks, sentiments,
+					rg_ranks, other_ranks), calc_pairwise_polarity(ranks,
+					sentiments, rg_ranks, other_ranks))
+
+
+if __name__ == '__main__':
+	unittest.main()